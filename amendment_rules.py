@@ -0,0 +1,136 @@
+# amendment_rules.py
+"""
+Declarative amendment rules, compiled once into hashed lookups.
+
+Each rule in data/amendment_rules.json looks like:
+
+    {
+      "id": "consent-metadata",
+      "keywords": ["gdpr"],                  # a matched keyword equals one of these
+      "keyword_contains": ["consent"],       # ...or contains one of these
+      "jurisdiction": ["EU"],                # optional filter on the regulation
+      "regulation_id": ["reg-2025-gdpr-update"],  # optional filter on the regulation
+      "template": "Add or update clause ... {title}"
+    }
+
+A rule fires when any of its keyword conditions hits (or it has none) and all
+of its filters pass; a rule needs at least one condition. Templates may use
+regulation fields such as {title} or {jurisdiction}. Suggestions come out in
+rule-table order with duplicates removed.
+"""
+import os
+import json
+import hashlib
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+RULES_FILE = os.getenv("AMENDMENT_RULES_FILE", os.path.join(DATA_DIR, "amendment_rules.json"))
+
+NO_AMENDMENT = "No amendment needed."
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+class _Fields(dict):
+    """Leave unknown {placeholders} untouched when rendering templates."""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+class RuleSet:
+    def __init__(self, rules):
+        # Identifies the rule table, e.g. to invalidate suggestions stored elsewhere
+        raw = json.dumps(rules, sort_keys=True, ensure_ascii=False)
+        self.digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+        self.rules = []
+        self.exact = {}            # keyword -> {rule index}
+        self.needles = []          # [(substring, rule index)]
+        self.by_regulation = {}    # regulation id -> {rule index}, rules without keyword conditions
+        self.by_jurisdiction = {}  # jurisdiction -> {rule index}, rules without keyword/regulation conditions
+        self._contains_cache = {}  # matched keyword -> frozenset of rule indices
+
+        for idx, rule in enumerate(rules):
+            if not rule.get("template"):
+                raise ValueError(f"Amendment rule {rule.get('id', idx)!r} has no template")
+            keywords = [k.lower() for k in _as_list(rule.get("keywords"))]
+            contains = [k.lower() for k in _as_list(rule.get("keyword_contains"))]
+            jurisdictions = {j.lower() for j in _as_list(rule.get("jurisdiction"))}
+            regulation_ids = set(_as_list(rule.get("regulation_id")))
+            if not (keywords or contains or jurisdictions or regulation_ids):
+                raise ValueError(f"Amendment rule {rule.get('id', idx)!r} has no conditions")
+
+            self.rules.append({
+                "id": rule.get("id", str(idx)),
+                "template": rule["template"],
+                "jurisdictions": jurisdictions,
+                "regulation_ids": regulation_ids,
+            })
+            for kw in keywords:
+                self.exact.setdefault(kw, set()).add(idx)
+            for needle in contains:
+                self.needles.append((needle, idx))
+            if not (keywords or contains):
+                if regulation_ids:
+                    for reg_id in regulation_ids:
+                        self.by_regulation.setdefault(reg_id, set()).add(idx)
+                else:
+                    for jurisdiction in jurisdictions:
+                        self.by_jurisdiction.setdefault(jurisdiction, set()).add(idx)
+
+    def _rules_for_keyword(self, keyword):
+        cached = self._contains_cache.get(keyword)
+        if cached is None:
+            found = set(self.exact.get(keyword, ()))
+            found.update(idx for needle, idx in self.needles if needle in keyword)
+            cached = self._contains_cache[keyword] = frozenset(found)
+        return cached
+
+    def evaluate(self, regulation, matches):
+        """Rule ids and rendered suggestions that apply, in table order."""
+        reg_id = regulation.get("id")
+        jurisdiction = (regulation.get("jurisdiction") or "").lower()
+
+        candidates = set(self.by_regulation.get(reg_id, ()))
+        candidates.update(self.by_jurisdiction.get(jurisdiction, ()))
+        for match in set(m.lower() for m in matches):
+            candidates.update(self._rules_for_keyword(match))
+
+        fired = []
+        seen = set()
+        fields = _Fields(regulation)
+        for idx in sorted(candidates):
+            rule = self.rules[idx]
+            if rule["jurisdictions"] and jurisdiction not in rule["jurisdictions"]:
+                continue
+            if rule["regulation_ids"] and reg_id not in rule["regulation_ids"]:
+                continue
+            text = rule["template"].format_map(fields)
+            if text not in seen:
+                seen.add(text)
+                fired.append((rule["id"], text))
+        return fired
+
+    def suggest(self, regulation, matches):
+        suggestions = [text for _rule_id, text in self.evaluate(regulation, matches)]
+        return "\n".join(suggestions) if suggestions else NO_AMENDMENT
+
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+def load_rules(path=RULES_FILE):
+    """Compiled RuleSet for `path`, recompiled only when the file changes."""
+    mtime = os.path.getmtime(path)
+    with _lock:
+        cached = _compiled.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = _compiled[path] = (mtime, RuleSet(json.load(f)))
+        return cached[1]
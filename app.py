@@ -1,12 +1,13 @@
 import os
 from database import load_compliance_data
-from clause_extractor import extract_clauses
-from risk_assessor import assess_risk
-from rag_module import rag_answer
+import contract_analysis
+import contract_store
+import telemetry
+from llm_client import usage_report
+from rag_module import stream_rag_answer
 from regulatory_tracker import (
     list_all_contracts, auto_update_contracts, get_amendment_suggestions
 )
-from pdf_utils import extract_pdf_text  # PDF text extractor
 
 # BASE PROJECT PATH
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -29,24 +30,28 @@ def main():
     baseline = load_compliance_data()
     contract_meta = select_contract()
 
-    # Resolve the real PDF path
-    contract_file = resolve_contract_path(contract_meta["file"])
+    # Resolve the real PDF path (rebuilt from the contract store if needed)
+    contract_file = contract_store.resolve_contract_pdf(contract_meta)
     print("\n📄 Reading contract from:", contract_file)
 
-    contract_text = extract_pdf_text(contract_file)
-
     print("\nExtracting key clauses...\n")
-    clauses = extract_clauses(contract_text)
+    # Version-aware: only sections changed since the last analysed version go to the LLM
+    analysis = contract_analysis.analyze_contract(contract_meta, baseline, assess=False)
+    print(f"({len(analysis['diff']['changed'])} changed / {len(analysis['diff']['unchanged'])} unchanged sections, "
+          f"{analysis['template_sections']} reused from template copies)")
+    clauses = analysis["clauses_text"]
     print(clauses)
 
     print("\nRunning risk assessment...\n")
-    risk = assess_risk(clauses, baseline)
+    risk = contract_analysis.assess_clause(clauses, baseline)
     print(risk)
 
     q = input("\nAsk a compliance question (or press Enter to skip): ").strip()
     if q:
         print("\nRAG Answer:\n")
-        print(rag_answer(q))
+        for token in stream_rag_answer(q):
+            print(token, end="", flush=True)
+        print()
 
     print("\nChecking for regulatory updates and amendment suggestions...\n")
     suggestions = get_amendment_suggestions()
@@ -57,9 +62,20 @@ def main():
             for sug in suglist:
                 print(f"{cid}: Regulation '{sug['regulation']}' - Suggestion: {sug['suggestion']}")
 
-    apply = input("\nAuto-apply updates to contracts? (y/n): ").strip().lower()
-    if apply == "y":
-        updates = auto_update_contracts()
+    print("\nLLM usage per stage:")
+    for stage, usage in usage_report().items():
+        print(f"  {stage}: {usage['calls']} call(s), {usage['input_tokens']} in / {usage['output_tokens']} out tokens, "
+              f"{usage['avg_latency_s']:.2f}s avg")
+
+    if telemetry.enabled():
+        print("\nSlowest stages:")
+        for row in telemetry.stage_summary()[:8]:
+            print(f"  {row['stage']}: {row['calls']} call(s), {row['total_s']:.2f}s total, p95 {row['p95_ms']:.0f} ms")
+        print(f"Trace written to {telemetry.write_trace()}")
+
+    apply = input("\nAuto-apply updates to contracts? (y/n/d = dry run): ").strip().lower()
+    if apply in ("y", "d"):
+        updates = auto_update_contracts(dry_run=(apply == "d"))
         if not updates:
             print("No contracts required updating.")
         else:
@@ -0,0 +1,77 @@
+# bench_embeddings.py
+"""
+Embeddings/sec on CPU for each embedding backend, plus the accuracy delta of
+every backend against the torch fp32 reference (cosine similarity between the
+vectors each backend produces for the same texts).
+
+    python bench_embeddings.py [--backends torch,int8,onnx,onnx-int8] [--n 512] [--batch-size 64]
+"""
+import argparse
+import json
+import time
+
+from embedding_service import BACKENDS, EMBED_BATCH_SIZE, EmbeddingService, default_thread_count
+
+SAMPLE_TEXT = "my_docs/complaince_data.txt"
+
+
+def load_sample_texts(n):
+    with open(SAMPLE_TEXT, "r", encoding="utf-8") as f:
+        words = f.read().split()
+    # ~100-word passages, similar in size to RAG chunks and contract sections
+    passages = [" ".join(words[i:i + 100]) for i in range(0, max(len(words) - 100, 1), 37)]
+    return [f"{passages[i % len(passages)]} [{i}]" for i in range(n)]
+
+
+def run(backends, n, batch_size, threads):
+    texts = load_sample_texts(n)
+    results = {}
+    reference = None
+
+    for backend in backends:
+        try:
+            service = EmbeddingService(backend=backend, batch_size=batch_size, threads=threads, cache_dir=None)
+            service.embed(texts[:8])  # load + warm up
+        except Exception as e:
+            print(f"{backend:10s} unavailable: {e}")
+            continue
+
+        start = time.perf_counter()
+        vectors = service.embed(texts)
+        elapsed = time.perf_counter() - start
+
+        row = {"embeddings_per_sec": round(n / elapsed, 1), "seconds": round(elapsed, 3)}
+        if reference is None and backend == "torch":
+            reference = vectors
+        if reference is not None:
+            cos = (vectors * reference).sum(axis=1)
+            row["mean_cosine_vs_torch"] = round(float(cos.mean()), 5)
+            row["min_cosine_vs_torch"] = round(float(cos.min()), 5)
+        results[backend] = row
+        print(f"{backend:10s} {row}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--n", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=default_thread_count())
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    # torch first so the others can be compared against it
+    backends.sort(key=lambda b: b != "torch")
+    print(f"{args.n} texts, batch size {args.batch_size}, {args.threads} threads")
+    results = run(backends, args.n, args.batch_size, args.threads)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
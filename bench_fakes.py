@@ -0,0 +1,364 @@
+# bench_fakes.py
+"""
+Offline stand-ins for benchmarks and load tests.
+
+- Synthetic contracts (numbered sections drawn from a clause library, in a
+  configurable mix) rendered to real PDFs with reportlab.
+- Synthetic regulation catalogues of any size; a configurable fraction carry
+  keywords that trigger an amendment rule.
+- FakeGroq: a deterministic drop-in for the Groq client with configurable
+  first-token latency and token rate. Risk levels follow the clause content
+  (with 10% noise), so a local classifier has something to learn. Install it with
+  `services.override("groq", FakeGroq(...))`.
+- SmtpSink: a local plain-SMTP server that accepts and counts messages.
+"""
+import re
+import time
+import random
+import hashlib
+import threading
+import socketserver
+from io import BytesIO
+from types import SimpleNamespace
+
+# Contracts
+
+CLAUSE_LIBRARY = {
+    "payment": ("PAYMENT TERMS", [
+        "The Customer shall pay all undisputed invoices within thirty (30) days of receipt.",
+        "Late payments accrue interest at one percent (1%) per month or the maximum rate permitted by law.",
+        "Fees are exclusive of taxes, which the Customer shall pay except for taxes on the Provider's income.",
+    ]),
+    "confidentiality": ("CONFIDENTIALITY", [
+        "Each party shall keep the other party's Confidential Information secret and use it only to perform this Agreement.",
+        "These obligations survive termination for a period of five (5) years.",
+        "Disclosure required by law is permitted provided the disclosing party gives prompt notice where lawful.",
+    ]),
+    "termination": ("TERMINATION", [
+        "Either party may terminate this Agreement on ninety (90) days' written notice.",
+        "Either party may terminate immediately if the other party commits a material breach not cured within thirty (30) days.",
+        "On termination the Provider shall return or delete Customer Data within sixty (60) days.",
+    ]),
+    "liability": ("LIABILITY", [
+        "Neither party's aggregate liability shall exceed the fees paid in the twelve (12) months preceding the claim.",
+        "Neither party is liable for indirect, incidental or consequential damages, including loss of profits.",
+        "Nothing in this Agreement limits liability for fraud, death or personal injury caused by negligence.",
+    ]),
+    "governing_law": ("GOVERNING LAW", [
+        "This Agreement is governed by the laws of the jurisdiction stated in the Order Form.",
+        "The courts of that jurisdiction have exclusive jurisdiction over any dispute arising from this Agreement.",
+    ]),
+    "data_protection": ("DATA PROTECTION", [
+        "The Provider processes personal data only on documented instructions from the Customer.",
+        "Where processing relies on consent, the Customer is responsible for obtaining valid consent from data subjects.",
+        "Cross-border transfers of personal data require appropriate safeguards such as standard contractual clauses.",
+        "The Provider shall notify the Customer of a personal data breach without undue delay.",
+    ]),
+    "ai": ("AUTOMATED PROCESSING", [
+        "The Provider may use machine learning models to deliver the Services.",
+        "Automated decision outputs are advisory and subject to human review by the Customer.",
+        "The Provider shall document the model versions used and provide transparency reports on request.",
+    ]),
+    "boilerplate": ("GENERAL", [
+        "This Agreement constitutes the entire agreement between the parties regarding its subject matter.",
+        "No amendment is effective unless in writing and signed by both parties.",
+        "If any provision is held unenforceable, the remaining provisions remain in full force.",
+        "Notices shall be in writing and delivered to the addresses stated in the Order Form.",
+    ]),
+}
+
+DEFAULT_MIX = {
+    "payment": 2, "confidentiality": 2, "termination": 1, "liability": 2,
+    "governing_law": 1, "data_protection": 2, "ai": 1, "boilerplate": 3,
+}
+
+JURISDICTIONS = ["EU", "IN", "US", "UK"]
+
+
+def parse_mix(spec):
+    """'payment=2,ai=1' -> {"payment": 2, "ai": 1}"""
+    mix = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in CLAUSE_LIBRARY:
+            raise ValueError(f"Unknown clause type {name!r}; choose from {sorted(CLAUSE_LIBRARY)}")
+        mix[name] = float(weight or 1)
+    return mix or dict(DEFAULT_MIX)
+
+
+def synthetic_contract_text(sections=20, mix=None, seed=0, title="Master Services Agreement"):
+    """Contract text with numbered, upper-case section headings."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds, weights = zip(*mix.items())
+    lines = [title.upper(), "", f"Agreement reference BENCH-{seed:06d}", ""]
+    for n in range(1, sections + 1):
+        heading, sentences = CLAUSE_LIBRARY[rng.choices(kinds, weights)[0]]
+        lines.append(f"{n}. {heading}")
+        for _ in range(rng.randint(2, 5)):
+            lines.append(f"{n}.{rng.randint(1, 9)} " + " ".join(rng.sample(sentences, min(2, len(sentences)))))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def synthetic_contract_pdf(text):
+    """Render text to PDF bytes (Helvetica 10pt, wrapped, paginated)."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    width, height = A4
+    packet = BytesIO()
+    c = canvas.Canvas(packet, pagesize=A4)
+    y = height - 50
+    for line in text.split("\n"):
+        wrapped = [line] if line else [""]
+        while c.stringWidth(wrapped[-1], "Helvetica", 10) > width - 80:
+            words = wrapped[-1].split(" ")
+            cut = len(words) - 1
+            while cut > 1 and c.stringWidth(" ".join(words[:cut]), "Helvetica", 10) > width - 80:
+                cut -= 1
+            wrapped[-1:] = [" ".join(words[:cut]), " ".join(words[cut:])]
+        for piece in wrapped:
+            if y < 50:
+                c.showPage()
+                y = height - 50
+            c.setFont("Helvetica", 10)
+            c.drawString(40, y, piece)
+            y -= 13
+    c.save()
+    return packet.getvalue()
+
+
+def template_variant(text, seed, drift=0.2):
+    """
+    Another contract from the same template: own reference, sections in a
+    different order (so renumbered) and, with probability `drift` per
+    section, one extra sentence.
+    """
+    rng = random.Random(seed)
+    # Title and reference line, then one block per section
+    title, reference, *blocks = [b.strip() for b in text.split("\n\n") if b.strip()]
+    rng.shuffle(blocks)
+    out = [title, re.sub(r"BENCH-\d+", f"BENCH-{seed:06d}", reference)]
+    for n, block in enumerate(blocks, start=1):
+        lines = [re.sub(r"^\d+(?=[. ])", str(n), line) for line in block.split("\n")]
+        if rng.random() < drift:
+            lines.append(f"{n}.{rng.randint(1, 9)} Capitalised terms have the meaning given in Schedule {rng.randint(1, 9)}.")
+        out.append("\n".join(lines))
+    return "\n\n".join(out) + "\n"
+
+
+def synthetic_contracts(n, sections=20, mix=None, seed=0, templates=0, drift=0.2):
+    """
+    [(contract_meta, pdf_bytes, text)] with owners and jurisdictions. With
+    `templates` > 0 the contracts are variants of that many templates.
+    """
+    out = []
+    for i in range(n):
+        if templates:
+            text = template_variant(synthetic_contract_text(sections, mix, seed=seed + i % templates), seed + i, drift)
+        else:
+            text = synthetic_contract_text(sections, mix, seed=seed + i)
+        meta = {
+            "id": f"bench-{i:04d}",
+            "title": f"Synthetic Agreement {i}",
+            "jurisdiction": JURISDICTIONS[i % len(JURISDICTIONS)],
+            "parties": ["Bench Customer Ltd", "Bench Provider Inc"],
+            "effective_date": "2025-01-01",
+            "version": 1,
+            "file": f"bench-{i:04d}-v1.pdf",
+            "owner_email": f"owner{i}@bench.invalid",
+            "applied_regulations": [],
+        }
+        out.append((meta, synthetic_contract_pdf(text), text))
+    return out
+
+
+# Regulations
+
+NEUTRAL_KEYWORDS = [
+    "personal data", "termination", "liability", "confidential information", "invoices", "breach",
+    "governing law", "standard contractual clauses", "human review", "notices", "taxes", "interest",
+]
+# Each of these hits one of the rules in data/amendment_rules.json
+TRIGGER_KEYWORDS = ["consent", "data localisation", "transparency", "automated decision"]
+
+
+def synthetic_regulations(n, amend_rate=0.002, seed=0):
+    rng = random.Random(seed)
+    regs = []
+    for i in range(n):
+        kws = rng.sample(NEUTRAL_KEYWORDS, 2) + [f"term-{rng.randrange(max(n, 1))}"]
+        if rng.random() < amend_rate:
+            kws.insert(0, rng.choice(TRIGGER_KEYWORDS))
+        regs.append({
+            "id": f"reg-bench-{i:06d}",
+            "title": f"Synthetic Regulation {i}",
+            "jurisdiction": rng.choice(JURISDICTIONS),
+            "date_published": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "summary": "Synthetic obligation concerning " + ", ".join(kws) + ".",
+            "keywords": kws,
+            "source_url": f"https://example.org/bench/{i}",
+        })
+    return regs
+
+
+# Fake LLM
+
+def _words(text):
+    return re.findall(r"\S+\s*", text)
+
+
+class FakeGroq:
+    """
+    Deterministic replacement for `groq.Groq`: the same prompt always gives
+    the same answer. Each call waits `latency_ms` before the first token, then
+    emits tokens at `tokens_per_s` (0 = instantly).
+    """
+
+    def __init__(self, latency_ms=200.0, tokens_per_s=400.0):
+        self.latency_s = latency_ms / 1000
+        self.tokens_per_s = tokens_per_s
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def respond(self, prompt):
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        if "extract only the following major clauses" in prompt:
+            return self._clauses(prompt.split("CONTRACT:", 1)[-1])
+        if "You are a compliance officer" in prompt:
+            level = self._risk_level(prompt.rsplit("Clause:", 1)[-1], seed)
+            return (f"Risk: {level}\nExplanation: The clause is broadly aligned with the baseline. "
+                    "Obligations are stated but timelines could be more specific.")
+        rng = random.Random(seed)
+        context = re.findall(r"\w+", prompt)
+        return " ".join(rng.choice(context) for _ in range(60)).capitalize() + "."
+
+    def _risk_level(self, clause, seed):
+        # Mostly decided by the clause content, like a real reviewer; 1 in 10 at random
+        if seed % 10 == 0:
+            return ("Low", "Medium", "High")[seed // 10 % 3]
+        text = clause.lower()
+        if any(w in text for w in ("liability", "consequential", "automated decision", "cross-border")):
+            return "High"
+        if any(w in text for w in ("terminat", "personal data", "consent", "interest")):
+            return "Medium"
+        return "Low"
+
+    def _clauses(self, contract):
+        wanted = {"PAYMENT TERMS": "Payment Terms", "CONFIDENTIALITY": "Confidentiality",
+                  "TERMINATION": "Termination", "LIABILITY": "Liability", "GOVERNING LAW": "Governing Law"}
+        blocks = []
+        seen = set()
+        for match in re.finditer(r"(?m)^\d+\.\s+([A-Z ]+)\n(.+)", contract):
+            name = wanted.get(match.group(1).strip())
+            if name and name not in seen:
+                seen.add(name)
+                snippet = match.group(2).strip()
+                blocks.append(f"CLAUSE: {name}\nSummary: Covers {name.lower()} obligations of the parties.\n"
+                              f"Snippet: {snippet}")
+        return "\n\n".join(blocks) or "No major clauses found."
+
+    def _usage(self, prompt, completion_tokens):
+        from prompt_builder import count_tokens
+        return SimpleNamespace(prompt_tokens=count_tokens(prompt), completion_tokens=completion_tokens)
+
+    def create(self, model, messages, temperature=0.0, max_tokens=1024, stream=False):
+        prompt = messages[-1]["content"]
+        with self._lock:
+            self.calls += 1
+        tokens = _words(self.respond(prompt))[:max_tokens]
+        if stream:
+            return self._stream(prompt, tokens)
+
+        time.sleep(self.latency_s + (len(tokens) / self.tokens_per_s if self.tokens_per_s else 0))
+        message = SimpleNamespace(content="".join(tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=self._usage(prompt, len(tokens)))
+
+    def _stream(self, prompt, tokens):
+        time.sleep(self.latency_s)
+        for token in tokens:
+            if self.tokens_per_s:
+                time.sleep(1 / self.tokens_per_s)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))], x_groq=None)
+        yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=self._usage(prompt, len(tokens))))
+
+
+# SMTP sink
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply("220 bench-sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.wfile.write(b"250-bench-sink\r\n250-AUTH PLAIN LOGIN\r\n250 SIZE 52428800\r\n")
+            elif command.startswith("AUTH"):
+                self.reply("235 2.7.0 Authentication successful")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data == b".\r\n":
+                        break
+                    size += len(data)
+                if sink.latency_s:
+                    time.sleep(sink.latency_s)
+                sink._received(size)
+                self.reply("250 2.0.0 OK queued")
+            elif command.startswith("QUIT"):
+                self.reply("221 2.0.0 Bye")
+                return
+            else:
+                # MAIL FROM, RCPT TO, RSET, NOOP
+                self.reply("250 OK")
+
+
+class _SmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SmtpSink:
+    """Plain-SMTP server on localhost that accepts everything (use SMTP_STARTTLS=0)."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0):
+        self.latency_s = latency_ms / 1000
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._server = _SmtpServer((host, port), _SmtpHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+
+    def _received(self, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
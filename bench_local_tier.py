@@ -0,0 +1,137 @@
+# bench_local_tier.py
+"""
+Benchmark of the local classifier tier (local_tier.py) against the LLM.
+
+Synthetic contracts are labelled by the (fake) LLM through the real
+extract_clauses / assess_risk code: clause type per section and risk level
+per extracted clause. The classifiers are trained on the first contracts and
+evaluated on the rest, reporting per confidence threshold:
+    escalated   share of items sent to the LLM
+    local agree agreement of the local answers with the LLM's
+    agreement   overall agreement (escalated items count as agreeing)
+    ms/item     mean latency, all-LLM vs tiered (local inference + escalations)
+Finally assess_risk runs over the test clauses with LOCAL_TIER on and off.
+
+Nothing is written outside a temporary directory.
+
+    python bench_local_tier.py [--contracts 60] [--features hashing] [--llm-latency-ms 200]
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+import bench_fakes
+import local_tier
+import services
+
+DEFAULT_THRESHOLDS = "0.5,0.6,0.7,0.8,0.9,0.95"
+
+
+def label_with_llm(texts, call, to_label):
+    """[(text, label, seconds)] using the LLM-backed `call`."""
+    out = []
+    for text in texts:
+        start = time.perf_counter()
+        answer = call(text)
+        out.append((text, to_label(answer), time.perf_counter() - start))
+    return out
+
+
+def sweep(kind, model, test, thresholds):
+    start = time.perf_counter()
+    probs = model.predict_proba(local_tier.FEATURES[model.features]([t for t, _l, _s in test]))
+    local_s = (time.perf_counter() - start) / len(test)
+    predicted = [model.classes[j] for j in probs.argmax(axis=1)]
+    confidence = probs.max(axis=1)
+    llm_ms = statistics.mean(s for _t, _l, s in test) * 1000
+
+    print(f"\n{kind}: {len(test)} test item(s), {len({t for t, _l, _s in test})} distinct; "
+          f"local inference {local_s * 1000:.2f} ms/item, LLM {llm_ms:.0f} ms/item")
+    print(f"{'threshold':>9s} {'escalated':>10s} {'local agree':>12s} {'agreement':>10s} {'ms/item':>9s} {'saved':>7s}")
+    for threshold in thresholds:
+        local = [(p, l) for p, c, (_t, l, _s) in zip(predicted, confidence, test) if c >= threshold]
+        escalated = [s for c, (_t, _l, s) in zip(confidence, test) if c < threshold]
+        local_agree = sum(p == l for p, l in local) / len(local) if local else None
+        agreement = (sum(p == l for p, l in local) + len(escalated)) / len(test)
+        tiered_ms = (local_s * len(test) + sum(escalated)) / len(test) * 1000
+        print(f"{threshold:9.2f} {len(escalated) / len(test):10.1%} "
+              f"{'-' if local_agree is None else f'{local_agree:.1%}':>12s} {agreement:10.1%} "
+              f"{tiered_ms:9.1f} {1 - tiered_ms / llm_ms:7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=60)
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--train-share", type=float, default=0.7, help="share of contracts used for training")
+    parser.add_argument("--features", choices=sorted(local_tier.FEATURES), default="hashing",
+                        help="'embeddings' needs the MiniLM model")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-tokens-per-s", type=float, default=400.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from clause_extractor import extract_clauses
+    from contract_analysis import split_clause_blocks, split_sections
+    from risk_assessor import assess_risk
+
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    root = tempfile.mkdtemp(prefix="bench-local-tier-")
+    local_tier.LOCAL_TIER_DIR = root
+    local_tier.EXAMPLES_FILE = os.path.join(root, "examples.jsonl")
+    local_tier.LOCAL_TIER = False
+    try:
+        # STEP 1: LLM labels for every section and clause
+        services.override("groq", bench_fakes.FakeGroq(args.llm_latency_ms, args.llm_tokens_per_s))
+        baseline = ""
+        cut = int(args.contracts * args.train_share)
+        data = {"clause": ([], []), "risk": ([], [])}
+        print(f"🏷️ Labelling {args.contracts} contract(s) x {args.sections} sections with the LLM...")
+        for i in range(args.contracts):
+            split = 0 if i < cut else 1
+            sections = split_sections(bench_fakes.synthetic_contract_text(args.sections, seed=args.seed + i))
+            labelled = label_with_llm(sections, extract_clauses, lambda out: local_tier.clause_label(split_clause_blocks(out)))
+            data["clause"][split].extend(labelled)
+            blocks = [block for section in sections for block in split_clause_blocks(extract_clauses(section))
+                      if block.startswith("CLAUSE:")]
+            data["risk"][split].extend(
+                (t, l, s) for t, l, s in label_with_llm(blocks, lambda b: assess_risk(b, baseline), local_tier.risk_label) if l)
+
+        # STEP 2: train on the first contracts, sweep thresholds on the rest
+        for kind, (train_rows, test_rows) in data.items():
+            if not test_rows:
+                print(f"\n{kind}: no test items")
+                continue
+            start = time.perf_counter()
+            model, _report = local_tier.train(kind, args.features, holdout=0,
+                                              examples=[(t, l) for t, l, _s in train_rows])
+            print(f"\n{kind}: trained on {len(train_rows)} example(s) ({len(model.classes)} classes) "
+                  f"in {time.perf_counter() - start:.2f}s")
+            sweep(kind, model, test_rows, thresholds)
+
+        # STEP 3: assess_risk end to end, without and with the local tier
+        blocks = [t for t, _l, _s in data["risk"][1]]
+        if blocks:
+            print(f"\nassess_risk over {len(blocks)} test clause(s), LOCAL_TIER_CONFIDENCE={local_tier.LOCAL_TIER_CONFIDENCE}:")
+            answers = {}
+            for enabled in (False, True):
+                local_tier.LOCAL_TIER = enabled
+                services.reset("local_tier")
+                start = time.perf_counter()
+                answers[enabled] = [local_tier.risk_label(assess_risk(b, baseline)) for b in blocks]
+                elapsed = time.perf_counter() - start
+                print(f"  LOCAL_TIER={int(enabled)}: {elapsed:.2f}s ({elapsed / len(blocks) * 1000:.1f} ms/clause)")
+            same = sum(a == b for a, b in zip(answers[False], answers[True])) / len(blocks)
+            print(f"  agreement with LLM-only run: {same:.1%}")
+    finally:
+        local_tier.LOCAL_TIER = False
+        services.reset("local_tier")
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
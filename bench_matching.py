@@ -0,0 +1,78 @@
+# bench_matching.py
+"""
+Scoring throughput of the two-stage regulation matcher.
+
+Builds a synthetic catalogue of N regulations with random unit vectors (so no
+embedding model is needed) and times scoring one contract against all of them:
+inverted-index keyword stage + one matrix multiply + top-k selection.
+
+    python bench_matching.py [--regs 50000] [--sections 40] [--runs 5]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from embedding_service import EMBED_DIM
+from semantic_matcher import RegulationMatrix
+
+VOCAB = [
+    "consent", "personal data", "data localisation", "cross-border", "transparency", "automated decision",
+    "retention", "breach notification", "encryption", "audit", "sub-processor", "liability cap",
+    "governing law", "termination", "confidentiality", "payment terms", "indemnity", "model",
+]
+
+
+def synthetic_regulations(n, seed=0):
+    rng = random.Random(seed)
+    regs = []
+    for i in range(n):
+        kws = rng.sample(VOCAB, 3) + [f"term-{rng.randrange(n)}"]
+        regs.append({
+            "id": f"reg-{i}",
+            "title": f"Synthetic regulation {i}",
+            "jurisdiction": rng.choice(["EU", "IN", "US", "UK"]),
+            "summary": "Synthetic obligation about " + ", ".join(kws),
+            "keywords": kws,
+        })
+    return regs
+
+
+def unit_vectors(n, seed):
+    v = np.random.default_rng(seed).standard_normal((n, EMBED_DIM)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--regs", type=int, default=50000)
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    with open("my_docs/complaince_data.txt", "r", encoding="utf-8") as f:
+        contract_text = f.read()
+
+    regs = synthetic_regulations(args.regs)
+    start = time.perf_counter()
+    reg_matrix = RegulationMatrix(regs, vectors=unit_vectors(args.regs, 1))
+    print(f"built matrix for {args.regs} regulations in {time.perf_counter() - start:.3f}s")
+
+    sections = unit_vectors(args.sections, 2)
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        result = reg_matrix.score(contract_text, "EU", sections)
+        top = reg_matrix.top_k(result["combined"], args.top_k)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    print(f"scored 1 contract ({args.sections} sections) x {args.regs} regulations: "
+          f"median {timings[len(timings) // 2] * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms")
+    print("top:", [reg_matrix.ids[i] for i in top[:5]])
+
+
+if __name__ == "__main__":
+    main()
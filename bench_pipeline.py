@@ -0,0 +1,416 @@
+# bench_pipeline.py
+"""
+Offline benchmark of the whole compliance pipeline.
+
+Runs against synthetic contract PDFs and a synthetic regulation catalogue,
+with a deterministic fake LLM (bench_fakes.FakeGroq) and a local SMTP sink,
+inside a throwaway copy of the data/contract store, so it needs no network,
+no API key and never touches the real data/ or contracts/ folders.
+
+Stages (each timed per item, repeated --runs times):
+    ingest         regulations.json feed -> regulation catalogue (cold)
+    extraction     PDF -> text
+    clauses        clause extraction (LLM)
+    risk           risk assessment per extracted clause (LLM)
+    rag            BM25 retrieval + prompt packing + answer (LLM)
+    matching       all regulations against one contract + amendment rules
+    versioning     new amendment version + rebuilt PDF
+    notification   email with the rebuilt PDF to the SMTP sink
+End to end:
+    review         contract_analysis.analyze_contract on a cold cache
+    auto_update    regulatory_tracker.auto_update_contracts
+    auto_update_pipelined   the same run through update_pipeline
+
+Results are saved to data/benchmarks/<commit>-<timestamp>.json and compared
+with the latest earlier result for the same configuration.
+
+    python bench_pipeline.py [--contracts 8] [--regs 10000] [--llm-latency-ms 200]
+    python bench_pipeline.py --quick --llm-latency-ms 0 --llm-tokens-per-s 0
+    python bench_pipeline.py --stages review --contracts 50 --templates 3
+    python bench_pipeline.py --compare data/benchmarks/<file>.json --fail-on-regression
+"""
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import hashlib
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+import bench_fakes
+import services
+import telemetry
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "data", "benchmarks")
+BASELINE_FILE = os.path.join(BASE_DIR, "my_docs", "complaince_data.txt")
+
+STAGES = (
+    "ingest", "extraction", "clauses", "risk", "rag", "matching", "versioning", "notification",
+    "review", "auto_update", "auto_update_pipelined",
+)
+RAG_QUERIES = [
+    "How quickly must a personal data breach be notified?",
+    "What safeguards are required for cross-border transfers?",
+    "What are the overtime rules for employees?",
+    "When is a data protection impact assessment needed?",
+    "How long may personal data be retained?",
+    "What rights do data subjects have?",
+]
+
+
+# Sandbox
+
+def sandbox(root):
+    """Point every module that persists state at a scratch directory."""
+    import contract_analysis
+    import contract_store
+    import local_tier
+    import portfolio_views
+    import regulation_catalogue
+    import regulatory_tracker
+
+    data_dir = os.path.join(root, "data")
+    contracts_dir = os.path.join(root, "contracts")
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(contracts_dir, exist_ok=True)
+
+    contract_store.DATA_DIR = data_dir
+    contract_store.CONTRACTS_DIR = contracts_dir
+    contract_store.BLOBS_DIR = os.path.join(contracts_dir, "blobs")
+    contract_store.CACHE_DIR = os.path.join(contracts_dir, "cache")
+    contract_store.MANIFESTS_FILE = os.path.join(data_dir, "contract_manifests.json")
+    contract_analysis.ANALYSIS_CACHE = os.path.join(data_dir, "analysis_cache.db")
+    regulatory_tracker.DATA_DIR = data_dir
+    regulatory_tracker.CONTRACTS_DIR = contracts_dir
+    regulatory_tracker.REGS_FILE = os.path.join(data_dir, "regulations.json")
+    regulatory_tracker.CONTRACT_INDEX = os.path.join(data_dir, "contracts_index.json")
+    regulation_catalogue.CATALOGUE_DB = os.path.join(data_dir, "regulations.db")
+    portfolio_views.PORTFOLIO_DB = os.path.join(data_dir, "portfolio.db")
+    local_tier.LOCAL_TIER_DIR = os.path.join(data_dir, "local_tier")
+    local_tier.EXAMPLES_FILE = os.path.join(local_tier.LOCAL_TIER_DIR, "examples.jsonl")
+    services.reset("local_tier")
+
+
+def use_smtp_sink(sink):
+    import email_utils
+
+    email_utils.SMTP_HOST = sink.host
+    email_utils.SMTP_PORT = sink.port
+    email_utils.SMTP_USER = "bench"
+    email_utils.SMTP_PASSWORD = "bench"
+    email_utils.SMTP_STARTTLS = False
+
+
+# Measurement
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+class StageTimer:
+    def __init__(self):
+        self.items = []   # per-item latencies (s), all runs
+        self.totals = []  # wall time per run (s)
+        self.count = 0    # items per run
+
+    def run(self, fn, items):
+        start = time.perf_counter()
+        for item in items:
+            t0 = time.perf_counter()
+            fn(item)
+            self.items.append(time.perf_counter() - t0)
+        self.totals.append(time.perf_counter() - start)
+        self.count = len(items)
+
+    def summary(self):
+        total = statistics.median(self.totals) if self.totals else 0.0
+        return {
+            "items": self.count,
+            "total_s": round(total, 4),
+            "per_s": round(self.count / total, 2) if total else None,
+            "p50_ms": round(percentile(self.items, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(self.items, 0.95) * 1000, 3),
+        }
+
+
+# Stages
+
+def run_benchmark(args):
+    import contract_analysis
+    import contract_store
+    import hybrid_retriever
+    import regulatory_tracker
+    from clause_extractor import extract_clauses
+    from email_utils import send_email_smtp
+    from llm_client import complete, usage_report
+    from pdf_utils import extract_pdf_text_from_bytes
+    from prompt_builder import build_prompt, split_passages
+    from rag_module import RAG_PROMPT, TOP_K
+    from risk_assessor import assess_risk
+
+    mix = bench_fakes.parse_mix(args.mix)
+    contracts = bench_fakes.synthetic_contracts(
+        args.contracts, args.sections, mix, seed=args.seed, templates=args.templates, drift=args.template_drift)
+    regs = bench_fakes.synthetic_regulations(args.regs, args.amend_rate, seed=args.seed)
+    with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+        baseline = f.read()
+
+    fake_llm = bench_fakes.FakeGroq(args.llm_latency_ms, args.llm_tokens_per_s)
+    services.override("groq", fake_llm)
+    timers = {stage: StageTimer() for stage in STAGES}
+    amendments = {}
+    selected = [s for s in STAGES if s in args.stages]
+
+    with bench_fakes.SmtpSink(latency_ms=args.smtp_latency_ms) as sink:
+        use_smtp_sink(sink)
+        for _run in range(args.runs):
+            root = tempfile.mkdtemp(prefix="bench-pipeline-")
+            try:
+                sandbox(root)
+                texts = [text for _meta, _pdf, text in contracts]
+
+                if "ingest" in selected:
+                    regulatory_tracker.write_json(regulatory_tracker.REGS_FILE, regs)
+                    timers["ingest"].run(lambda _: regulatory_tracker.sync_regulations(), [None])
+                    timers["ingest"].count = len(regs)
+
+                if "extraction" in selected:
+                    timers["extraction"].run(extract_pdf_text_from_bytes, [pdf for _m, pdf, _t in contracts])
+
+                clause_outputs = []
+                if "clauses" in selected or "risk" in selected:
+                    timer = timers["clauses"] if "clauses" in selected else StageTimer()
+                    timer.run(lambda text: clause_outputs.append(extract_clauses(text)), texts)
+
+                if "risk" in selected:
+                    blocks = [b for out in clause_outputs for b in contract_analysis.split_clause_blocks(out)]
+                    timers["risk"].run(lambda block: assess_risk(block, baseline), blocks)
+
+                if "rag" in selected:
+                    bm25 = hybrid_retriever.BM25Index.build(split_passages(baseline))
+
+                    def answer(query):
+                        chunks = [bm25.chunks[d] for d, _score in bm25.search(query, TOP_K)]
+                        prompt = build_prompt("rag", RAG_PROMPT, fixed={"query": query}, fill=[("context", chunks, None)])
+                        return complete(prompt, temperature=0.2, max_tokens=300, label="rag")
+
+                    timers["rag"].run(answer, RAG_QUERIES)
+
+                if "matching" in selected:
+                    def match_all(i):
+                        meta, _pdf, text = contracts[i]
+                        match = regulatory_tracker.contract_matcher(meta, regs, text=text)
+                        for reg in regs:
+                            score, matched = match(reg)
+                            if score > 4:
+                                regulatory_tracker.suggest_amendment(reg, matched)
+
+                    timers["matching"].run(match_all, range(len(contracts)))
+
+                versioned = []
+                if "versioning" in selected or "notification" in selected:
+                    def version(i):
+                        meta, pdf, _text = contracts[i]
+                        meta = dict(meta, id=f"{meta['id']}-ver")
+                        contract_store.register_base(meta["id"], 1, pdf)
+                        path, new_version = regulatory_tracker.version_new_contract_pdf(
+                            meta, "AMENDMENT: Add a clause requiring documentation of AI model usage.")
+                        versioned.append((dict(meta, version=new_version), path))
+
+                    timer = timers["versioning"] if "versioning" in selected else StageTimer()
+                    timer.run(version, range(len(contracts)))
+
+                if "notification" in selected:
+                    reg = regs[0]
+
+                    def notify(item):
+                        meta, path = item
+                        subject, plain, html = regulatory_tracker.build_update_email(meta, reg, "Bench amendment", path)
+                        if not send_email_smtp(subject, meta["owner_email"], plain, html, attachment_path=path):
+                            raise RuntimeError("SMTP sink rejected the message")
+
+                    timers["notification"].run(notify, versioned)
+
+                if "review" in selected:
+                    for meta, pdf, _text in contracts:
+                        contract_store.register_base(meta["id"], 1, pdf)
+                    timers["review"].run(
+                        lambda meta: contract_analysis.analyze_contract(meta, baseline=baseline, regs=regs),
+                        [meta for meta, _pdf, _text in contracts],
+                    )
+
+                for stage, pipelined in (("auto_update", False), ("auto_update_pipelined", True)):
+                    if stage not in selected:
+                        continue
+                    # Fresh store per mode, so neither run reuses the other's rebuilt PDFs
+                    sandbox(os.path.join(root, stage))
+                    index = {}
+                    for meta, pdf, _text in contracts:
+                        contract_store.register_base(meta["id"], 1, pdf)
+                        index[meta["id"]] = dict(meta)
+                    regulatory_tracker.write_json(regulatory_tracker.CONTRACT_INDEX, index)
+                    regulatory_tracker.write_json(regulatory_tracker.REGS_FILE, regs)
+                    # Catalogue ingestion is timed separately ("ingest")
+                    regulatory_tracker.sync_regulations()
+                    updates = []
+                    with redirect_stdout(StringIO()):
+                        timers[stage].run(
+                            lambda _: updates.extend(regulatory_tracker.auto_update_contracts(pipelined=pipelined)), [None])
+                    # One call covers every contract; throughput is per contract
+                    timers[stage].count = len(contracts)
+                    amendments[stage] = len(updates)
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+        emails = sink.messages
+
+    results = {stage: timers[stage].summary() for stage in selected}
+    for stage, count in amendments.items():
+        results[stage]["amendments"] = count
+    return {
+        "stages": results,
+        "llm_calls": fake_llm.calls,
+        "emails": emails,
+        "llm_usage": usage_report(),
+        "telemetry": telemetry.stage_summary() if telemetry.enabled() else [],
+    }
+
+
+# Results storage / comparison
+
+def git_revision():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short=12", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BASE_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def config_key(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def save_result(result, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{result['revision']}-{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def latest_result(config_id, exclude=None, directory=RESULTS_DIR):
+    candidates = []
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        if path == exclude:
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if result.get("config_id") == config_id:
+            candidates.append((result.get("created", 0), path, result))
+    return max(candidates)[1:] if candidates else (None, None)
+
+
+def compare(current, previous, threshold):
+    """Print per-stage deltas; return the stages whose p50 or total regressed."""
+    regressions = []
+    print(f"\nvs {previous['revision']} ({time.strftime('%Y-%m-%d %H:%M', time.localtime(previous['created']))})")
+    for stage, row in current["stages"].items():
+        old = previous["stages"].get(stage)
+        if not old:
+            continue
+        deltas = []
+        for key in ("total_s", "p50_ms", "p95_ms"):
+            if old[key]:
+                change = (row[key] - old[key]) / old[key]
+                deltas.append(f"{key} {change:+.1%}")
+                if key != "p95_ms" and change > threshold:
+                    regressions.append(stage)
+        print(f"  {stage:22s} " + "  ".join(deltas))
+    return sorted(set(regressions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=8)
+    parser.add_argument("--sections", type=int, default=24, help="sections per synthetic contract")
+    parser.add_argument("--mix", default="", help="clause mix, e.g. payment=2,liability=1,ai=1")
+    parser.add_argument("--templates", type=int, default=0, help="build the contracts from this many templates (0 = all distinct)")
+    parser.add_argument("--template-drift", type=float, default=0.2, help="share of template sections with an extra sentence")
+    parser.add_argument("--regs", type=int, default=10000)
+    parser.add_argument("--amend-rate", type=float, default=0.002, help="share of regulations that trigger an amendment")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-tokens-per-s", type=float, default=400.0, help="0 = unlimited")
+    parser.add_argument("--smtp-latency-ms", type=float, default=5.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--quick", action="store_true", help="2 contracts, 1000 regulations, 1 run")
+    parser.add_argument("--compare", help="result file to compare against (default: latest with the same config)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.contracts, args.regs, args.runs = 2, 1000, 1
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+
+    config = {k: v for k, v in vars(args).items()
+              if k not in ("compare", "threshold", "fail_on_regression", "no_save", "quick")}
+    print(f"Benchmarking {args.contracts} contract(s) x {args.sections} sections, {args.regs} regulations, "
+          f"LLM {args.llm_latency_ms:.0f} ms + {args.llm_tokens_per_s:.0f} tok/s, {args.runs} run(s)")
+
+    result = {
+        "revision": git_revision(),
+        "created": time.time(),
+        "config": config,
+        "config_id": config_key(config),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        **run_benchmark(args),
+    }
+
+    print(f"\n{'stage':22s} {'items':>6s} {'total s':>9s} {'items/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s}")
+    for stage, row in result["stages"].items():
+        print(f"{stage:22s} {row['items']:6d} {row['total_s']:9.3f} {row['per_s'] or 0:9.2f} "
+              f"{row['p50_ms']:9.2f} {row['p95_ms']:9.2f}")
+    print(f"LLM calls: {result['llm_calls']}, emails delivered: {result['emails']}")
+
+    path = None if args.no_save else save_result(result)
+    if path:
+        print(f"Saved {os.path.relpath(path, BASE_DIR)}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    else:
+        _path, previous = latest_result(result["config_id"], exclude=path)
+    if previous:
+        regressions = compare(result, previous, args.threshold)
+        if regressions:
+            print(f"Regressions (> {args.threshold:.0%}): {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+    else:
+        print("No earlier result with this configuration to compare against.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,7 @@
-import os
-from dotenv import load_dotenv
-from groq import Groq
+from llm_client import complete, stream
+from prompt_builder import build_prompt, fill_budget, split_to_budget
 
-load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-def extract_clauses(contract_text: str) -> str:
-    prompt = f"""
+CLAUSE_PROMPT = """
 You are a senior legal compliance expert.
 From the contract below, extract only the following major clauses:
 
@@ -32,10 +27,62 @@ Do not include any formatting symbols, special characters, or unrelated text.
 CONTRACT:
 {contract_text}
 """
-    res = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=800,
-    )
-    return res.choices[0].message.content
+
+def _clause_prompts(contract_text: str):
+    """
+    One prompt per run of whole sections that fits the "clauses" input budget,
+    so the end of a long contract is never cut off.
+    """
+    from contract_analysis import split_sections
+
+    budget = fill_budget("clauses", CLAUSE_PROMPT, names=["contract_text"])
+    return [build_prompt("clauses", CLAUSE_PROMPT, fill=[("contract_text", chunk, None)])
+            for chunk in split_to_budget(split_sections(contract_text), budget)]
+
+def extract_clauses(contract_text: str) -> str:
+    """Clause blocks for the whole contract; chunk outputs are joined in contract order."""
+    outputs = [complete(prompt, temperature=0.2, max_tokens=800, label="clauses") for prompt in _clause_prompts(contract_text)]
+    return "\n\n".join(o.strip() for o in outputs if o and o.strip())
+
+def stream_extract_clauses(contract_text: str):
+    """Same as extract_clauses, but yields the output as it is generated."""
+    for n, prompt in enumerate(_clause_prompts(contract_text)):
+        if n:
+            yield "\n\n"
+        yield from stream(prompt, temperature=0.2, max_tokens=800, label="clauses")
+
+def iter_clause_blocks(tokens, on_block=None):
+    """
+    Incrementally parse a token stream of `CLAUSE:` blocks. Yields tokens
+    unchanged and calls `on_block(block)` as soon as each block is complete
+    (a new `CLAUSE:` line starts, or a blank line follows its Snippet), so
+    callers can e.g. start risk assessment before the extraction finishes.
+    """
+    pending = ""
+    block = []
+
+    def flush():
+        text = "\n".join(block).strip()
+        block.clear()
+        if text.startswith("CLAUSE:") and on_block:
+            on_block(text)
+
+    def feed(line):
+        stripped = line.strip()
+        if stripped.startswith("CLAUSE:"):
+            flush()
+        elif not stripped and any(l.strip().startswith("Snippet:") for l in block):
+            flush()
+            return
+        block.append(line)
+
+    for token in tokens:
+        yield token
+        pending += token
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            feed(line)
+
+    if pending:
+        feed(pending)
+    flush()
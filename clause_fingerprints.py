@@ -0,0 +1,273 @@
+# clause_fingerprints.py
+"""
+Near-duplicate detection for contract sections and clauses.
+
+Most contracts are built from a few templates, so the same confidentiality or
+governing-law text turns up again and again with only the numbering, a party
+name or a sentence changed. Each text gets a fingerprint:
+
+- "n": hash of the normalized text (lower case, no punctuation except
+  currency and percent signs, no leading clause numbers such as "4.", "4.2"
+  or "(a)"), for exact template matches;
+- "s": a MinHash signature over word 3-shingles, bucketed with LSH, for
+  near-identical ones (estimated Jaccard similarity >= CLAUSE_SIMILARITY).
+
+contract_analysis keeps the fingerprints in its cache and reuses clause
+extraction and risk verdicts across contracts only on an exact "n" match: a
+near-identical clause can differ in exactly the words that matter (an amount,
+a "not"). `portfolio_stats` groups the portfolio's near-identical sections
+into templates.
+
+    python clause_fingerprints.py [--top 10]
+"""
+import os
+import re
+import base64
+import hashlib
+import argparse
+from collections import defaultdict
+
+CLAUSE_DEDUP = os.getenv("CLAUSE_DEDUP", "1") == "1"
+CLAUSE_SIMILARITY = float(os.getenv("CLAUSE_SIMILARITY", 0.9))
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.6 similarity nearly always share a bucket
+SHINGLE_WORDS = 3
+# Bumped whenever normalization or signatures change; fingerprints of another
+# version are never treated as the same text
+FINGERPRINT_VERSION = 3
+
+# Leading clause numbering on a line: "4.", "12)", "4.2.", "4.2 The", "(a)",
+# "ARTICLE 4", "SECTION 2". A bare number is not numbering: "within\n30 days"
+# is an amount wrapped onto a new line.
+_NUMBERING = re.compile(
+    r"(?m)^\s*(?:\d+(?:\.\d+)*[.)]|\d+(?:\.\d+)+(?=\s+[A-Z(])|\([A-Za-z]{1,4}\)|ARTICLE\s+\w+|SECTION\s+\w+)\s+"
+)
+# Words, plus the symbols that change what an amount means
+_TOKEN = re.compile(r"\w+|[$€£¥₹%]")
+_permutations = None
+
+
+def normalize(text: str) -> str:
+    text = _NUMBERING.sub(" ", text or "").lower()
+    return " ".join(_TOKEN.findall(text))
+
+
+def locate(fragment: str, text: str):
+    """
+    The span of `text` that normalizes to the same tokens as `fragment`, or
+    None; e.g. a clause snippet found again in a renumbered copy of its section.
+    """
+    target = normalize(fragment).split()
+    # Blank out numbering instead of removing it, so offsets still match `text`
+    masked = _NUMBERING.sub(lambda m: " " * len(m.group()), text or "").lower()
+    if not target or len(masked) != len(text):
+        return None
+    tokens = list(_TOKEN.finditer(masked))
+    words = [m.group() for m in tokens]
+    for start in range(len(words) - len(target) + 1):
+        if words[start:start + len(target)] == target:
+            return text[tokens[start].start():tokens[start + len(target) - 1].end()]
+    return None
+
+
+def _hash_params():
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+
+        rng = np.random.RandomState(20240601)
+        a = rng.randint(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)  # odd
+        b = rng.randint(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + rng.randint(0, 2, NUM_PERM, dtype=np.uint64)
+        _permutations = (a[:, None], b[:, None])
+    return _permutations
+
+
+def shingles(normalized: str):
+    """Set of word SHINGLE_WORDS-grams of a normalized text (the whole text if shorter)."""
+    words = normalized.split()
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(normalized: str):
+    """MinHash signature (NUM_PERM x uint32) of a normalized text."""
+    import numpy as np
+
+    a, b = _hash_params()
+    # 64-bit shingle hashes, stable across processes (unlike hash())
+    x = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                  for s in shingles(normalized)], dtype=np.uint64)
+    # Multiply-shift: (a * x + b) mod 2**64 (uint64 wraps), keep the high 32 bits
+    return ((a * x + b) >> np.uint64(32)).min(axis=1).astype("<u4")
+
+
+def fingerprint(text: str):
+    """JSON-friendly fingerprint: {"n": normalized hash, "s": base64 MinHash, "v": version}."""
+    normalized = normalize(text)
+    return {
+        "n": hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16],
+        "s": base64.b64encode(minhash(normalized).tobytes()).decode("ascii"),
+        "v": FINGERPRINT_VERSION,
+    }
+
+
+def is_current(fp):
+    return fp.get("v") == FINGERPRINT_VERSION
+
+
+def _signature(fp):
+    import numpy as np
+
+    return np.frombuffer(base64.b64decode(fp["s"]), dtype="<u4")
+
+
+def similarity(fp_a, fp_b):
+    """Estimated Jaccard similarity of two fingerprints (1.0 for the same normalized text)."""
+    if fp_a["n"] == fp_b["n"]:
+        return 1.0
+    if fp_a.get("v") != fp_b.get("v"):
+        return 0.0
+    return float((_signature(fp_a) == _signature(fp_b)).mean())
+
+
+class FingerprintIndex:
+    """LSH index over fingerprints; entries can only be added."""
+
+    def __init__(self):
+        self.fingerprints = {}
+        self._exact = defaultdict(list)
+        self._buckets = defaultdict(list)
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def _bands(self, fp):
+        raw = base64.b64decode(fp["s"])
+        width = len(raw) // BANDS
+        return [(band, raw[band * width:(band + 1) * width]) for band in range(BANDS)]
+
+    def add(self, key, fp):
+        if key in self.fingerprints:
+            return
+        self.fingerprints[key] = fp
+        self._exact[fp["n"]].append(key)
+        for band in self._bands(fp):
+            self._buckets[band].append(key)
+
+    def candidates(self, fp):
+        seen = set(self._exact.get(fp["n"], []))
+        for band in self._bands(fp):
+            seen.update(self._buckets.get(band, []))
+        return seen
+
+    def find_exact(self, fp, exclude=None, accept=None):
+        """An indexed key with the same normalized text, or None."""
+        for key in self._exact.get(fp["n"], []):
+            if key != exclude and (accept is None or accept(key)):
+                return key
+        return None
+
+    def find(self, fp, threshold=None, exclude=None, accept=None):
+        """Most similar indexed key with similarity >= threshold -> (key, similarity), or None."""
+        threshold = CLAUSE_SIMILARITY if threshold is None else threshold
+        key = self.find_exact(fp, exclude, accept)
+        if key is not None:
+            return key, 1.0
+
+        best = None
+        for key in self.candidates(fp):
+            if key == exclude or (accept is not None and not accept(key)):
+                continue
+            score = similarity(fp, self.fingerprints[key])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+
+def portfolio_stats(cache, threshold=None, top=10):
+    """
+    Template reuse across the portfolio in an analysis cache: sections are
+    grouped into templates (near-identical at `threshold`), then counted per
+    contract version analysed.
+    """
+    entries = dict(cache["fingerprints:sections"].items())
+    contracts = cache["contracts"]
+    # Only sections that went through clause extraction have a fingerprint
+    occurrences = defaultdict(set)
+    total = 0
+    for lineage, info in contracts.items():
+        for h in info.get("sections", []):
+            if h in entries:
+                occurrences[h].add(lineage)
+                total += 1
+
+    # Union-find over near-identical sections
+    parent = {h: h for h in occurrences}
+
+    def root(h):
+        while parent[h] != h:
+            parent[h] = parent[parent[h]]
+            h = parent[h]
+        return h
+
+    threshold = CLAUSE_SIMILARITY if threshold is None else threshold
+    index = FingerprintIndex()
+    for h in occurrences:
+        index.add(h, entries[h])
+    for h in occurrences:
+        for other in index.candidates(entries[h]):
+            if other != h and similarity(entries[h], entries[other]) >= threshold:
+                parent[root(other)] = root(h)
+
+    groups = defaultdict(list)
+    for h in occurrences:
+        groups[root(h)].append(h)
+    templates = sorted(
+        (
+            {
+                "title": next((entries[h]["title"] for h in members if entries[h].get("title")), members[0][:12]),
+                "variants": len(members),
+                "contracts": len(set().union(*(occurrences[h] for h in members))),
+            }
+            for members in groups.values()
+        ),
+        key=lambda t: (-t["contracts"], -t["variants"]),
+    )
+    section_entries = cache["sections"]
+    reused = cache["template_reuse"]
+    return {
+        "contracts": len({lineage for lineages in occurrences.values() for lineage in lineages}),
+        "sections": total,
+        "distinct_sections": len(occurrences),
+        "templates": len(groups),
+        # Share of sections that did not need their own analysis
+        "reuse_ratio": round(1 - len(groups) / total, 4) if total else 0.0,
+        "shared_templates": sum(1 for t in templates if t["contracts"] > 1),
+        "sections_from_template": sum(1 for h in occurrences if "template" in section_entries.get(h, {})),
+        "reused_extractions": reused.get("extraction", 0),
+        "reused_risks": reused.get("risk", 0),
+        "top_templates": templates[:top],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Template reuse across the analysed contract portfolio")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=None)
+    args = parser.parse_args()
+
+    import contract_analysis
+
+    stats = portfolio_stats(contract_analysis.load_cache(), args.threshold, args.top)
+    print(f"{stats['contracts']} contract(s), {stats['sections']} sections, {stats['distinct_sections']} distinct, "
+          f"{stats['templates']} template(s) -> reuse ratio {stats['reuse_ratio']:.1%}")
+    print(f"Reused from templates: {stats['reused_extractions']} extraction(s), {stats['reused_risks']} risk verdict(s)")
+    print(f"\n{'template':40s} {'contracts':>9s} {'variants':>9s}")
+    for t in stats["top_templates"]:
+        print(f"{t['title'][:40]:40s} {t['contracts']:9d} {t['variants']:9d}")
+
+
+if __name__ == "__main__":
+    main()
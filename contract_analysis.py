@@ -0,0 +1,645 @@
+# contract_analysis.py
+"""
+Version-aware contract analysis.
+
+A contract is split into sections (numbered top-level headings, plus one
+section per appended amendment). Clause extraction, risk verdicts and keyword
+hits are cached per section content hash, so when a new version arrives only
+sections that are new or changed since the previous version go to the LLM and
+the regulation matcher; everything else is reused. Sections and clauses whose
+normalized text matches one already analysed in any contract (the same
+template clause, renumbered; see clause_fingerprints) reuse that extraction
+and risk verdict too.
+"""
+import os
+import re
+import json
+import difflib
+import sqlite3
+import hashlib
+import threading
+
+import clause_fingerprints
+import contract_store
+import local_tier
+import portfolio_views
+import telemetry
+from pdf_utils import extract_pdf_text_from_bytes
+from prompt_builder import strip_boilerplate
+from clause_extractor import extract_clauses, stream_extract_clauses
+from risk_assessor import assess_risk
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+ANALYSIS_CACHE = os.path.join(DATA_DIR, "analysis_cache.db")
+
+# "1. PAYMENT TERMS", "12) GOVERNING LAW", "ARTICLE 4 - LIABILITY"
+SECTION_HEADING = re.compile(
+    r"^\s*(?:\d+[.)]|ARTICLE\s+\w+|SECTION\s+\w+)\s*[-–:]?\s*[A-Z][A-Z0-9 &/,'’()-]{2,}\s*$"
+)
+
+_lock = threading.RLock()
+
+
+# Cache persistence (SQLite, one row per cached entry)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind  TEXT NOT NULL,
+    key   TEXT NOT NULL,
+    value TEXT NOT NULL,
+    same  TEXT,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS entries_same ON entries (kind, same);
+"""
+
+
+def _same_text_key(kind, value):
+    # Fingerprints are looked up by their normalized-text hash
+    if kind.startswith("fingerprints:") and isinstance(value, dict):
+        return value.get("n")
+    return None
+
+
+def _merge(before, mine, current):
+    """This view's change (before -> mine) applied on top of the value stored meanwhile."""
+    if isinstance(mine, dict) and isinstance(current, dict):
+        before = before if isinstance(before, dict) else {}
+        return {**current, **{k: v for k, v in mine.items() if before.get(k) != v}}
+    if isinstance(mine, int) and isinstance(current, int):
+        return current + mine - (before or 0)
+    return mine
+
+
+class _Entries:
+    """One kind of entry ("sections", "risks", ...), read key by key on first access."""
+
+    def __init__(self, cache, kind):
+        self._cache = cache
+        self.kind = kind
+        self._values = {}
+        self._stored = {}  # key -> JSON as read from the database, None if absent
+
+    def _load(self, key):
+        if key not in self._stored:
+            raw = self._cache._fetch(self.kind, key)
+            self._stored[key] = raw
+            if raw is not None:
+                self._values[key] = json.loads(raw)
+        return key in self._values
+
+    def __contains__(self, key):
+        return self._load(key)
+
+    def __getitem__(self, key):
+        if not self._load(key):
+            raise KeyError(key)
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        self._load(key)
+        self._values[key] = value
+
+    def get(self, key, default=None):
+        return self._values[key] if self._load(key) else default
+
+    def setdefault(self, key, default=None):
+        if not self._load(key):
+            self._values[key] = default
+        return self._values[key]
+
+    def items(self):
+        for key, raw in self._cache._scan(self.kind):
+            if key not in self._stored:
+                self._stored[key] = raw
+                self._values[key] = json.loads(raw)
+        return list(self._values.items())
+
+    def same_text(self, fp):
+        """Keys of fingerprints with the same normalized text as `fp`, saved or not."""
+        keys = [k for k, v in self._values.items() if isinstance(v, dict) and v.get("n") == fp["n"]]
+        return keys + [k for k in self._cache._same(self.kind, fp["n"]) if k not in keys]
+
+    def _changes(self):
+        for key, value in self._values.items():
+            raw = json.dumps(value, ensure_ascii=False)
+            if raw != self._stored.get(key):
+                yield key, value
+
+
+class AnalysisCache:
+    """
+    View of the analysis cache database. cache[kind] behaves like a dict whose
+    entries are read on first access; save() writes back only the entries
+    changed through this view, merged field by field into whatever other
+    threads or processes stored meanwhile (counters add up). A view loaded
+    before a slow LLM call therefore never overwrites newer results.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._kinds = {}
+        self._conn = None
+        self._db_lock = threading.Lock()
+
+    def __getitem__(self, kind):
+        if kind not in self._kinds:
+            self._kinds[kind] = _Entries(self, kind)
+        return self._kinds[kind]
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Transactions are explicit (BEGIN IMMEDIATE in save)
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _fetch(self, kind, key):
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT value FROM entries WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        return row[0] if row else None
+
+    def _scan(self, kind):
+        with self._db_lock:
+            return self._connect().execute("SELECT key, value FROM entries WHERE kind = ?", (kind,)).fetchall()
+
+    def _same(self, kind, same):
+        with self._db_lock:
+            rows = self._connect().execute(
+                "SELECT key FROM entries WHERE kind = ? AND same = ?", (kind, same)).fetchall()
+        return [key for (key,) in rows]
+
+    def save(self):
+        changes = [(entries, key, value) for entries in self._kinds.values() for key, value in entries._changes()]
+        if not changes:
+            return
+        with self._db_lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for entries, key, value in changes:
+                    before = entries._stored.get(key)
+                    row = conn.execute("SELECT value FROM entries WHERE kind = ? AND key = ?",
+                                       (entries.kind, key)).fetchone()
+                    if row is not None and row[0] != before:
+                        merged = _merge(json.loads(before) if before else None, value, json.loads(row[0]))
+                        if isinstance(value, dict) and isinstance(merged, dict):
+                            value.update(merged)  # callers may still hold this entry
+                        else:
+                            entries._values[key] = value = merged
+                    raw = json.dumps(value, ensure_ascii=False)
+                    conn.execute("INSERT OR REPLACE INTO entries (kind, key, value, same) VALUES (?, ?, ?, ?)",
+                                 (entries.kind, key, raw, _same_text_key(entries.kind, value)))
+                    entries._stored[key] = raw
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+
+def load_cache(path=None):
+    return AnalysisCache(path or ANALYSIS_CACHE)
+
+
+def save_cache(cache):
+    cache.save()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Sections
+
+def split_sections(text: str):
+    """
+    Split contract text on top-level headings; preamble is its own section.
+    Page headers, footers and numbers are stripped first.
+    """
+    sections = []
+    current = []
+    for line in strip_boilerplate(text).splitlines():
+        if SECTION_HEADING.match(line) and any(l.strip() for l in current):
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip())
+    return sections
+
+
+def load_contract_sections(contract_meta, cache=None):
+    """
+    Sections of the contract's current version. The base PDF's text is
+    extracted once per blob and cached; amendments are read straight from the
+    store, so a new version never needs a PDF rebuild or re-extraction.
+    """
+    cache = cache if cache is not None else load_cache()
+    manifest = contract_store.ensure_manifest(contract_meta)
+
+    base_text = cache["texts"].get(manifest["base"])
+    if base_text is None:
+        base_text = extract_pdf_text_from_bytes(contract_store.get_blob(manifest["base"]))
+        cache["texts"][manifest["base"]] = base_text
+
+    return split_sections(base_text) + [a.strip() for a in contract_store.amendment_texts(manifest) if a.strip()]
+
+
+def diff_sections(previous_hashes, current_hashes):
+    """Section-level diff: indices of unchanged, changed/new and removed sections."""
+    diff = {"unchanged": [], "changed": [], "removed": []}
+    matcher = difflib.SequenceMatcher(None, previous_hashes, current_hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            diff["unchanged"].extend(range(j1, j2))
+        else:
+            diff["changed"].extend(range(j1, j2))
+            diff["removed"].extend(range(i1, i2))
+    return diff
+
+
+# Clause extraction
+
+def split_clause_blocks(clauses_text: str):
+    """Split LLM clause output into blocks, one per `CLAUSE:` marker."""
+    if "CLAUSE:" not in (clauses_text or ""):
+        return [b.strip() for b in (clauses_text or "").split("\n\n") if b.strip()]
+    blocks = []
+    for part in re.split(r"(?m)^(?=\s*CLAUSE:)", clauses_text):
+        part = part.strip()
+        if part.startswith("CLAUSE:"):
+            blocks.append(part)
+    return blocks
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _owning_section(block, candidates, sections):
+    """Index of the section a clause block was extracted from."""
+    snippet = re.search(r"(?ims)^\s*Snippet:\s*(.+)$", block)
+    if snippet:
+        needle = _normalize(snippet.group(1))[:80]
+        for idx in candidates:
+            if needle and needle in _normalize(sections[idx]):
+                return idx
+    clause_type = re.match(r"\s*CLAUSE:\s*(.+)", block)
+    if clause_type:
+        needle = _normalize(clause_type.group(1))
+        for idx in candidates:
+            if needle and needle in _normalize(sections[idx]):
+                return idx
+    return candidates[0]
+
+
+def _pending_sections(hashes, changed, section_cache):
+    return [i for i in changed if "clauses" not in section_cache.get(hashes[i], {})]
+
+
+# Templates
+
+def _fingerprints(cache, namespace):
+    return cache["fingerprints:" + namespace]
+
+
+def _count_reuse(cache, kind):
+    cache["template_reuse"][kind] = cache["template_reuse"].get(kind, 0) + 1
+    telemetry.inc("clause_template_reuse_total", kind=kind)
+
+
+def _same_template(entries, fp, accept, exclude=None):
+    """A key with a current fingerprint of exactly this normalized text that `accept`s, or None."""
+    for key in entries.same_text(fp):
+        if key != exclude and clause_fingerprints.is_current(entries[key]) and entries[key]["n"] == fp["n"] \
+                and accept(key):
+            return key
+    return None
+
+
+def _rebase_blocks(blocks, section_text):
+    """
+    Clause blocks taken from a template copy, with each snippet re-cut from
+    this section's own text; None if a snippet cannot be found in it.
+    """
+    rebased = []
+    for block in blocks:
+        snippet = re.search(r"(?ims)^\s*Snippet:\s*(.+)$", block)
+        if snippet:
+            own = clause_fingerprints.locate(snippet.group(1), section_text)
+            if own is None:
+                return None
+            block = block[:snippet.start(1)] + own + block[snippet.end(1):]
+        rebased.append(block)
+    return rebased
+
+
+def _reuse_template_sections(sections, hashes, pending, cache):
+    """
+    Give pending sections the clause extraction of a section with the same
+    normalized text (the same template clause in another contract, renumbered
+    or re-punctuated). Near-identical sections are not reused: they can differ
+    in an amount or a "not". Returns the sections that still need the LLM.
+    """
+    section_cache = cache["sections"]
+    entries = _fingerprints(cache, "sections")
+    for i, h in enumerate(hashes):
+        if h not in entries or not clause_fingerprints.is_current(entries[h]):
+            entries[h] = dict(clause_fingerprints.fingerprint(sections[i]), title=sections[i].splitlines()[0][:80])
+    if not clause_fingerprints.CLAUSE_DEDUP:
+        return pending
+
+    remaining = []
+    for i in pending:
+        source = _same_template(entries, entries[hashes[i]], exclude=hashes[i],
+                                accept=lambda key: "clauses" in section_cache.get(key, {}))
+        blocks = None if source is None else _rebase_blocks(section_cache[source]["clauses"], sections[i])
+        if blocks is None:
+            remaining.append(i)
+            continue
+        section_cache.setdefault(hashes[i], {}).update(clauses=blocks, template=source)
+        _count_reuse(cache, "extraction")
+    return remaining
+
+
+def _store_extraction(sections, hashes, pending, clauses_text, section_cache):
+    """Attribute each extracted clause block to its section and cache it."""
+    owned = {i: [] for i in pending}
+    for block in split_clause_blocks(clauses_text):
+        owned[_owning_section(block, pending, sections)].append(block)
+    for i in pending:
+        section_cache.setdefault(hashes[i], {})["clauses"] = owned[i]
+    local_tier.record("clause", [(sections[i], local_tier.clause_label(owned[i])) for i in pending])
+
+
+def _classify_locally(sections, pending):
+    """
+    Sections the local classifier types confidently (LOCAL_TIER=1) get their
+    clause block, or none, without the LLM. Returns (sections still pending,
+    {section index: local clause blocks}). Local answers are not cached: once
+    LOCAL_TIER is off or the model is retrained they are asked again.
+    """
+    remaining = []
+    local_blocks = {}
+    for i, local in zip(pending, local_tier.classify("clause", [sections[i] for i in pending])):
+        if local is None:
+            remaining.append(i)
+            continue
+        local_blocks[i] = local_tier.clause_blocks(*local, sections[i])
+    return remaining, local_blocks
+
+
+def _extract_changed_sections(sections, hashes, changed, cache):
+    """
+    One extraction request over all changed sections (chunked to the input
+    budget); LLM results cached per section. Returns (LLM calls, local blocks).
+    """
+    pending = _pending_sections(hashes, changed, cache["sections"])
+    pending = _reuse_template_sections(sections, hashes, pending, cache)
+    pending, local_blocks = _classify_locally(sections, pending)
+    if not pending:
+        return 0, local_blocks
+
+    clauses_text = extract_clauses("\n\n".join(sections[i] for i in pending))
+    _store_extraction(sections, hashes, pending, clauses_text, cache["sections"])
+    return 1, local_blocks
+
+
+def _risk_key(clause_block, baseline):
+    return text_hash(clause_block + "\x00" + (baseline or ""))
+
+
+def _risk_namespace(baseline):
+    # Verdicts are only interchangeable if they were given against the same baseline
+    return "risks:" + text_hash(baseline or "")[:16]
+
+
+def _cached_risk(clause_block, baseline, cache):
+    """Cached verdict for this clause, or for one with the same normalized text; None if neither exists."""
+    key = _risk_key(clause_block, baseline)
+    if key in cache["risks"] or not clause_fingerprints.CLAUSE_DEDUP:
+        return cache["risks"].get(key)
+
+    entries = _fingerprints(cache, _risk_namespace(baseline))
+    source = _same_template(entries, clause_fingerprints.fingerprint(clause_block), accept=lambda k: k in cache["risks"])
+    if source is None:
+        return None
+    cache["risks"][key] = cache["risks"][source]
+    _count_reuse(cache, "risk")
+    return cache["risks"][key]
+
+
+def _local_risk(clause_block):
+    """Verdict of the local classifier (LOCAL_TIER=1), or None; never cached."""
+    local = local_tier.classify("risk", [clause_block])[0]
+    return None if local is None else local_tier.risk_verdict(*local)
+
+
+def _store_risk(clause_block, baseline, result, cache):
+    key = _risk_key(clause_block, baseline)
+    cache["risks"][key] = result
+    _fingerprints(cache, _risk_namespace(baseline))[key] = clause_fingerprints.fingerprint(clause_block)
+
+
+def assess_clause(clause_block, baseline):
+    """
+    assess_risk with LLM verdicts cached per (clause, baseline) content, shared
+    by renumbered template copies. Local classifier verdicts are not cached.
+    """
+    with _lock:
+        cache = load_cache()
+        exact = _risk_key(clause_block, baseline) in cache["risks"]
+        cached = _cached_risk(clause_block, baseline, cache)
+        if cached is not None and not exact:
+            # Taken from a renumbered copy of this clause; keep it under this clause too
+            save_cache(cache)
+    telemetry.inc("analysis_risk_cache_total", result="miss" if cached is None else "hit")
+    if cached is not None:
+        return cached
+    local = _local_risk(clause_block)
+    if local is not None:
+        return local
+
+    # The LLM call runs outside the lock so several clauses can be assessed
+    # concurrently (e.g. while the extraction is still streaming)
+    result = assess_risk(clause_block, baseline, use_local=False)
+    with _lock:
+        cache = load_cache()
+        _store_risk(clause_block, baseline, result, cache)
+        save_cache(cache)
+    return result
+
+
+# Keyword matching
+
+def _section_keywords(section_text, keywords, entry):
+    """Keyword hits for a section; only keywords not yet checked are scanned."""
+    checked = set(entry.get("checked", []))
+    hits = set(entry.get("hits", []))
+    missing = [kw for kw in keywords if kw not in checked]
+    if missing:
+        text_lower = section_text.lower()
+        hits.update(kw for kw in missing if kw in text_lower)
+        checked.update(missing)
+        entry["checked"] = sorted(checked)
+        entry["hits"] = sorted(hits)
+    return hits
+
+
+def keyword_hits_by_contract(contracts, regs):
+    """
+    {contract id: keyword hits} for many contracts with one cache load and
+    save; like analyze_contract(regs=regs, extract=False), only keywords not
+    yet checked against a section are scanned.
+    """
+    keywords = sorted({kw.lower() for reg in regs for kw in reg.get("keywords", [])})
+    hits = {}
+    with _lock:
+        cache = load_cache()
+        for contract in contracts:
+            found = set()
+            for section in load_contract_sections(contract, cache):
+                found |= _section_keywords(section, keywords, cache["sections"].setdefault(text_hash(section), {}))
+            hits[contract["id"]] = found
+        save_cache(cache)
+    return hits
+
+
+def match_regulation_to_sections(reg, contract_meta, keyword_hits):
+    """Same scoring as regulatory_tracker.match_regulation_to_contract."""
+    matches = []
+    score = 0
+
+    for kw in reg.get("keywords", []):
+        if kw.lower() in keyword_hits:
+            matches.append(kw)
+            score += 2
+
+    if reg.get("jurisdiction", "").lower() == contract_meta.get("jurisdiction", "").lower():
+        score += 5
+
+    return score, matches
+
+
+# Entry points
+
+def analyze_sections(lineage_key, sections, baseline=None, regs=None, extract=True, assess=True):
+    """
+    Analyze `sections` against the previously cached version of `lineage_key`.
+    Only changed or new sections are sent to clause extraction, risk
+    assessment and keyword scanning.
+    """
+    with _lock:
+        cache = load_cache()
+    section_cache = cache["sections"]
+    hashes = [text_hash(s) for s in sections]
+
+    previous = cache["contracts"].get(lineage_key, {}).get("sections", [])
+    diff = diff_sections(previous, hashes)
+    # Sections unchanged relative to the previous version but missing from the
+    # cache (e.g. cache was cleared) still need analysis.
+    changed = diff["changed"] + [i for i in diff["unchanged"] if hashes[i] not in section_cache]
+    telemetry.inc("analysis_section_cache_total", len(sections) - len(changed), result="hit")
+    telemetry.inc("analysis_section_cache_total", len(changed), result="miss")
+
+    llm_calls = 0
+    reused_before = cache["template_reuse"].get("extraction", 0)
+    local_blocks = {}
+    if extract:
+        # Unchanged sections first seen by a keyword-only pass (extract=False)
+        # have no clauses yet
+        unextracted = [i for i in diff["unchanged"] if "clauses" not in section_cache.get(hashes[i], {})]
+        calls, local_blocks = _extract_changed_sections(sections, hashes, changed + unextracted, cache)
+        llm_calls += calls
+
+    clause_blocks = []
+    risks = []
+    for i, h in enumerate(hashes):
+        entry = section_cache.setdefault(h, {})
+        blocks = local_blocks[i] if i in local_blocks else entry.get("clauses", [])
+        clause_blocks.extend(blocks)
+        if assess:
+            for block in blocks:
+                risk = _cached_risk(block, baseline, cache) or _local_risk(block)
+                if risk is None:
+                    llm_calls += 1
+                    risk = assess_risk(block, baseline, use_local=False)
+                    _store_risk(block, baseline, risk, cache)
+                risks.append(risk)
+
+    keyword_hits = set()
+    if regs is not None:
+        keywords = sorted({kw.lower() for reg in regs for kw in reg.get("keywords", [])})
+        for i, h in enumerate(hashes):
+            keyword_hits |= _section_keywords(sections[i], keywords, section_cache.setdefault(h, {}))
+
+    cache["contracts"][lineage_key] = {"sections": hashes}
+    template_sections = cache["template_reuse"].get("extraction", 0) - reused_before
+    with _lock:
+        save_cache(cache)
+    if assess:
+        portfolio_views.record_analysis(lineage_key, clause_blocks, risks)
+
+    return {
+        "sections": sections,
+        "diff": diff,
+        "clauses_text": "\n\n".join(clause_blocks),
+        "clause_blocks": clause_blocks,
+        "risks": risks,
+        "keyword_hits": keyword_hits,
+        "llm_calls": llm_calls,
+        "template_sections": template_sections,
+    }
+
+
+def analyze_contract(contract_meta, baseline=None, regs=None, extract=True, assess=True):
+    """Version-aware analysis for a contract in the index / contract store."""
+    with _lock:
+        cache = load_cache()
+        sections = load_contract_sections(contract_meta, cache)
+        save_cache(cache)
+    return analyze_sections(contract_meta["id"], sections, baseline, regs, extract, assess)
+
+
+def analyze_text(lineage_key, contract_text, baseline=None, regs=None, extract=True, assess=False):
+    """Version-aware analysis for raw text, e.g. a re-uploaded PDF in Streamlit."""
+    return analyze_sections(lineage_key, split_sections(contract_text), baseline, regs, extract, assess)
+
+
+def stream_analyze_text(lineage_key, contract_text):
+    """
+    Streaming counterpart of analyze_text(extract=True): yields the cached
+    clause blocks of unchanged sections first, then the LLM output for the
+    changed sections token by token. Results are cached once the stream ends.
+    """
+    sections = split_sections(contract_text)
+    hashes = [text_hash(s) for s in sections]
+    local_blocks = {}
+    with _lock:
+        cache = load_cache()
+        pending = _pending_sections(hashes, range(len(sections)), cache["sections"])
+        if pending:
+            pending = _reuse_template_sections(sections, hashes, pending, cache)
+            pending, local_blocks = _classify_locally(sections, pending)
+            save_cache(cache)
+
+    cached_blocks = [b for i, h in enumerate(hashes) if i not in pending
+                     for b in (local_blocks[i] if i in local_blocks else cache["sections"][h].get("clauses", []))]
+    if cached_blocks:
+        yield "\n\n".join(cached_blocks) + ("\n\n" if pending else "")
+
+    if pending:
+        parts = []
+        for token in stream_extract_clauses("\n\n".join(sections[i] for i in pending)):
+            parts.append(token)
+            yield token
+        with _lock:
+            cache = load_cache()
+            _store_extraction(sections, hashes, pending, "".join(parts), cache["sections"])
+            cache["contracts"][lineage_key] = {"sections": hashes}
+            save_cache(cache)
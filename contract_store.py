@@ -0,0 +1,302 @@
+# contract_store.py
+"""
+Content-addressed, deduplicated storage for contract versions.
+
+Every PDF (or amendment text) is stored once under contracts/blobs/, keyed by
+its SHA-256. A contract version is just a manifest in the metadata store:
+
+    {"base": "<sha of the original PDF>", "amendments": ["<sha>", ...]}
+
+so writing version N+1 only stores the new amendment text and a manifest that
+extends version N's amendment list. Full PDFs are rebuilt on demand from the
+base plus its amendments and kept in a small LRU cache under contracts/cache/.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one writer process only
+    fcntl = None
+
+import telemetry
+from pdf_utils import build_amended_pdf
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CONTRACTS_DIR = os.path.join(BASE_DIR, "contracts")
+
+BLOBS_DIR = os.path.join(CONTRACTS_DIR, "blobs")
+CACHE_DIR = os.path.join(CONTRACTS_DIR, "cache")
+MANIFESTS_FILE = os.path.join(DATA_DIR, "contract_manifests.json")
+
+# Number of materialized PDFs kept around for hot versions (email attachments,
+# repeated downloads). Older ones are evicted by last access time.
+CACHE_MAX_FILES = int(os.getenv("CONTRACT_CACHE_MAX_FILES", 32))
+# Files used this recently are never evicted, so a path returned by
+# materialize() stays valid at least this long
+CACHE_MIN_AGE_SECONDS = float(os.getenv("CONTRACT_CACHE_MIN_AGE_SECONDS", 300))
+
+_lock = threading.RLock()
+_manifests_depth = 0
+
+
+# Low-level helpers
+
+def write_bytes_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _manifest_key(manifest):
+    raw = json.dumps(manifest, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+# Blobs
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def blob_path(digest: str) -> str:
+    return os.path.join(BLOBS_DIR, digest[:2], digest)
+
+
+def put_blob(data: bytes) -> str:
+    """Store bytes once and return their content hash."""
+    digest = blob_hash(data)
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        write_bytes_atomic(path, data)
+    return digest
+
+
+def get_blob(digest: str) -> bytes:
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ Blob not found in contract store: {digest}")
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# Manifests (metadata store)
+
+def load_manifests():
+    if not os.path.exists(MANIFESTS_FILE):
+        return {}
+    with open(MANIFESTS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifests(manifests):
+    data = json.dumps(manifests, indent=2, ensure_ascii=False).encode("utf-8")
+    write_bytes_atomic(MANIFESTS_FILE, data)
+
+
+@contextmanager
+def _manifests_locked():
+    """
+    Exclusive access to the manifests file across threads and processes
+    (pipeline workers, several Streamlit processes); re-entrant per thread.
+    """
+    global _manifests_depth
+    with _lock:
+        if _manifests_depth or fcntl is None:
+            _manifests_depth += 1
+            try:
+                yield
+            finally:
+                _manifests_depth -= 1
+            return
+        os.makedirs(os.path.dirname(MANIFESTS_FILE), exist_ok=True)
+        with open(MANIFESTS_FILE + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            _manifests_depth += 1
+            try:
+                yield
+            finally:
+                _manifests_depth -= 1
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def get_manifest(contract_id, version):
+    with _lock:
+        return load_manifests().get(contract_id, {}).get(str(version))
+
+
+def list_versions(contract_id):
+    with _lock:
+        versions = load_manifests().get(contract_id, {})
+    return sorted(int(v) for v in versions)
+
+
+def _set_manifest(contract_id, version, manifest):
+    with _manifests_locked():
+        manifests = load_manifests()
+        manifests.setdefault(contract_id, {})[str(version)] = manifest
+        save_manifests(manifests)
+
+
+def register_base(contract_id, version, pdf_bytes):
+    """Record `pdf_bytes` as the full content of `contract_id` at `version`."""
+    manifest = {"base": put_blob(pdf_bytes), "amendments": []}
+    _set_manifest(contract_id, version, manifest)
+    return manifest
+
+
+def ensure_manifest(contract_meta):
+    """
+    Make sure the contract's current version is known to the store. Contracts
+    that predate the store are imported from their legacy full PDF file.
+    """
+    version = contract_meta.get("version", 1)
+    manifest = get_manifest(contract_meta["id"], version)
+    if manifest is not None:
+        return manifest
+
+    legacy_pdf = os.path.join(CONTRACTS_DIR, contract_meta["file"])
+    if not os.path.exists(legacy_pdf):
+        raise FileNotFoundError(f"❌ PDF not found at: {legacy_pdf}")
+    with open(legacy_pdf, "rb") as f:
+        return register_base(contract_meta["id"], version, f.read())
+
+
+@telemetry.timed("pdf_version")
+def add_amendment(contract_meta, clause_text):
+    """
+    Record a new version of the contract that appends `clause_text`.
+    Only the amendment text and a manifest are written; the previous
+    version's bytes are never copied.
+    """
+    with _manifests_locked():
+        previous = ensure_manifest(contract_meta)
+        new_version = contract_meta.get("version", 0) + 1
+        manifest = {
+            "base": previous["base"],
+            "amendments": previous["amendments"] + [put_blob(clause_text.encode("utf-8"))],
+        }
+        _set_manifest(contract_meta["id"], new_version, manifest)
+    return new_version, manifest
+
+
+# Materialization
+
+def amendment_texts(manifest):
+    return [get_blob(d).decode("utf-8") for d in manifest["amendments"]]
+
+
+def _evict_cache():
+    recent = time.time() - CACHE_MIN_AGE_SECONDS
+    entries = []
+    for root, _dirs, files in os.walk(CACHE_DIR):
+        for name in files:
+            # Skip builds still in progress in other threads or processes
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+    entries.sort()
+    for mtime, path in entries[:max(0, len(entries) - CACHE_MAX_FILES)]:
+        if mtime > recent:
+            break
+        try:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+
+
+def materialize(contract_id, version):
+    """
+    Return a path to the full PDF for `contract_id` at `version`, rebuilding it
+    from the base blob plus amendments if it is not already cached.
+    """
+    manifest = get_manifest(contract_id, version)
+    if manifest is None:
+        raise KeyError(f"No manifest for {contract_id} v{version}")
+
+    # The cache is keyed by manifest content, so re-recording a version with
+    # different amendments never serves a stale file.
+    cached_pdf = os.path.join(CACHE_DIR, _manifest_key(manifest)[:16], f"{contract_id}-v{version}.pdf")
+    try:
+        # Touching it also protects it from eviction for CACHE_MIN_AGE_SECONDS
+        os.utime(cached_pdf)
+        telemetry.inc("contract_pdf_cache_total", result="hit")
+        return cached_pdf
+    except FileNotFoundError:
+        pass
+    telemetry.inc("contract_pdf_cache_total", result="miss")
+
+    if not manifest["amendments"]:
+        write_bytes_atomic(cached_pdf, get_blob(manifest["base"]))
+    else:
+        os.makedirs(os.path.dirname(cached_pdf), exist_ok=True)
+        # Unique temp name, so concurrent builds of the same version never share a partial file
+        fd, tmp_pdf = tempfile.mkstemp(dir=os.path.dirname(cached_pdf), suffix=".tmp")
+        os.close(fd)
+        try:
+            build_amended_pdf(get_blob(manifest["base"]), amendment_texts(manifest), tmp_pdf)
+            os.replace(tmp_pdf, cached_pdf)
+        except Exception:
+            if os.path.exists(tmp_pdf):
+                os.remove(tmp_pdf)
+            raise
+
+    with _lock:
+        _evict_cache()
+    return cached_pdf
+
+
+def resolve_contract_pdf(contract_meta):
+    """Path to a readable PDF for the contract's current version."""
+    legacy_pdf = os.path.join(CONTRACTS_DIR, contract_meta["file"])
+    if get_manifest(contract_meta["id"], contract_meta.get("version", 1)) is None and os.path.exists(legacy_pdf):
+        return legacy_pdf
+    ensure_manifest(contract_meta)
+    return materialize(contract_meta["id"], contract_meta.get("version", 1))
+
+
+# Maintenance
+
+def migrate_legacy_contracts(contracts, remove_originals=False):
+    """
+    Import legacy `{id}-v{n}.pdf` files into the store. With
+    `remove_originals=True` the full copies are deleted afterwards, since any
+    version can now be rebuilt from the store.
+    """
+    migrated = []
+    for contract_meta in contracts:
+        legacy_pdf = os.path.join(CONTRACTS_DIR, contract_meta["file"])
+        if not os.path.exists(legacy_pdf):
+            continue
+        ensure_manifest(contract_meta)
+        migrated.append(contract_meta["id"])
+        if remove_originals:
+            os.remove(legacy_pdf)
+    return migrated
+
+
+def disk_usage():
+    """Bytes used by blobs and by the materialization cache."""
+    usage = {"blobs": 0, "cache": 0}
+    for key, root_dir in (("blobs", BLOBS_DIR), ("cache", CACHE_DIR)):
+        for root, _dirs, files in os.walk(root_dir):
+            usage[key] += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return usage
@@ -5,6 +5,8 @@ from email.message import EmailMessage
 from pathlib import Path
 import smtplib
 
+import telemetry
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
@@ -13,6 +15,8 @@ SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+# Local relays / test sinks usually speak plain SMTP
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
 
 def build_message(subject: str, to_email: str, plain: str, html: str, attachment_path: str = None) -> EmailMessage:
     msg = EmailMessage()
@@ -33,6 +37,7 @@ def build_message(subject: str, to_email: str, plain: str, html: str, attachment
             logger.warning("Attachment %s not found", attachment_path)
     return msg
 
+@telemetry.timed("smtp_send")
 def send_email_smtp(subject: str, to_email: str, plain: str, html: str, attachment_path: str = None, timeout: int = 30) -> bool:
     if not SMTP_USER or not SMTP_PASSWORD:
         logger.error("SMTP credentials are missing. Set SMTP_USER and SMTP_PASSWORD in your environment.")
@@ -44,12 +49,15 @@ def send_email_smtp(subject: str, to_email: str, plain: str, html: str, attachme
         with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=timeout) as smtp:
             smtp.ehlo()
             # Gmail uses STARTTLS on port 587
-            smtp.starttls()
-            smtp.ehlo()
+            if SMTP_STARTTLS:
+                smtp.starttls()
+                smtp.ehlo()
             smtp.login(SMTP_USER, SMTP_PASSWORD)
             smtp.send_message(msg)
         logger.info("Email sent to %s via SMTP (Gmail).", to_email)
+        telemetry.inc("smtp_sends_total", result="sent")
         return True
     except Exception as e:
         logger.exception("Failed to send SMTP email: %s", e)
+        telemetry.inc("smtp_sends_total", result="failed")
         return False
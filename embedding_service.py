@@ -0,0 +1,339 @@
+# embedding_service.py
+"""
+Shared embedding computation for RAG and clause/regulation similarity.
+
+- One model per process (via the services registry), configurable batch size
+  and a CPU thread count tuned to the host.
+- Persistent cache from text hash to vector, stored as a memory-mapped
+  float32 array, so text that was embedded before is never recomputed.
+- Backends for all-MiniLM-L6-v2 on CPU:
+    torch       sentence-transformers, fp32 (reference)
+    int8        torch dynamic int8 quantization of the Linear layers
+    onnx        ONNX Runtime, fp32 export shipped with the model repo
+    onnx-int8   ONNX Runtime, int8-quantized export shipped with the model repo
+  Run `python bench_embeddings.py` for embeddings/sec and accuracy deltas.
+"""
+import os
+import hashlib
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one writer process only
+    fcntl = None
+
+import services
+import telemetry
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBED_DIM = 384
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", 0))
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.join(DATA_DIR, "embedding_cache"))
+
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_quint8_avx2.onnx",
+}
+BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+
+
+def default_thread_count():
+    """CPUs actually available to this process (respects affinity / cgroups)."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+# Persistent vector cache
+
+class VectorCache:
+    """
+    Append-only cache of text hash -> vector. Vectors live in a memory-mapped
+    `<name>.f32` file; the 16-byte keys are appended to `<name>.keys` only
+    after their vectors are written, so a crash never exposes a torn row.
+    Several processes can share the files: appends hold an exclusive lock on
+    `<name>.lock` and pick up rows other processes added first.
+    """
+
+    def __init__(self, directory, name, dim, initial_capacity=1024):
+        os.makedirs(directory, exist_ok=True)
+        self.dim = dim
+        self.vectors_path = os.path.join(directory, f"{name}.f32")
+        self.keys_path = os.path.join(directory, f"{name}.keys")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self._lock = threading.Lock()
+
+        self._rows = {}
+        self._row_count = 0
+        self._capacity = 0
+        self._vectors = None
+        with self._lock, self._file_lock(exclusive=True):
+            self._grow(initial_capacity)
+            self._sync()
+
+    def __len__(self):
+        return len(self._rows)
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _grow(self, capacity):
+        # Another process may have grown the file already; never shrink it
+        existing = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+        capacity = max(capacity, existing)
+        if capacity <= self._capacity:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        if existing < capacity:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _sync(self):
+        """Read keys appended (by any process) since the last sync; caller holds the file lock."""
+        if not os.path.exists(self.keys_path):
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._row_count * 16)
+            raw = f.read()
+        added = len(raw) // 16
+        if not added:
+            return
+        for offset in range(added):
+            self._rows.setdefault(raw[offset * 16:(offset + 1) * 16], self._row_count + offset)
+        self._row_count += added
+        if self._row_count > self._capacity:
+            self._grow(self._row_count)
+
+    def lookup(self, keys):
+        """Return (vectors, missing_indices); rows for missing keys are zero."""
+        out = np.zeros((len(keys), self.dim), dtype=np.float32)
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                # Another process may have embedded them since
+                with self._file_lock(exclusive=False):
+                    self._sync()
+            missing = []
+            for i, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is None:
+                    missing.append(i)
+                else:
+                    out[i] = self._vectors[row]
+        return out, missing
+
+    def store(self, keys, vectors):
+        with self._lock, self._file_lock(exclusive=True):
+            # Rows are numbered by the shared keys file, not by this process's view of it
+            self._sync()
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows:
+                    new.setdefault(key, vector)
+            if not new:
+                return
+            start = self._row_count
+            if start + len(new) > self._capacity:
+                self._grow(max(self._capacity * 2, start + len(new)))
+            for offset, vector in enumerate(new.values()):
+                self._vectors[start + offset] = vector
+            self._vectors.flush()
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new))
+            for offset, key in enumerate(new):
+                self._rows[key] = start + offset
+            self._row_count += len(new)
+
+
+# Backends
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, threads):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        torch.set_num_threads(threads)
+        self.model = SentenceTransformer(EMBED_MODEL, device="cpu")
+
+    def encode(self, texts, batch_size):
+        return self.model.encode(
+            texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+        ).astype(np.float32)
+
+
+class Int8TorchBackend(TorchBackend):
+    name = "int8"
+
+    def __init__(self, threads):
+        super().__init__(threads)
+        import torch
+
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, threads, onnx_file=ONNX_FILES["onnx"]):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("EMBED_BACKEND=onnx requires `pip install onnxruntime`") from e
+        from huggingface_hub import hf_hub_download
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            hf_hub_download(EMBED_MODEL, onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(EMBED_MODEL)
+
+    def encode(self, texts, batch_size):
+        out = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True, max_length=256, return_tensors="np"
+            )
+            feeds = {k: v.astype(np.int64) for k, v in batch.items() if k in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real tokens, then L2 normalization (as in the
+            # sentence-transformers pipeline for this model)
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled.astype(np.float32))
+        return np.vstack(out) if out else np.zeros((0, EMBED_DIM), dtype=np.float32)
+
+
+class OnnxInt8Backend(OnnxBackend):
+    name = "onnx-int8"
+
+    def __init__(self, threads):
+        super().__init__(threads, ONNX_FILES["onnx-int8"])
+
+
+BACKEND_CLASSES = {
+    "torch": TorchBackend,
+    "int8": Int8TorchBackend,
+    "onnx": OnnxBackend,
+    "onnx-int8": OnnxInt8Backend,
+}
+
+
+# Service
+
+class EmbeddingService:
+    def __init__(self, backend=EMBED_BACKEND, batch_size=EMBED_BATCH_SIZE, threads=EMBED_THREADS, cache_dir=EMBED_CACHE_DIR):
+        if backend not in BACKEND_CLASSES:
+            raise ValueError(f"Unknown embedding backend {backend!r}; choose one of {BACKENDS}")
+        self.backend_name = backend
+        self.batch_size = batch_size
+        self.threads = threads or default_thread_count()
+        self._backend = None
+        self._backend_lock = threading.Lock()
+        # Different backends give slightly different vectors, so each gets its own cache
+        self.cache = VectorCache(cache_dir, f"minilm-l6-{backend}", EMBED_DIM) if cache_dir else None
+        self.stats = {"hits": 0, "misses": 0}
+
+    @property
+    def backend(self):
+        with self._backend_lock:
+            if self._backend is None:
+                self._backend = BACKEND_CLASSES[self.backend_name](self.threads)
+        return self._backend
+
+    def embed(self, texts):
+        """Return an (n, EMBED_DIM) float32 array of L2-normalized vectors."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, EMBED_DIM), dtype=np.float32)
+
+        keys = [text_key(t) for t in texts]
+        if self.cache is not None:
+            vectors, missing = self.cache.lookup(keys)
+        else:
+            vectors, missing = np.zeros((len(texts), EMBED_DIM), dtype=np.float32), list(range(len(texts)))
+
+        self.stats["hits"] += len(texts) - len(missing)
+        self.stats["misses"] += len(missing)
+        telemetry.inc("embedding_cache_total", len(texts) - len(missing), result="hit")
+        telemetry.inc("embedding_cache_total", len(missing), result="miss")
+
+        if missing:
+            # Deduplicate within the request before computing
+            unique = {}
+            for i in missing:
+                unique.setdefault(keys[i], texts[i])
+            with telemetry.span("embed", backend=self.backend_name, texts=len(unique)):
+                computed = self.backend.encode(list(unique.values()), self.batch_size)
+            by_key = dict(zip(unique.keys(), computed))
+            for i in missing:
+                vectors[i] = by_key[keys[i]]
+            if self.cache is not None:
+                self.cache.store(list(by_key.keys()), list(by_key.values()))
+
+        return vectors
+
+    # LangChain Embeddings protocol
+    def embed_documents(self, texts):
+        return self.embed(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed([text])[0].tolist()
+
+    def as_langchain(self):
+        """Wrap as a langchain_core Embeddings object (FAISS requires the subclass)."""
+        from langchain_core.embeddings import Embeddings
+
+        service = self
+
+        class ServiceEmbeddings(Embeddings):
+            def embed_documents(self, texts):
+                return service.embed_documents(texts)
+
+            def embed_query(self, text):
+                return service.embed_query(text)
+
+        return ServiceEmbeddings()
+
+
+services.register("embedding_service", EmbeddingService)
+
+
+def get_embedding_service():
+    return services.get("embedding_service")
+
+
+def embed_texts(texts):
+    return get_embedding_service().embed(texts)
@@ -0,0 +1,108 @@
+# eval_retrieval.py
+"""
+Offline retrieval evaluation for the RAG chatbot.
+
+For each query in data/retrieval_eval.json, a retrieved chunk counts as
+relevant when it contains one of the expected excerpts. Reports recall@k and
+p50/p95 retrieval latency per method:
+
+    dense     FAISS only (the previous behaviour)
+    bm25      sparse only
+    hybrid    BM25 + dense with reciprocal-rank fusion
+    rerank    hybrid + cross-encoder re-ranking under RERANK_BUDGET_MS
+
+    python eval_retrieval.py [--methods dense,bm25,hybrid,rerank] [--k 1,3,5]
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+import hybrid_retriever
+import rag_module
+
+EVAL_FILE = "data/retrieval_eval.json"
+METHODS = ("dense", "bm25", "hybrid", "rerank")
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text).lower()
+
+
+def is_relevant(chunk, expected):
+    chunk = _normalize(chunk)
+    return any(_normalize(e) in chunk for e in expected)
+
+
+def retrieve(method, query, k, faiss_index, bm25):
+    if method == "dense":
+        return rag_module.dense_retrieve(query, faiss_index, k)
+    if method == "bm25":
+        return [bm25.chunks[d] for d, _score in bm25.search(query, k)]
+    return hybrid_retriever.hybrid_search(query, faiss_index, bm25, k, use_rerank=(method == "rerank"))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def evaluate(methods, ks, cases):
+    needs_dense = any(m != "bm25" for m in methods)
+    faiss_index = rag_module.get_faiss_index() if needs_dense else None
+    bm25_saved = os.path.exists(os.path.join(str(rag_module.INDEX_PATH), hybrid_retriever.BM25_FILE))
+    if needs_dense or not bm25_saved:
+        # Builds (and saves) the BM25 index from the FAISS chunks when it is missing or stale
+        bm25 = rag_module.get_bm25_index()
+    else:
+        bm25 = hybrid_retriever.BM25Index.load(str(rag_module.INDEX_PATH))
+
+    results = {}
+    for method in methods:
+        retrieve(method, cases[0]["query"], max(ks), faiss_index, bm25)  # warm up (model loads)
+        hits = {k: 0 for k in ks}
+        latencies = []
+        for case in cases:
+            start = time.perf_counter()
+            chunks = retrieve(method, case["query"], max(ks), faiss_index, bm25)
+            latencies.append((time.perf_counter() - start) * 1000)
+            for k in ks:
+                if any(is_relevant(c, case["expected"]) for c in chunks[:k]):
+                    hits[k] += 1
+        results[method] = {
+            **{f"recall@{k}": round(hits[k] / len(cases), 3) for k in ks},
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--methods", default="dense,bm25,hybrid")
+    parser.add_argument("--k", default="1,3,5")
+    parser.add_argument("--cases", default=EVAL_FILE)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    methods = [m.strip() for m in args.methods.split(",") if m.strip()]
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        parser.error(f"unknown methods: {sorted(unknown)}")
+    ks = sorted(int(k) for k in args.k.split(","))
+    with open(args.cases, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+
+    results = evaluate(methods, ks, cases)
+    print(f"{len(cases)} queries")
+    for method, row in results.items():
+        print(f"{method:8s} " + "  ".join(f"{key}={value}" for key, value in row.items()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
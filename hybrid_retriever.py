@@ -0,0 +1,195 @@
+# hybrid_retriever.py
+"""
+Hybrid sparse + dense retrieval for the RAG chatbot.
+
+- A BM25 inverted index over the same chunks as the FAISS index, persisted
+  next to it in faiss_index/bm25.json. It catches exact terms dense vectors
+  blur together ("Article 17", "72 hours", "data localisation").
+- Sparse and dense rankings are fused with reciprocal-rank fusion (RRF).
+- Optionally (RERANK=1) the top-N fused chunks are re-scored by a small local
+  cross-encoder, stopping when RERANK_BUDGET_MS runs out.
+
+Run `python eval_retrieval.py` for recall@k and latency per method.
+"""
+import os
+import re
+import json
+import math
+import time
+import hashlib
+
+import services
+import telemetry
+
+BM25_FILE = "bm25.json"
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+# How many candidates each retriever contributes before fusion
+CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+
+RERANK = os.getenv("RERANK", "0") == "1"
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 10))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 150))
+RERANK_BATCH = 4
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or",
+    "that", "the", "this", "to", "was", "were", "what", "when", "which", "who", "with", "how", "does",
+    "do", "shall", "must", "any", "all",
+}
+
+
+def tokenize(text):
+    # Digits are kept so that article / section numbers are searchable
+    return [t for t in re.findall(r"\w+", (text or "").lower()) if t not in STOPWORDS]
+
+
+def chunks_fingerprint(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class BM25Index:
+    def __init__(self, chunks, postings, doc_len, fingerprint):
+        self.chunks = chunks
+        self.postings = postings  # term -> [[doc_id, tf], ...]
+        self.doc_len = doc_len
+        self.avgdl = (sum(doc_len) / len(doc_len)) if doc_len else 0.0
+        self.fingerprint = fingerprint
+        self.ids = {chunk: i for i, chunk in enumerate(chunks)}
+        n = len(chunks)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, chunks):
+        postings = {}
+        doc_len = []
+        for doc_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            doc_len.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append([doc_id, tf])
+        return cls(list(chunks), postings, doc_len, chunks_fingerprint(chunks))
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        data = {
+            "fingerprint": self.fingerprint,
+            "chunks": self.chunks,
+            "doc_len": self.doc_len,
+            "postings": self.postings,
+        }
+        tmp_path = os.path.join(directory, BM25_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(directory, BM25_FILE))
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, BM25_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["chunks"], data["postings"], data["doc_len"], data["fingerprint"])
+
+    def search(self, query, k):
+        """[(doc_id, score)] best first."""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[doc_id] / (self.avgdl or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+# FAISS <-> BM25 plumbing
+
+def faiss_chunks(faiss_index):
+    """Chunk texts in FAISS row order, so BM25 doc ids line up with the vectors."""
+    return [
+        faiss_index.docstore.search(faiss_index.index_to_docstore_id[i]).page_content
+        for i in range(len(faiss_index.index_to_docstore_id))
+    ]
+
+
+def build_or_load_bm25(faiss_index, directory):
+    """Load the persisted BM25 index, rebuilding it if the FAISS chunks changed."""
+    chunks = faiss_chunks(faiss_index)
+    path = os.path.join(directory, BM25_FILE)
+    if os.path.exists(path):
+        bm25 = BM25Index.load(directory)
+        if bm25.fingerprint == chunks_fingerprint(chunks):
+            return bm25
+    print("Building BM25 index from FAISS chunks...")
+    bm25 = BM25Index.build(chunks)
+    bm25.save(directory)
+    return bm25
+
+
+# Retrieval
+
+def dense_search(query, faiss_index, bm25, k):
+    """[(doc_id, distance)] from FAISS, mapped onto BM25 doc ids."""
+    results = faiss_index.similarity_search_with_score(query, k=k)
+    return [(bm25.ids[doc.page_content], score) for doc, score in results if doc.page_content in bm25.ids]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse several best-first lists of doc ids; returns doc ids best first."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=lambda doc_id: (-fused[doc_id], doc_id))
+
+
+def _make_cross_encoder():
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(RERANK_MODEL, device="cpu")
+
+
+services.register("cross_encoder", _make_cross_encoder)
+
+
+def rerank(query, chunks, doc_ids, budget_ms=RERANK_BUDGET_MS):
+    """
+    Re-order doc ids by cross-encoder score, batch by batch, until the time
+    budget is spent; chunks not scored in time keep their fused order after
+    the scored ones.
+    """
+    model = services.get("cross_encoder")
+    deadline = time.perf_counter() + budget_ms / 1000
+    scored = []
+    pos = 0
+    while pos < len(doc_ids) and time.perf_counter() < deadline:
+        batch = doc_ids[pos:pos + RERANK_BATCH]
+        scores = model.predict([(query, chunks[d]) for d in batch])
+        scored.extend(zip(batch, scores))
+        pos += len(batch)
+    scored.sort(key=lambda item: -item[1])
+    return [d for d, _score in scored] + doc_ids[pos:]
+
+
+def hybrid_search(query, faiss_index, bm25, k, candidates=CANDIDATES, use_rerank=RERANK):
+    """Top-k chunk texts by RRF of BM25 and dense rankings (optionally re-ranked)."""
+    with telemetry.span("bm25_search"):
+        sparse = [doc_id for doc_id, _ in bm25.search(query, candidates)]
+    with telemetry.span("faiss_search"):
+        dense = [doc_id for doc_id, _ in dense_search(query, faiss_index, bm25, candidates)]
+    fused = reciprocal_rank_fusion([sparse, dense])
+    if use_rerank:
+        with telemetry.span("rerank"):
+            fused = rerank(query, bm25.chunks, fused[:RERANK_TOP_N]) + fused[RERANK_TOP_N:]
+    return [bm25.chunks[d] for d in fused[:k]]
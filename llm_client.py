@@ -0,0 +1,135 @@
+# llm_client.py
+"""Shared, lazily created Groq client used by every LLM call."""
+import os
+import time
+import threading
+
+import services
+import telemetry
+
+MODEL = "llama-3.3-70b-versatile"
+
+
+def _make_groq_client():
+    # Imported here so that importing the app does not pull in the HTTP stack
+    from dotenv import load_dotenv
+    from groq import Groq
+
+    load_dotenv()
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise RuntimeError("Missing GROQ_API_KEY in .env file")
+    return Groq(api_key=api_key)
+
+
+services.register("groq", _make_groq_client)
+
+
+def get_client():
+    return services.get("groq")
+
+
+# Per-stage token usage and latency, e.g.
+# {"risk": {"calls": 12, "input_tokens": 9800, "output_tokens": 1100, "latency_s": 8.4}}
+USAGE = {}
+_usage_lock = threading.Lock()
+
+
+def record_usage(label, input_tokens, output_tokens, latency_s):
+    with _usage_lock:
+        stage = USAGE.setdefault(label, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "latency_s": 0.0})
+        stage["calls"] += 1
+        stage["input_tokens"] += input_tokens
+        stage["output_tokens"] += output_tokens
+        stage["latency_s"] += latency_s
+    telemetry.inc("llm_calls_total", stage=label)
+    telemetry.inc("llm_tokens_total", input_tokens, stage=label, direction="input")
+    telemetry.inc("llm_tokens_total", output_tokens, stage=label, direction="output")
+
+
+def usage_report():
+    """Per-stage totals plus average tokens and latency per call."""
+    with _usage_lock:
+        report = {}
+        for label, stage in USAGE.items():
+            calls = max(stage["calls"], 1)
+            report[label] = dict(
+                stage,
+                avg_input_tokens=stage["input_tokens"] / calls,
+                avg_output_tokens=stage["output_tokens"] / calls,
+                avg_latency_s=stage["latency_s"] / calls,
+            )
+        return report
+
+
+def _usage_counts(usage, prompt, output):
+    """Provider-reported token counts, or local counts when missing."""
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return usage.prompt_tokens, usage.completion_tokens or 0
+    from prompt_builder import count_tokens
+    return count_tokens(prompt), count_tokens(output)
+
+
+def complete(prompt: str, temperature: float, max_tokens: int, label: str = "llm") -> str:
+    start = time.perf_counter()
+    with telemetry.span(f"llm_{label}"):
+        res = get_client().chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+    content = res.choices[0].message.content
+    record_usage(label, *_usage_counts(getattr(res, "usage", None), prompt, content or ""), time.perf_counter() - start)
+    return content
+
+
+# Streaming
+
+# Most recent streaming timings per stage label, e.g.
+# {"rag": {"ttft_s": 0.41, "total_s": 3.2, "chunks": 212}}
+STREAM_TIMINGS = {}
+
+
+def stream(prompt: str, temperature: float, max_tokens: int, label: str = "llm"):
+    """
+    Yield the completion as text deltas. Time-to-first-token and total
+    latency are recorded separately in STREAM_TIMINGS[label].
+    """
+    start = time.perf_counter()
+    first = None
+    chunks = 0
+    parts = []
+    usage = None
+    res = get_client().chat.completions.create(
+        model=MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True,
+    )
+    try:
+        for chunk in res:
+            # Groq reports usage on the final chunk under x_groq
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(x_groq, "usage", None) or getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if first is None:
+                first = time.perf_counter() - start
+                telemetry.observe("llm_time_to_first_token_seconds", first, stage=label)
+            chunks += 1
+            parts.append(delta)
+            yield delta
+    finally:
+        total = time.perf_counter() - start
+        STREAM_TIMINGS[label] = {
+            "ttft_s": first,
+            "total_s": total,
+            "chunks": chunks,
+        }
+        telemetry.observe("compliance_stage_seconds", total, stage=f"llm_{label}")
+        record_usage(label, *_usage_counts(usage, prompt, "".join(parts)), total)
@@ -0,0 +1,168 @@
+# loadtest_streamlit.py
+"""
+Load test for streamlit_app.py: N concurrent reviewer sessions in one process.
+
+Each session is a streamlit.testing AppTest of the real app that starts with
+one of a few synthetic contracts already in the session cache (AppTest cannot
+drive the file uploader), then walks the pages --rounds times. The LLM is
+bench_fakes.FakeGroq and all state goes to a throwaway sandbox, so it needs
+no network and never touches data/ or contracts/.
+
+Reports p50/p95 latency per page, process memory per session (RSS growth
+after a warm-up session divided by N), session cache usage and any errors.
+
+    python loadtest_streamlit.py [--sessions 50] [--contracts 5] [--rounds 2] [--llm-latency-ms 200]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bench_fakes
+import services
+from bench_pipeline import percentile, sandbox
+from session_cache import BlobCache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(BASE_DIR, "streamlit_app.py")
+PAGES = ["1. Key Clauses", "2. Risk Assessment", "3. RAG Chatbot", "4. Regulatory Issues & Email", "5. Admin: Metrics"]
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Session:
+    def __init__(self, number, pdf_key, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.number = number
+        self.app = AppTest.from_file(APP_FILE, default_timeout=timeout)
+        self.app.session_state["uploaded_key"] = pdf_key
+        self.app.session_state["uploaded_filename"] = f"contract-{number:03d}.pdf"
+        self.latencies = {}
+        self.errors = []
+
+    def _timed(self, page, action):
+        start = time.perf_counter()
+        try:
+            action()
+        except Exception as e:
+            self.errors.append(f"session {self.number} {page}: {e}")
+            return
+        self.latencies.setdefault(page, []).append(time.perf_counter() - start)
+        self.errors.extend(f"session {self.number} {page}: {exc.value}" for exc in self.app.exception)
+
+    def walk(self, pages, rounds):
+        self._timed(PAGES[0], self.app.run)
+        for _ in range(rounds):
+            for page in pages:
+                self._timed(page, lambda: self.app.sidebar.radio[0].set_value(page).run())
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--contracts", type=int, default=5, help="distinct PDFs shared by the sessions")
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--regs", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--pages", default=",".join(p.split(".")[0] for p in PAGES), help="page numbers, e.g. 1,2,4")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-tokens-per-s", type=float, default=400.0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per page run, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        import streamlit.testing.v1  # noqa: F401
+    except ImportError:
+        sys.exit("streamlit is not installed; pip install streamlit")
+
+    wanted = {p.strip() for p in args.pages.split(",")}
+    pages = [p for p in PAGES if p.split(".")[0] in wanted]
+
+    root = tempfile.mkdtemp(prefix="loadtest-streamlit-")
+    try:
+        # STEP 1: sandboxed stores, fake LLM, synthetic contracts in the session cache
+        sandbox(root)
+        import regulatory_tracker
+
+        regs = bench_fakes.synthetic_regulations(args.regs, seed=args.seed)
+        with open(regulatory_tracker.REGS_FILE, "w", encoding="utf-8") as f:
+            json.dump(regs, f)
+        services.override("groq", bench_fakes.FakeGroq(args.llm_latency_ms, args.llm_tokens_per_s))
+        cache = BlobCache(os.path.join(root, "session_cache"))
+        services.override("session_cache", cache)
+        keys = [
+            cache.put(pdf_bytes)
+            for _meta, pdf_bytes, _text in bench_fakes.synthetic_contracts(args.contracts, args.sections, seed=args.seed)
+        ]
+
+        # STEP 2: one warm-up session loads the modules and shared resources
+        print("🔥 Warm-up session...")
+        Session(0, keys[0], args.timeout).walk(pages, 1)
+        baseline_rss = rss_bytes()
+
+        # STEP 3: N concurrent sessions, all kept alive until memory is measured
+        print(f"🚀 {args.sessions} concurrent sessions over {len(keys)} contract(s), {args.rounds} round(s)...")
+        sessions = [Session(i + 1, keys[i % len(keys)], args.timeout) for i in range(args.sessions)]
+        peak = [baseline_rss]
+        done = threading.Event()
+
+        def sample_rss():
+            while not done.wait(0.2):
+                peak[0] = max(peak[0], rss_bytes())
+
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.sessions) as pool:
+            list(pool.map(lambda s: s.walk(pages, args.rounds), sessions))
+        elapsed = time.perf_counter() - start
+        done.set()
+        final_rss = rss_bytes()
+
+        # STEP 4: report
+        mb = 1024 * 1024
+        print(f"\n{'page':30s} {'runs':>6s} {'p50 ms':>9s} {'p95 ms':>9s}")
+        everything = []
+        for page in PAGES:
+            values = [v for s in sessions for v in s.latencies.get(page, [])]
+            if values:
+                everything.extend(values)
+                print(f"{page:30s} {len(values):6d} {percentile(values, 0.5) * 1000:9.1f} "
+                      f"{percentile(values, 0.95) * 1000:9.1f}")
+        print(f"{'all pages':30s} {len(everything):6d} {percentile(everything, 0.5) * 1000:9.1f} "
+              f"{percentile(everything, 0.95) * 1000:9.1f}")
+        print(f"\nWall time: {elapsed:.1f}s")
+        print(f"RSS: {baseline_rss / mb:.1f} MB after warm-up, {final_rss / mb:.1f} MB with {args.sessions} sessions "
+              f"(peak {peak[0] / mb:.1f} MB) -> {(final_rss - baseline_rss) / max(1, args.sessions) / mb:.2f} MB/session")
+        print(f"Session cache: {cache.usage()}")
+        errors = [e for s in sessions for e in s.errors]
+        if errors:
+            print(f"\n⚠️ {len(errors)} error(s):")
+            for error in errors[:20]:
+                print(f"  {error}")
+            sys.exit(1)
+        print("✅ No errors.")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
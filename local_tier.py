@@ -0,0 +1,349 @@
+# local_tier.py
+"""
+Local CPU tier in front of the remote LLM for clause typing and risk triage.
+
+With LOCAL_TIER_RECORD=1, every clause extraction and risk verdict the LLM
+gives is recorded as a labelled example (data/local_tier/examples.jsonl, which
+holds contract text; compacted to the latest examples beyond
+LOCAL_TIER_MAX_BYTES):
+    kind "clause": section text -> clause type of its only extracted clause,
+                   "None", or "Multiple" (never answered locally)
+    kind "risk":   clause text  -> Low / Medium / High (only from an explicit "Risk:" line)
+`python local_tier.py train` fits a softmax (multinomial logistic)
+regression per kind over MiniLM embeddings (LOCAL_TIER_FEATURES=embeddings)
+or hashed word uni/bigrams (=hashing, no model download).
+
+With LOCAL_TIER=1, clause_extractor/risk_assessor callers ask `classify`
+first: a prediction with confidence >= LOCAL_TIER_CONFIDENCE is used as is,
+anything else escalates to the LLM (whose answer becomes a new example).
+Local risk verdicts look only at the clause, not at the compliance baseline.
+contract_analysis never caches local answers, so they are asked again once
+the tier is off or the model has been retrained.
+
+    python local_tier.py train [--kind risk] [--features hashing] [--holdout 0.2]
+    python local_tier.py stats
+"""
+import os
+import re
+import json
+import hashlib
+import argparse
+import threading
+from collections import Counter
+
+import services
+import telemetry
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCAL_TIER_DIR = os.getenv("LOCAL_TIER_DIR", os.path.join(BASE_DIR, "data", "local_tier"))
+EXAMPLES_FILE = os.path.join(LOCAL_TIER_DIR, "examples.jsonl")
+
+LOCAL_TIER = os.getenv("LOCAL_TIER", "0") == "1"
+LOCAL_TIER_CONFIDENCE = float(os.getenv("LOCAL_TIER_CONFIDENCE", 0.9))
+LOCAL_TIER_RECORD = os.getenv("LOCAL_TIER_RECORD", "0") == "1"
+LOCAL_TIER_MAX_BYTES = int(os.getenv("LOCAL_TIER_MAX_BYTES", 50 * 1024 * 1024))
+LOCAL_TIER_FEATURES = os.getenv("LOCAL_TIER_FEATURES", "embeddings")
+
+KINDS = ("clause", "risk")
+NO_CLAUSE = "None"
+# A section with several clauses cannot be answered with one local clause block
+MULTIPLE_CLAUSES = "Multiple"
+RISK_LEVELS = ("Low", "Medium", "High")
+# Classes with fewer examples than this are never predicted locally
+MIN_CLASS_EXAMPLES = 5
+HASH_DIM = 1 << 14
+
+_record_lock = threading.Lock()
+
+
+# Labels
+
+def risk_label(verdict: str, strict=False):
+    """
+    Low/Medium/High from an LLM risk verdict, or None if it names none. With
+    strict=True only an explicit "Risk: <level>" counts, not a level word
+    somewhere in the explanation (used for training labels); otherwise the
+    highest level mentioned is taken, as for verdicts cached before the
+    prompt asked for a "Risk:" line.
+    """
+    match = re.search(r"(?i)risk\s*(?:level)?\s*[:\-]?\s*\**\s*(low|medium|high)", verdict or "")
+    if match:
+        return match.group(1).capitalize()
+    if strict:
+        return None
+    found = [level for level in reversed(RISK_LEVELS) if re.search(rf"(?i)\b{level}\b", verdict or "")]
+    return found[0] if found else None
+
+
+def clause_label(blocks):
+    """Clause type of the only `CLAUSE:` block, NO_CLAUSE, or MULTIPLE_CLAUSES."""
+    types = [m.group(1).strip() for m in (re.match(r"\s*CLAUSE:\s*(.+)", block) for block in blocks) if m]
+    if len(types) > 1:
+        return MULTIPLE_CLAUSES
+    return types[0] if types else NO_CLAUSE
+
+
+def risk_verdict(label, confidence):
+    return (f"Risk: {label}\nExplanation: Classified locally as a typical {label.lower()}-risk clause "
+            f"(confidence {confidence:.2f}); not reviewed by the LLM.")
+
+
+def clause_blocks(label, confidence, section_text):
+    """Clause output for a locally typed section, in the LLM's CLAUSE/Summary/Snippet format."""
+    if label == NO_CLAUSE:
+        return []
+    lines = section_text.strip().splitlines()
+    body = " ".join(" ".join(lines[1:] if len(lines) > 1 else lines).split())
+    return [f"CLAUSE: {label}\nSummary: {label} clause, classified locally (confidence {confidence:.2f}).\n"
+            f"Snippet: {body[:400]}"]
+
+
+# Training data
+
+def record(kind, examples):
+    """Append (text, label) pairs the LLM produced; unlabelled ones are skipped."""
+    if not LOCAL_TIER_RECORD:
+        return
+    lines = [json.dumps({"kind": kind, "text": text, "label": label}, ensure_ascii=False)
+             for text, label in examples if text and text.strip() and label]
+    if not lines:
+        return
+    with _record_lock:
+        os.makedirs(LOCAL_TIER_DIR, exist_ok=True)
+        with open(EXAMPLES_FILE, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        if os.path.getsize(EXAMPLES_FILE) > LOCAL_TIER_MAX_BYTES:
+            _compact(LOCAL_TIER_MAX_BYTES // 2)
+
+
+def _compact(max_bytes):
+    """Keep the latest example per (kind, text), newest first, within `max_bytes`."""
+    latest = {}
+    with open(EXAMPLES_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+                latest.pop((row["kind"], row["text"]), None)
+                latest[(row["kind"], row["text"])] = line if line.endswith("\n") else line + "\n"
+            except (ValueError, KeyError):
+                continue
+    kept, size = [], 0
+    for line in reversed(list(latest.values())):
+        size += len(line.encode("utf-8"))
+        if size > max_bytes:
+            break
+        kept.append(line)
+    tmp_path = EXAMPLES_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(reversed(kept))
+    os.replace(tmp_path, EXAMPLES_FILE)
+
+
+def load_examples(kind, path=None):
+    """[(text, label)] for `kind`, one per distinct text (latest label wins)."""
+    path = path or EXAMPLES_FILE
+    latest = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get("kind") == kind:
+                    latest[hashlib.sha256(row["text"].encode("utf-8")).digest()] = (row["text"], row["label"])
+    return list(latest.values())
+
+
+# Features
+
+def hashing_features(texts):
+    import numpy as np
+
+    X = np.zeros((len(texts), HASH_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = re.findall(r"[a-z]+", text.lower())
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            X[row, int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little") % HASH_DIM] += 1
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    return X / np.maximum(norms, 1e-12)
+
+
+def embedding_features(texts):
+    from embedding_service import embed_texts
+
+    return embed_texts(texts)
+
+
+FEATURES = {"hashing": hashing_features, "embeddings": embedding_features}
+
+
+# Model
+
+class SoftmaxClassifier:
+    """Multinomial logistic regression, full-batch gradient descent with L2."""
+
+    def __init__(self, classes, weights, bias, features):
+        self.classes = list(classes)
+        self.weights = weights
+        self.bias = bias
+        self.features = features
+
+    @classmethod
+    def fit(cls, X, labels, features, epochs=300, lr=1.0, l2=1e-4):
+        import numpy as np
+
+        classes = sorted(set(labels))
+        y = np.array([classes.index(label) for label in labels])
+        onehot = np.eye(len(classes), dtype=np.float32)[y]
+        W = np.zeros((X.shape[1], len(classes)), dtype=np.float32)
+        b = np.zeros(len(classes), dtype=np.float32)
+        for _ in range(epochs):
+            probs = _softmax(X @ W + b)
+            grad = (probs - onehot) / len(y)
+            W -= lr * (X.T @ grad + l2 * W)
+            b -= lr * grad.sum(axis=0)
+        return cls(classes, W, b, features)
+
+    def predict_proba(self, X):
+        return _softmax(X @ self.weights + self.bias)
+
+    def save(self, path):
+        import numpy as np
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(f, weights=self.weights, bias=self.bias, classes=np.array(self.classes), features=self.features)
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+
+        data = np.load(path)
+        return cls(data["classes"].tolist(), data["weights"], data["bias"], str(data["features"]))
+
+
+def _softmax(z):
+    import numpy as np
+
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def model_path(kind):
+    return os.path.join(LOCAL_TIER_DIR, f"{kind}.npz")
+
+
+class LocalTier:
+    """Trained classifiers per kind, loaded on first use; kinds without a model always escalate."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, kind):
+        with self._lock:
+            if kind not in self._models:
+                path = os.path.join(self.directory, f"{kind}.npz") if self.directory else model_path(kind)
+                self._models[kind] = SoftmaxClassifier.load(path) if os.path.exists(path) else None
+            return self._models[kind]
+
+    def predict(self, kind, texts):
+        """[(label, confidence)] for every text, regardless of the threshold."""
+        model = self.model(kind)
+        if model is None or not texts:
+            return [(None, 0.0)] * len(texts)
+        with telemetry.span("local_classify", kind=kind, texts=len(texts)):
+            probs = model.predict_proba(FEATURES[model.features](texts))
+        best = probs.argmax(axis=1)
+        return [(model.classes[j], float(probs[i, j])) for i, j in enumerate(best)]
+
+    def classify(self, kind, texts, threshold=None):
+        """[(label, confidence) or None]; None means: escalate to the LLM."""
+        threshold = LOCAL_TIER_CONFIDENCE if threshold is None else threshold
+        results = [(label, conf) if label not in (None, MULTIPLE_CLAUSES) and conf >= threshold else None
+                   for label, conf in self.predict(kind, texts)]
+        local = sum(1 for r in results if r is not None)
+        telemetry.inc("local_tier_total", local, kind=kind, result="local")
+        telemetry.inc("local_tier_total", len(results) - local, kind=kind, result="escalated")
+        return results
+
+
+services.register("local_tier", LocalTier)
+
+
+def classify(kind, texts, threshold=None):
+    """Local predictions for `texts` if LOCAL_TIER is on, else all None (escalate)."""
+    if not LOCAL_TIER:
+        return [None] * len(texts)
+    return services.get("local_tier").classify(kind, texts, threshold)
+
+
+def train(kind, features=LOCAL_TIER_FEATURES, holdout=0.2, examples=None, save=True):
+    """Fit the `kind` classifier on recorded examples; returns (model, holdout report)."""
+    examples = examples if examples is not None else load_examples(kind)
+    counts = Counter(label for _text, label in examples)
+    examples = [(t, l) for t, l in examples if counts[l] >= MIN_CLASS_EXAMPLES]
+    if len({l for _t, l in examples}) < 2:
+        raise ValueError(f"Not enough labelled {kind} examples to train ({dict(counts)})")
+
+    # Deterministic split by text hash, so retraining keeps the same holdout
+    def held_out(text):
+        return holdout and int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF < holdout
+
+    train_set = [(t, l) for t, l in examples if not held_out(t)]
+    test_set = [(t, l) for t, l in examples if held_out(t)]
+    featurize = FEATURES[features]
+    model = SoftmaxClassifier.fit(featurize([t for t, _l in train_set]), [l for _t, l in train_set], features)
+
+    report = {"kind": kind, "features": features, "train": len(train_set), "test": len(test_set),
+              "classes": dict(Counter(l for _t, l in train_set))}
+    if test_set:
+        probs = model.predict_proba(featurize([t for t, _l in test_set]))
+        predicted = [model.classes[j] for j in probs.argmax(axis=1)]
+        confident = probs.max(axis=1) >= LOCAL_TIER_CONFIDENCE
+        agree = [p == l for p, (_t, l) in zip(predicted, test_set)]
+        report["accuracy"] = round(sum(agree) / len(agree), 4)
+        report["coverage"] = round(float(confident.mean()), 4)
+        kept = [a for a, c in zip(agree, confident) if c]
+        report["confident_accuracy"] = round(sum(kept) / len(kept), 4) if kept else None
+    if save:
+        model.save(model_path(kind))
+        services.reset("local_tier")
+    return model, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train / inspect the local classifier tier")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train")
+    train_cmd.add_argument("--kind", choices=KINDS, action="append")
+    train_cmd.add_argument("--features", choices=sorted(FEATURES), default=LOCAL_TIER_FEATURES)
+    train_cmd.add_argument("--holdout", type=float, default=0.2)
+    sub.add_parser("stats")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        for kind in KINDS:
+            labels = Counter(label for _text, label in load_examples(kind))
+            trained = "trained" if os.path.exists(model_path(kind)) else "no model"
+            print(f"{kind}: {sum(labels.values())} example(s), {trained}; {dict(labels.most_common())}")
+        return
+
+    for kind in args.kind or KINDS:
+        try:
+            _model, report = train(kind, args.features, args.holdout)
+        except ValueError as e:
+            print(f"⚠️ {e}")
+            continue
+        print(f"✅ {kind}: trained on {report['train']} example(s) with {report['features']} features -> {model_path(kind)}")
+        if report["test"]:
+            print(f"   holdout {report['test']}: accuracy {report['accuracy']:.1%}, "
+                  f"{report['coverage']:.1%} above confidence {LOCAL_TIER_CONFIDENCE} "
+                  f"(accuracy there {report['confident_accuracy'] or 0:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,29 @@
 import os
 from PyPDF2 import PdfReader, PdfWriter
 from io import BytesIO
-from reportlab.pdfgen import canvas
 
+import telemetry
+
+@telemetry.timed("pdf_extract")
 def extract_pdf_text(pdf_path):
     # Show exact path being used
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"❌ PDF not found at: {pdf_path}")
 
     reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
+    # Pages are separated by form feeds so page headers/footers can be told apart
+    return "\f".join(page.extract_text() or "" for page in reader.pages)
+
+@telemetry.timed("pdf_extract")
+def extract_pdf_text_from_bytes(pdf_bytes):
+    reader = PdfReader(BytesIO(pdf_bytes))
+    # Pages are separated by form feeds so page headers/footers can be told apart
+    return "\f".join(page.extract_text() or "" for page in reader.pages)
 
 def create_text_page(text, width, height):
+    # reportlab is only needed when an amendment page is actually rendered
+    from reportlab.pdfgen import canvas
+
     packet = BytesIO()
     c = canvas.Canvas(packet, pagesize=(width, height))
 
@@ -67,3 +76,27 @@ def insert_clause_into_pdf(original_pdf, new_pdf_path, clause_text, after_clause
 
     with open(new_pdf_path, "wb") as f:
         writer.write(f)
+
+
+@telemetry.timed("pdf_rebuild")
+def build_amended_pdf(base_pdf_bytes, amendment_texts, new_pdf_path):
+    """
+    Rebuild a contract version from its base PDF plus the amendment pages
+    appended so far. Produces the same page layout as insert_clause_into_pdf
+    applied once per amendment.
+    """
+    reader = PdfReader(BytesIO(base_pdf_bytes))
+    writer = PdfWriter()
+
+    for page in reader.pages:
+        writer.add_page(page)
+
+    first_page = reader.pages[0]
+    width = float(first_page.mediabox.width)
+    height = float(first_page.mediabox.height)
+
+    for clause_text in amendment_texts:
+        writer.add_page(create_text_page(clause_text, width, height))
+
+    with open(new_pdf_path, "wb") as f:
+        writer.write(f)
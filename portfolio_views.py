@@ -0,0 +1,514 @@
+# portfolio_views.py
+"""
+Materialized portfolio compliance views (SQLite, data/portfolio.db).
+
+Tables, kept up to date incrementally by `refresh()`:
+    contracts      one row per contract in the index, with a state hash
+    match_status   contract x regulation rows that matter: applied, pending
+                   (exactly what plan_contract_updates would apply), or
+                   matched on a keyword without needing an amendment
+                   (no_amendment)
+    clause_risks   clause type and Low/Medium/High per analysed clause
+and the views built on them: contract_matches, risk_distribution,
+pending_by_owner.
+
+- A contract whose version, jurisdiction, owner or applied regulations
+  changed is re-matched against every active regulation, and so is every
+  contract once the amendment rule table or the matcher settings
+  (SEMANTIC_MATCHING) change; other contracts are
+  matched only against regulations the catalogue's change log reports as new
+  or modified since the last refresh (consumer "portfolio_views"), and rows
+  for withdrawn regulations are dropped.
+- Keyword hits come from the per-section cache in contract_analysis, so a new
+  regulation only costs a scan for its new keywords. With SEMANTIC_MATCHING=1
+  rows are scored by regulatory_tracker.contract_matcher, like an update run.
+- clause_risks is written by contract_analysis whenever a contract is
+  analysed with risk assessment; auto_update_contracts refreshes the views
+  after a real run. Both only happen once the database exists (first
+  `refresh`).
+
+Queries hit indexed tables and answer in milliseconds; exports stream in
+batches to CSV, or to Parquet with pyarrow installed.
+
+    python portfolio_views.py refresh [--full]
+    python portfolio_views.py lacking reg-2025-gdpr-update [--jurisdiction EU]
+    python portfolio_views.py matches [--regulation ID] [--jurisdiction EU] [--status pending]
+    python portfolio_views.py risks | owners
+    python portfolio_views.py export matches data/matches.parquet
+"""
+import os
+import re
+import csv
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from collections import defaultdict
+
+import regulation_catalogue
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PORTFOLIO_DB = os.getenv("PORTFOLIO_DB", os.path.join(BASE_DIR, "data", "portfolio.db"))
+
+VIEWS_CONSUMER = "portfolio_views"
+MATCH_THRESHOLD = 4    # a regulation applies when score > 4, as in plan_contract_updates
+CHUNK = 500            # ids per IN (...) clause
+EXPORT_BATCH = 5000    # rows per CSV write / Parquet row group
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    contract_id  TEXT PRIMARY KEY,
+    title        TEXT,
+    jurisdiction TEXT,
+    owner_email  TEXT,
+    version      INTEGER,
+    state        TEXT NOT NULL,
+    refreshed    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contracts_jurisdiction ON contracts (jurisdiction);
+
+CREATE TABLE IF NOT EXISTS match_status (
+    contract_id             TEXT NOT NULL,
+    regulation_id           TEXT NOT NULL,
+    regulation_title        TEXT,
+    regulation_jurisdiction TEXT,
+    score                   INTEGER NOT NULL,
+    keywords                TEXT,
+    status                  TEXT NOT NULL,
+    suggestion              TEXT,
+    PRIMARY KEY (contract_id, regulation_id)
+);
+CREATE INDEX IF NOT EXISTS match_status_regulation ON match_status (regulation_id, status);
+CREATE INDEX IF NOT EXISTS match_status_status ON match_status (status, contract_id);
+
+CREATE TABLE IF NOT EXISTS clause_risks (
+    contract_id TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    clause_type TEXT NOT NULL,
+    risk        TEXT NOT NULL,
+    PRIMARY KEY (contract_id, position)
+);
+CREATE INDEX IF NOT EXISTS clause_risks_type ON clause_risks (clause_type, risk);
+
+CREATE VIEW IF NOT EXISTS contract_matches AS
+    SELECT m.contract_id, c.title AS contract_title, c.jurisdiction, c.owner_email, c.version,
+           m.regulation_id, m.regulation_title, m.regulation_jurisdiction, m.score, m.keywords,
+           m.status, m.suggestion
+    FROM match_status m JOIN contracts c USING (contract_id);
+
+CREATE VIEW IF NOT EXISTS risk_distribution AS
+    SELECT r.clause_type, r.risk, COUNT(*) AS clauses, COUNT(DISTINCT r.contract_id) AS contracts
+    FROM clause_risks r JOIN contracts c USING (contract_id)
+    GROUP BY r.clause_type, r.risk;
+
+CREATE VIEW IF NOT EXISTS pending_by_owner AS
+    SELECT COALESCE(c.owner_email, '') AS owner_email, COUNT(DISTINCT m.contract_id) AS contracts,
+           COUNT(*) AS pending_amendments, GROUP_CONCAT(DISTINCT m.regulation_id) AS regulations
+    FROM match_status m JOIN contracts c USING (contract_id)
+    WHERE m.status = 'pending'
+    GROUP BY COALESCE(c.owner_email, '');
+"""
+
+EXPORTS = {
+    "contracts": "SELECT contract_id, title, jurisdiction, owner_email, version FROM contracts ORDER BY contract_id",
+    "matches": "SELECT * FROM contract_matches ORDER BY contract_id, regulation_id",
+    "risks": "SELECT * FROM risk_distribution ORDER BY clause_type, risk",
+    "owners": "SELECT * FROM pending_by_owner ORDER BY pending_amendments DESC",
+}
+INTEGER_COLUMNS = {"version", "score", "position", "clauses", "contracts", "pending_amendments"}
+MATCH_FILTERS = ("contract_id", "jurisdiction", "owner_email", "regulation_id", "status")
+
+
+def connect(path=None):
+    path = path or PORTFOLIO_DB
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def enabled(path=None):
+    """Views are maintained automatically only once they have been built."""
+    return os.path.exists(path or PORTFOLIO_DB)
+
+
+def match_config():
+    """Everything besides the contract and the regulations that match_status rows depend on."""
+    import amendment_rules
+    import semantic_matcher
+
+    semantic = semantic_matcher.SEMANTIC_MATCHING and [semantic_matcher.SEMANTIC_THRESHOLD, semantic_matcher.SEMANTIC_WEIGHT]
+    return json.dumps([amendment_rules.load_rules().digest, MATCH_THRESHOLD, semantic])
+
+
+def contract_state(contract, config=""):
+    raw = json.dumps([contract.get("version"), contract.get("file"), contract.get("title"),
+                      contract.get("jurisdiction"), contract.get("owner_email"),
+                      sorted(contract.get("applied_regulations", [])), config], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _chunks(items):
+    items = list(items)
+    for i in range(0, len(items), CHUNK):
+        yield items[i:i + CHUNK]
+
+
+def _delete_in(conn, table, column, values):
+    for chunk in _chunks(values):
+        conn.execute(f"DELETE FROM {table} WHERE {column} IN ({','.join('?' * len(chunk))})", chunk)
+
+
+# Maintenance
+
+def _match_rows(contracts, regs):
+    """match_status rows for every contract against `regs`, as plan_contract_updates scores them."""
+    import amendment_rules
+    import contract_analysis
+    import regulatory_tracker
+    import semantic_matcher
+
+    if not contracts or not regs:
+        return []
+    semantic = semantic_matcher.SEMANTIC_MATCHING
+    hits = {} if semantic else contract_analysis.keyword_hits_by_contract(contracts, regs)
+    # Only regulations sharing a keyword with the contract, already applied,
+    # or with a jurisdiction/regulation rule that fires without keywords (the
+    # jurisdiction bonus alone passes the threshold) can produce a row
+    rules = amendment_rules.load_rules()
+    by_keyword = defaultdict(list)
+    keyword_free = defaultdict(list)
+    by_id = {}
+    for reg in regs:
+        by_id[reg["id"]] = reg
+        for kw in {kw.lower() for kw in reg.get("keywords", [])}:
+            by_keyword[kw].append(reg)
+        if rules.evaluate(reg, []):
+            keyword_free[(reg.get("jurisdiction") or "").lower()].append(reg)
+
+    rows = []
+    for contract in contracts:
+        applied = set(contract.get("applied_regulations", []))
+        if semantic:
+            # Embedding similarity can lift any regulation over the threshold
+            match = regulatory_tracker.contract_matcher(contract, regs, semantic=True)
+            candidates = by_id
+        else:
+            match = None
+            candidates = {reg["id"]: reg for kw in hits[contract["id"]] for reg in by_keyword.get(kw, [])}
+            candidates.update((reg["id"], reg) for reg in keyword_free.get((contract.get("jurisdiction") or "").lower(), []))
+            candidates.update((rid, by_id[rid]) for rid in applied if rid in by_id)
+        for reg in sorted(candidates.values(), key=lambda r: r["id"]):
+            if match is not None:
+                score, matched = match(reg)
+            else:
+                score, matched = contract_analysis.match_regulation_to_sections(reg, contract, hits[contract["id"]])
+            if reg["id"] in applied:
+                status, suggestion = "applied", None
+            elif score > MATCH_THRESHOLD:
+                suggestion = regulatory_tracker.suggest_amendment(reg, matched)
+                if suggestion and suggestion != amendment_rules.NO_AMENDMENT:
+                    status = "pending"
+                elif matched:
+                    status, suggestion = "no_amendment", None
+                else:
+                    continue
+            else:
+                continue
+            rows.append((contract["id"], reg["id"], reg.get("title"), reg.get("jurisdiction"), int(round(score)),
+                         ", ".join(matched), status, suggestion))
+    return rows
+
+
+def refresh(full=False, db_path=None):
+    """
+    Bring the views up to date with the contract index and the regulation
+    catalogue. Returns what was recomputed.
+    """
+    import regulatory_tracker
+
+    start = time.perf_counter()
+    regulatory_tracker.sync_regulations()
+    changes = regulation_catalogue.pending_changes(VIEWS_CONSUMER)
+    contracts = regulatory_tracker.list_all_contracts()
+
+    config = match_config()
+
+    conn = connect(db_path)
+    try:
+        stored = dict(conn.execute("SELECT contract_id, state FROM contracts"))
+        current = {c["id"]: c for c in contracts}
+        changed = [c for c in contracts if full or stored.get(c["id"]) != contract_state(c, config)]
+        changed_ids = {c["id"] for c in changed}
+        unchanged = [c for c in contracts if c["id"] not in changed_ids]
+        removed = [cid for cid in stored if cid not in current]
+        changed_regs = [] if full else changes["new"] + changes["modified"]
+
+        # STEP 1: rows for changed contracts (all regulations) and for the
+        # other contracts (changed regulations only)
+        rows = _match_rows(changed, regulation_catalogue.list_regulations() if changed else [])
+        rows += _match_rows(unchanged, changed_regs)
+
+        # STEP 2: swap them in with one transaction
+        with conn:
+            if full:
+                conn.execute("DELETE FROM match_status")
+            _delete_in(conn, "contracts", "contract_id", removed)
+            for table in ("match_status", "clause_risks"):
+                _delete_in(conn, table, "contract_id", removed)
+            _delete_in(conn, "match_status", "regulation_id", changes["withdrawn"] + [r["id"] for r in changed_regs])
+            _delete_in(conn, "match_status", "contract_id", changed_ids)
+            conn.executemany("INSERT OR REPLACE INTO match_status VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            now = time.time()
+            conn.executemany(
+                "INSERT OR REPLACE INTO contracts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(c["id"], c.get("title"), c.get("jurisdiction"), c.get("owner_email"), c.get("version"),
+                  contract_state(c, config), now) for c in changed],
+            )
+    finally:
+        conn.close()
+    regulation_catalogue.ack(VIEWS_CONSUMER, changes["last_seq"])
+
+    return {
+        "contracts_rematched": len(changed),
+        "contracts_removed": len(removed),
+        "regulations_changed": len(changed_regs),
+        "regulations_withdrawn": len(changes["withdrawn"]),
+        "rows_written": len(rows),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def refresh_if_enabled():
+    if enabled():
+        try:
+            refresh()
+        except Exception as e:
+            print(f"⚠️ Portfolio views not refreshed: {e}")
+
+
+def record_analysis(contract_id, clause_blocks, risks, db_path=None):
+    """
+    Replace a contract's clause_risks rows with a fresh analysis result. Risk
+    levels are parsed like on the Streamlit risk page (local_tier.risk_label).
+    """
+    from local_tier import risk_label
+
+    if not enabled(db_path):
+        return
+    rows = []
+    for position, (block, verdict) in enumerate(zip(clause_blocks, risks)):
+        clause_type = re.match(r"\s*CLAUSE:\s*(.+)", block)
+        text = verdict if isinstance(verdict, str) else (verdict or {}).get("label", "")
+        rows.append((contract_id, position, clause_type.group(1).strip() if clause_type else "Other",
+                     risk_label(text) or "Unknown"))
+    conn = connect(db_path)
+    try:
+        # Uploads and other lineages outside the contract index are not part of the portfolio
+        if conn.execute("SELECT 1 FROM contracts WHERE contract_id = ?", (contract_id,)).fetchone() is None:
+            return
+        with conn:
+            conn.execute("DELETE FROM clause_risks WHERE contract_id = ?", (contract_id,))
+            conn.executemany("INSERT INTO clause_risks VALUES (?, ?, ?, ?)", rows)
+    finally:
+        conn.close()
+
+
+# Queries
+
+def _rows(conn, sql, params=()):
+    cursor = conn.execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def matches(db_path=None, limit=1000, **filters):
+    """contract_matches rows, filtered by any of MATCH_FILTERS."""
+    unknown = set(filters) - set(MATCH_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown filter(s): {sorted(unknown)}")
+    where = [(f"{column} = ?", value) for column, value in filters.items() if value is not None]
+    sql = "SELECT * FROM contract_matches"
+    if where:
+        sql += " WHERE " + " AND ".join(clause for clause, _v in where)
+    sql += " ORDER BY contract_id, regulation_id LIMIT ?"
+    conn = connect(db_path)
+    try:
+        return _rows(conn, sql, [v for _c, v in where] + [limit])
+    finally:
+        conn.close()
+
+
+def lacking(regulation_id, jurisdiction=None, db_path=None):
+    """Contracts (optionally in one jurisdiction) that do not have `regulation_id` applied yet."""
+    sql = """
+        SELECT c.contract_id, c.title, c.jurisdiction, c.owner_email, c.version,
+               COALESCE(m.status, 'not_matched') AS status, m.score, m.suggestion
+        FROM contracts c
+        LEFT JOIN match_status m ON m.contract_id = c.contract_id AND m.regulation_id = ?
+        WHERE COALESCE(m.status, '') != 'applied'
+    """
+    params = [regulation_id]
+    if jurisdiction is not None:
+        sql += " AND c.jurisdiction = ?"
+        params.append(jurisdiction)
+    conn = connect(db_path)
+    try:
+        return _rows(conn, sql + " ORDER BY c.contract_id", params)
+    finally:
+        conn.close()
+
+
+def risk_distribution(db_path=None):
+    conn = connect(db_path)
+    try:
+        return _rows(conn, EXPORTS["risks"])
+    finally:
+        conn.close()
+
+
+def pending_by_owner(db_path=None):
+    conn = connect(db_path)
+    try:
+        return _rows(conn, EXPORTS["owners"])
+    finally:
+        conn.close()
+
+
+def summary(db_path=None):
+    conn = connect(db_path)
+    try:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM match_status GROUP BY status"))
+        return {
+            "contracts": conn.execute("SELECT COUNT(*) FROM contracts").fetchone()[0],
+            "pending": counts.get("pending", 0),
+            "applied": counts.get("applied", 0),
+            "no_amendment": counts.get("no_amendment", 0),
+            "analysed_clauses": conn.execute("SELECT COUNT(*) FROM clause_risks").fetchone()[0],
+            "last_refresh": conn.execute("SELECT MAX(refreshed) FROM contracts").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+# Export
+
+def export(view, path, fmt=None, db_path=None):
+    """Stream one of EXPORTS to CSV or Parquet (needs pyarrow); returns the row count."""
+    if view not in EXPORTS:
+        raise ValueError(f"Unknown view {view!r}; choose from {sorted(EXPORTS)}")
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); use CSV instead")
+
+    conn = connect(db_path)
+    tmp_path = path + ".tmp"
+    count = 0
+    try:
+        cursor = conn.execute(EXPORTS[view])
+        columns = [d[0] for d in cursor.description]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if fmt == "csv":
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                while True:
+                    rows = cursor.fetchmany(EXPORT_BATCH)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    count += len(rows)
+        else:
+            # Fixed schema, so an all-NULL first batch cannot fix a column's type
+            schema = pa.schema([(c, pa.int64() if c in INTEGER_COLUMNS else pa.string()) for c in columns])
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                while True:
+                    rows = cursor.fetchmany(EXPORT_BATCH)
+                    if not rows:
+                        break
+                    writer.write_table(pa.Table.from_arrays(
+                        [pa.array([row[i] for row in rows], type=schema.field(i).type) for i in range(len(columns))],
+                        schema=schema))
+                    count += len(rows)
+        os.replace(tmp_path, path)
+    finally:
+        conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def _print_rows(rows, columns=None, limit=50):
+    if not rows:
+        print("(no rows)")
+        return
+    columns = columns or list(rows[0])
+    widths = [min(40, max(len(c), *(len(str(r[c] if r[c] is not None else "")) for r in rows[:limit]))) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows[:limit]:
+        print("  ".join(str(row[c] if row[c] is not None else "")[:w].ljust(w) for c, w in zip(columns, widths)))
+    if len(rows) > limit:
+        print(f"... {len(rows) - limit} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh_cmd = sub.add_parser("refresh")
+    refresh_cmd.add_argument("--full", action="store_true", help="re-match every contract")
+    lacking_cmd = sub.add_parser("lacking")
+    lacking_cmd.add_argument("regulation_id")
+    lacking_cmd.add_argument("--jurisdiction")
+    matches_cmd = sub.add_parser("matches")
+    matches_cmd.add_argument("--regulation", dest="regulation_id")
+    matches_cmd.add_argument("--contract", dest="contract_id")
+    matches_cmd.add_argument("--jurisdiction")
+    matches_cmd.add_argument("--owner", dest="owner_email")
+    matches_cmd.add_argument("--status", choices=["applied", "pending", "no_amendment"])
+    matches_cmd.add_argument("--limit", type=int, default=1000)
+    sub.add_parser("risks")
+    sub.add_parser("owners")
+    sub.add_parser("summary")
+    export_cmd = sub.add_parser("export")
+    export_cmd.add_argument("view", choices=sorted(EXPORTS))
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--format", choices=["csv", "parquet"])
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        print(json.dumps(refresh(full=args.full), indent=2))
+        return
+    if args.command == "export":
+        count = export(args.view, args.path, args.format)
+        print(f"✅ Exported {count} row(s) of {args.view} to {args.path}")
+        return
+
+    start = time.perf_counter()
+    if args.command == "lacking":
+        rows = lacking(args.regulation_id, args.jurisdiction)
+        columns = ["contract_id", "title", "jurisdiction", "owner_email", "status"]
+    elif args.command == "matches":
+        rows = matches(limit=args.limit, regulation_id=args.regulation_id, contract_id=args.contract_id,
+                       jurisdiction=args.jurisdiction, owner_email=args.owner_email, status=args.status)
+        columns = ["contract_id", "jurisdiction", "regulation_id", "score", "status", "keywords"]
+    elif args.command == "risks":
+        rows, columns = risk_distribution(), None
+    elif args.command == "owners":
+        rows, columns = pending_by_owner(), None
+    else:
+        print(json.dumps(summary(), indent=2))
+        return
+    elapsed = (time.perf_counter() - start) * 1000
+    _print_rows(rows, columns)
+    print(f"\n{len(rows)} row(s) in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# prompt_builder.py
+"""
+Shared prompt construction for every LLM call.
+
+- Counts tokens with a local tokenizer (tiktoken's cl100k_base when installed,
+  a word/punctuation estimate otherwise).
+- Strips PDF boilerplate: page numbers and running headers/footers at the
+  top or bottom of pages, and runs of whitespace.
+- Enforces a per-stage input budget, packing context fields in priority order
+  (ranked chunks are added whole, best first, until the budget is full);
+  `split_to_budget` cuts a text that must be sent whole (a contract for
+  clause extraction) into budget-sized chunks, one call each.
+
+Per-call input/output token counts are recorded by llm_client (see
+llm_client.usage_report()).
+"""
+import os
+import re
+from collections import Counter
+
+import services
+
+# Input-token budgets per pipeline stage; override with e.g. PROMPT_BUDGET_RAG=3000
+STAGE_BUDGETS = {
+    "clauses": 6000,
+    "risk": 900,
+    "rag": 2000,
+}
+
+# Lines at each end of a page that may be a header or footer
+EDGE_LINES = 2
+PAGE_NUMBER_LINE = re.compile(r"^\s*(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?\s*$", re.IGNORECASE)
+WORD_OR_PUNCT = re.compile(r"\w+|[^\w\s]")
+
+
+def stage_budget(stage):
+    return int(os.getenv(f"PROMPT_BUDGET_{stage.upper()}", STAGE_BUDGETS.get(stage, 2000)))
+
+
+# Tokenizer
+
+class _EstimateTokenizer:
+    """~1.3 tokens per word for English legal text; used without tiktoken."""
+
+    def count(self, text):
+        return int(len(WORD_OR_PUNCT.findall(text)) * 1.3) + 1 if text else 0
+
+    def truncate(self, text, max_tokens):
+        if self.count(text) <= max_tokens:
+            return text
+        pieces = list(WORD_OR_PUNCT.finditer(text))
+        keep = max(0, int((max_tokens - 1) / 1.3))
+        return text[:pieces[keep].start()] if keep < len(pieces) else text
+
+
+class _TiktokenTokenizer:
+    def __init__(self, encoding):
+        self.encoding = encoding
+
+    def count(self, text):
+        return len(self.encoding.encode(text, disallowed_special=())) if text else 0
+
+    def truncate(self, text, max_tokens):
+        ids = self.encoding.encode(text, disallowed_special=())
+        return text if len(ids) <= max_tokens else self.encoding.decode(ids[:max(0, max_tokens)])
+
+
+def _make_tokenizer():
+    try:
+        import tiktoken
+        return _TiktokenTokenizer(tiktoken.get_encoding("cl100k_base"))
+    except Exception:
+        return _EstimateTokenizer()
+
+
+services.register("tokenizer", _make_tokenizer)
+
+
+def count_tokens(text: str) -> int:
+    return services.get("tokenizer").count(text)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    return services.get("tokenizer").truncate(text, max_tokens)
+
+
+# Cleaning
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Drop page furniture and squeeze whitespace. Pages are separated by form
+    feeds (as pdf_utils extracts them) and only lines at the top or bottom of
+    a page are removed: page numbers, and running headers/footers that recur
+    there on at least three pages. Body text is never touched.
+    """
+    pages = [[re.sub(r"[ \t ]+", " ", l).strip() for l in page.splitlines()] for page in (text or "").split("\f")]
+    edges = []
+    for page in pages:
+        filled = [i for i, line in enumerate(page) if line]
+        edges.append(set(filled[:EDGE_LINES] + filled[-EDGE_LINES:]))
+    counts = Counter(line for page, idx in zip(pages, edges) for line in {page[i] for i in idx})
+    running = {line for line, n in counts.items() if n >= 3}
+
+    kept = []
+    for page, idx in zip(pages, edges):
+        for i, line in enumerate(page):
+            if i in idx and (line in running or (len(pages) > 1 and PAGE_NUMBER_LINE.match(line))):
+                continue
+            if not line and (not kept or not kept[-1]):
+                continue
+            kept.append(line)
+    return "\n".join(kept).strip()
+
+
+# Packing
+
+def split_passages(text: str, max_words=120):
+    """Split cleaned text into paragraphs of at most `max_words` words."""
+    passages = []
+    for paragraph in re.split(r"\n\s*\n", strip_boilerplate(text)):
+        words = paragraph.split()
+        for start in range(0, len(words), max_words):
+            passages.append(" ".join(words[start:start + max_words]))
+    return passages
+
+
+def rank_by_overlap(query: str, passages):
+    """Order passages by word overlap with the query (cheap lexical relevance)."""
+    query_words = {w.lower() for w in re.findall(r"\w{3,}", query or "")}
+
+    def score(passage):
+        words = {w.lower() for w in re.findall(r"\w{3,}", passage)}
+        return len(words & query_words) / (len(words) ** 0.5 or 1)
+
+    return sorted(passages, key=score, reverse=True)
+
+
+def pack_context(chunks, max_tokens, separator="\n\n"):
+    """Add ranked chunks whole, best first, while they fit in `max_tokens`."""
+    packed = []
+    used = 0
+    sep_tokens = count_tokens(separator)
+    for chunk in chunks:
+        cost = count_tokens(chunk) + (sep_tokens if packed else 0)
+        if used + cost > max_tokens:
+            if not packed:
+                # Never send an empty context because the best chunk is large
+                packed.append(truncate_to_tokens(chunk, max_tokens))
+                used = count_tokens(packed[0])
+            continue
+        packed.append(chunk)
+        used += cost
+    return separator.join(packed)
+
+
+def split_to_budget(pieces, max_tokens, separator="\n\n"):
+    """
+    Group consecutive pieces (e.g. contract sections) into chunks of at most
+    `max_tokens`, in order and without dropping text. A piece is only split
+    when it does not fit on its own: on lines first, then on token boundaries.
+    """
+    chunks = []
+    current = []
+    used = 0
+    sep_tokens = count_tokens(separator)
+    for piece in pieces:
+        cost = count_tokens(piece)
+        if cost > max_tokens:
+            if "\n" in piece.strip():
+                parts = split_to_budget(piece.strip().splitlines(), max_tokens, "\n")
+            else:
+                parts = []
+                while piece:
+                    head = truncate_to_tokens(piece, max_tokens) or piece
+                    parts.append(head)
+                    piece = piece[len(head):]
+        else:
+            parts = [piece]
+        for part in parts:
+            cost = count_tokens(part) + (sep_tokens if current else 0)
+            if current and used + cost > max_tokens:
+                chunks.append(separator.join(current))
+                current, used = [], 0
+                cost = count_tokens(part)
+            current.append(part)
+            used += cost
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def fill_budget(stage, template, fixed=None, names=()):
+    """Tokens left for the `names` placeholders once `template` and `fixed` are rendered."""
+    empty = {name: "" for name in names}
+    return stage_budget(stage) - count_tokens(template.format(**dict(fixed or {}), **empty))
+
+
+def build_prompt(stage, template, fixed=None, fill=()):
+    """
+    Render `template` (str.format placeholders) within the stage's input budget.
+    `fixed` values are inserted verbatim; `fill` is a sequence of
+    (name, value, max_tokens_or_None) that share the remaining budget in order.
+    A value may be a string (cleaned and truncated) or a list of chunks ranked
+    by relevance (packed whole, best first).
+    """
+    fixed = dict(fixed or {})
+    remaining = fill_budget(stage, template, fixed, [name for name, _value, _cap in fill])
+
+    values = {}
+    for name, value, cap in fill:
+        limit = max(0, remaining if cap is None else min(cap, remaining))
+        if isinstance(value, (list, tuple)):
+            values[name] = pack_context([strip_boilerplate(c) for c in value], limit)
+        else:
+            values[name] = truncate_to_tokens(strip_boilerplate(value), limit)
+        remaining -= count_tokens(values[name])
+
+    return template.format(**fixed, **values)
@@ -1,35 +1,38 @@
 # rag_module.py
+#
+# LangChain, FAISS and HuggingFace are imported inside the functions that use
+# them, and the embedding model / FAISS index are shared services built on
+# first use, so importing this module is cheap and has no side effects.
 import os
 from pathlib import Path
-from dotenv import load_dotenv
-from groq import Groq
-from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 
-# CONFIG
-
-load_dotenv()
-GROQ_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_KEY:
-    raise SystemExit("Missing GROQ_API_KEY in .env file")
+import hybrid_retriever
+import services
+import telemetry
+from embedding_service import get_embedding_service
+from llm_client import complete, stream
+from prompt_builder import build_prompt
 
-client = Groq(api_key=GROQ_KEY)
+# CONFIG
 
 DOCS_PATH = Path("my_docs/complaince_data.pdf")
 INDEX_PATH = Path("faiss_index")
-EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 120
 TOP_K = 3
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
 
 # STEP 1: Load Hugging Face Embeddings
 
+def _make_embeddings():
+    # Batched, cached embedding service (see embedding_service.py) wrapped
+    # for LangChain; vectors match HuggingFaceEmbeddings for this model.
+    return get_embedding_service().as_langchain()
+
+
 def get_embeddings():
-    """Return Hugging Face embedding model."""
-    return HuggingFaceEmbeddings(model_name=EMBED_MODEL)
+    """Return the shared embedding model."""
+    return services.get("embeddings")
 
 # STEP 2: Load Documents
 
@@ -37,12 +40,14 @@ def load_reference_pdf(path: Path):
     if not path.exists():
         raise FileNotFoundError(f"{path} not found.")
     print(f"📘 Loading PDF from: {path.resolve()}")
+    from langchain_community.document_loaders import PyPDFLoader
     loader = PyPDFLoader(str(path))
     return loader.load()
 
 # STEP 3: Split Documents
 
 def split_documents(docs):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP,
@@ -52,6 +57,7 @@ def split_documents(docs):
 # STEP 4: Build or Load FAISS
 
 def build_or_load_faiss(chunks, rebuild=True):
+    from langchain_community.vectorstores import FAISS
     embeddings = get_embeddings()
 
     if rebuild or not INDEX_PATH.exists():
@@ -59,7 +65,9 @@ def build_or_load_faiss(chunks, rebuild=True):
         faiss_index = FAISS.from_documents(chunks, embeddings)
         INDEX_PATH.mkdir(parents=True, exist_ok=True)
         faiss_index.save_local(str(INDEX_PATH))
-        print("FAISS index built and saved.")
+        # Sparse index over the same chunks, persisted alongside
+        hybrid_retriever.BM25Index.build(hybrid_retriever.faiss_chunks(faiss_index)).save(str(INDEX_PATH))
+        print("FAISS and BM25 indexes built and saved.")
         return faiss_index
 
     print("Loading FAISS index from disk...")
@@ -71,23 +79,48 @@ def build_or_load_faiss(chunks, rebuild=True):
     print("FAISS index loaded.")
     return faiss_index
 
+
+def _make_faiss_index():
+    # Chunks are only needed when the index has to be (re)built
+    if INDEX_PATH.exists():
+        return build_or_load_faiss([], rebuild=False)
+    return build_or_load_faiss(split_documents(load_reference_pdf(DOCS_PATH)), rebuild=True)
+
+
+def get_faiss_index():
+    """Return the shared FAISS index, loading it on first use."""
+    return services.get("faiss_index")
+
+
+def get_bm25_index():
+    """Return the shared BM25 index over the FAISS chunks."""
+    return services.get("bm25_index")
+
+
+services.register("embeddings", _make_embeddings)
+services.register("faiss_index", _make_faiss_index)
+services.register("bm25_index", lambda: hybrid_retriever.build_or_load_bm25(get_faiss_index(), str(INDEX_PATH)))
+
 # STEP 5: Retrieve Relevant Chunks
 
 def retrieve_relevant_chunks(query: str, faiss_index, top_k=TOP_K):
+    # Hybrid BM25 + dense with reciprocal-rank fusion (see hybrid_retriever.py)
+    if HYBRID_RETRIEVAL:
+        return hybrid_retriever.hybrid_search(query, faiss_index, get_bm25_index(), top_k)
+    return dense_retrieve(query, faiss_index, top_k)
+
+
+@telemetry.timed("faiss_search")
+def dense_retrieve(query: str, faiss_index, top_k=TOP_K):
     retriever = faiss_index.as_retriever(search_kwargs={"k": top_k})
     results = retriever.invoke(query)
     return [r.page_content for r in results]
 
 # STEP 6: Build the RAG Chain (Retrieval + LLM)
 
-def make_rag_chain(query: str):
-    docs = load_reference_pdf(DOCS_PATH)
-    chunks = split_documents(docs)
-    faiss_index = build_or_load_faiss(chunks, rebuild=False)
-    relevant_chunks = retrieve_relevant_chunks(query, faiss_index)
-
-    context = "\n\n".join(relevant_chunks)
-    prompt = f"""
+# The instructions are kept as written; only the reference context is
+# trimmed to the "rag" input budget.
+RAG_PROMPT = """
 You are an experienced compliance and contract analysis expert with a deep understanding of legal frameworks. Use only the information found in the provided reference context to answer the question. Do not use outside knowledge. Every part of your reasoning must come strictly from the retrieved context.
 
 Your response must contain exactly two sections:
@@ -121,15 +154,29 @@ Citations:
 """
 
 
-    res = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.4,
-        max_tokens=500,
-    )
-    return res.choices[0].message.content
+def build_rag_prompt(query: str) -> str:
+    faiss_index = get_faiss_index()
+    with telemetry.span("retrieve"):
+        relevant_chunks = retrieve_relevant_chunks(query, faiss_index)
+
+    # Chunks arrive best-first and are packed whole into the "rag" budget
+    return build_prompt("rag", RAG_PROMPT, fixed={"query": query}, fill=[("context", relevant_chunks, None)])
+
+
+def make_rag_chain(query: str):
+    return complete(build_rag_prompt(query), temperature=0.4, max_tokens=500, label="rag")
+
+
+def stream_rag_chain(query: str):
+    """Same as make_rag_chain, but yields the answer as it is generated."""
+    return stream(build_rag_prompt(query), temperature=0.4, max_tokens=500, label="rag")
+
 
 # STEP 7: Wrapper for app.py
 
 def rag_answer(query: str):
     return make_rag_chain(query)
+
+
+def stream_rag_answer(query: str):
+    return stream_rag_chain(query)
@@ -0,0 +1,504 @@
+# regulation_catalogue.py
+"""
+Versioned regulation catalogue (SQLite, data/regulations.db).
+
+Feeds (a local .json / .jsonl file or an HTTP URL) are ingested
+incrementally:
+- a feed that has not changed since the last sync (same ETag / Last-Modified,
+  or same size and mtime for files) is skipped without being read;
+- entries are streamed and processed in batches, so a 100k-entry feed is
+  ingested in bounded memory (JSON arrays are decoded incrementally);
+- each entry is stored with a content hash; a changed hash becomes a new
+  version, identical entries cost one indexed lookup;
+- "snapshot" feeds (the whole catalogue, like data/regulations.json) withdraw
+  entries that disappear; "delta" feeds only carry changes, skip entries
+  older than the feed's date watermark and withdraw entries flagged
+  `"status": "withdrawn"`.
+
+Every sync appends new / modified / withdrawn rows to a change log.
+Downstream consumers (e.g. auto_update_contracts(delta=True)) read the
+change-set since their last acknowledged position, so only the delta is
+matched.
+
+    python regulation_catalogue.py sync data/regulations.json [--feed local] [--mode snapshot]
+    python regulation_catalogue.py sync https://example.org/regs.json --feed example --mode delta
+    python regulation_catalogue.py changes [--consumer auto_update]
+    python regulation_catalogue.py stats
+"""
+import os
+import io
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOGUE_DB = os.getenv("REGULATION_DB", os.path.join(BASE_DIR, "data", "regulations.db"))
+
+BATCH_SIZE = 500        # entries per lookup / write batch (also under SQLite's variable limit)
+READ_CHUNK = 64 * 1024  # characters read from a feed at a time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS regulations (
+    position       INTEGER PRIMARY KEY AUTOINCREMENT,
+    id             TEXT NOT NULL UNIQUE,
+    version        INTEGER NOT NULL,
+    content_hash   TEXT NOT NULL,
+    status         TEXT NOT NULL,
+    jurisdiction   TEXT,
+    date_published TEXT,
+    feed           TEXT,
+    data           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS regulations_status ON regulations (status, jurisdiction);
+CREATE INDEX IF NOT EXISTS regulations_feed ON regulations (feed, status);
+
+CREATE TABLE IF NOT EXISTS regulation_versions (
+    id           TEXT NOT NULL,
+    version      INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    data         TEXT NOT NULL,
+    sync_id      INTEGER NOT NULL,
+    PRIMARY KEY (id, version)
+);
+
+CREATE TABLE IF NOT EXISTS feeds (
+    name          TEXT PRIMARY KEY,
+    location      TEXT NOT NULL,
+    mode          TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    watermark     TEXT
+);
+
+CREATE TABLE IF NOT EXISTS syncs (
+    sync_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    feed      TEXT NOT NULL,
+    started   REAL NOT NULL,
+    finished  REAL,
+    seen      INTEGER DEFAULT 0,
+    new       INTEGER DEFAULT 0,
+    modified  INTEGER DEFAULT 0,
+    withdrawn INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS changes (
+    seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+    sync_id INTEGER NOT NULL,
+    id      TEXT NOT NULL,
+    kind    TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS consumers (
+    name     TEXT PRIMARY KEY,
+    last_seq INTEGER NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_list_cache = {}  # db path -> ((inode, last change seq), [regulation dicts])
+
+
+def connect(path=None):
+    path = path or CATALOGUE_DB
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def content_hash(entry):
+    raw = json.dumps(entry, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Streaming feed readers
+
+def iter_json_array(fp, chunk_size=READ_CHUNK, buf=""):
+    """Yield the items of a top-level JSON array, holding at most ~one item plus a chunk in memory."""
+    decoder = json.JSONDecoder()
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + (chunk or "")
+        pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ValueError("Feed is not a JSON array")
+    pos += 1
+
+    while True:
+        skip_ws()
+        if pos >= len(buf):
+            raise ValueError("Feed ended inside the JSON array")
+        if buf[pos] == "]":
+            return
+        if buf[pos] == ",":
+            pos += 1
+            continue
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if end == len(buf) and not eof:
+            # A scalar may continue in the next chunk; objects end with "}"
+            if not isinstance(item, (dict, list)):
+                fill()
+                continue
+        pos = end
+        yield item
+
+
+def iter_json_lines(fp, buf=""):
+    *lines, pending = buf.split("\n")
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+    for line in fp:
+        pending += line
+        if not pending.endswith("\n"):
+            continue
+        if pending.strip():
+            yield json.loads(pending)
+        pending = ""
+    if pending.strip():
+        yield json.loads(pending)
+
+
+def iter_feed_entries(fp):
+    """Entries of a JSON-array or JSON-lines feed, detected from the first character."""
+    head = ""
+    while not head.strip():
+        chunk = fp.read(READ_CHUNK)
+        if not chunk:
+            return iter(())
+        head += chunk
+    if head.lstrip()[0] == "[":
+        return iter_json_array(fp, buf=head)
+    return iter_json_lines(fp, buf=head)
+
+
+def open_feed(location, etag=None, last_modified=None):
+    """
+    Open a feed for streaming. Returns (text stream, etag, last_modified), or
+    None when the source reports it unchanged.
+    """
+    if location.startswith(("http://", "https://")):
+        request = urllib.request.Request(location, headers={"Accept": "application/json"})
+        if etag:
+            request.add_header("If-None-Match", etag)
+        if last_modified:
+            request.add_header("If-Modified-Since", last_modified)
+        try:
+            response = urllib.request.urlopen(request, timeout=60)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+        stream = io.TextIOWrapper(response, encoding="utf-8")
+        return stream, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+    stat = os.stat(location)
+    file_tag = f"{stat.st_size}-{stat.st_mtime_ns}"
+    if etag == file_tag:
+        return None
+    return open(location, "r", encoding="utf-8"), file_tag, None
+
+
+# Sync
+
+def _is_withdrawn(entry):
+    return entry.get("withdrawn") is True or str(entry.get("status", "")).lower() == "withdrawn"
+
+
+def _entry_date(entry):
+    return str(entry.get("date_updated") or entry.get("date_published") or "")
+
+
+def _apply_batch(conn, sync_id, feed, batch, counts):
+    # Last occurrence wins within a batch
+    entries = {}
+    for entry in batch:
+        entries[str(entry["id"])] = entry
+    ids = list(entries)
+    existing = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            f"SELECT id, content_hash, version, status FROM regulations WHERE id IN ({','.join('?' * len(ids))})", ids
+        )
+    }
+
+    for reg_id, entry in entries.items():
+        current = existing.get(reg_id)
+        if _is_withdrawn(entry):
+            if current and current[2] == "active":
+                conn.execute("UPDATE regulations SET status = 'withdrawn' WHERE id = ?", (reg_id,))
+                conn.execute("INSERT INTO changes (sync_id, id, kind, version) VALUES (?, ?, 'withdrawn', ?)",
+                             (sync_id, reg_id, current[1]))
+                counts["withdrawn"] += 1
+            continue
+
+        digest = content_hash(entry)
+        conn.execute("INSERT OR IGNORE INTO sync_seen (id) VALUES (?)", (reg_id,))
+        if current and current[0] == digest and current[2] == "active":
+            continue
+
+        data = json.dumps(entry, ensure_ascii=False)
+        if current is None:
+            version, kind = 1, "new"
+            conn.execute(
+                "INSERT INTO regulations (id, version, content_hash, status, jurisdiction, date_published, feed, data) "
+                "VALUES (?, ?, ?, 'active', ?, ?, ?, ?)",
+                (reg_id, version, digest, entry.get("jurisdiction"), entry.get("date_published"), feed, data),
+            )
+        else:
+            # Changed content, or a withdrawn regulation that is back
+            version, kind = current[1] + 1, "modified"
+            conn.execute(
+                "UPDATE regulations SET version = ?, content_hash = ?, status = 'active', jurisdiction = ?, "
+                "date_published = ?, feed = ?, data = ? WHERE id = ?",
+                (version, digest, entry.get("jurisdiction"), entry.get("date_published"), feed, data, reg_id),
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO regulation_versions (id, version, content_hash, data, sync_id) VALUES (?, ?, ?, ?, ?)",
+            (reg_id, version, digest, data, sync_id),
+        )
+        conn.execute("INSERT INTO changes (sync_id, id, kind, version) VALUES (?, ?, ?, ?)",
+                     (sync_id, reg_id, kind, version))
+        counts[kind] += 1
+
+
+def sync_feed(name, location, mode="snapshot", force=False, db_path=None):
+    """
+    Ingest one feed. Returns the sync's counts
+    {"sync_id", "seen", "new", "modified", "withdrawn", "skipped"}; "skipped"
+    is True when the feed was unchanged and not read at all.
+    """
+    if mode not in ("snapshot", "delta"):
+        raise ValueError("mode must be 'snapshot' or 'delta'")
+    with _lock:
+        conn = connect(db_path)
+        try:
+            row = conn.execute("SELECT etag, last_modified, watermark FROM feeds WHERE name = ?", (name,)).fetchone()
+            etag, last_modified, watermark = row if row else (None, None, None)
+            opened = open_feed(location, None if force else etag, None if force else last_modified)
+            if opened is None:
+                return {"sync_id": None, "seen": 0, "new": 0, "modified": 0, "withdrawn": 0, "skipped": True}
+            stream, new_etag, new_last_modified = opened
+
+            counts = {"seen": 0, "new": 0, "modified": 0, "withdrawn": 0}
+            new_watermark = watermark or ""
+            with stream, conn:
+                sync_id = conn.execute("INSERT INTO syncs (feed, started) VALUES (?, ?)", (name, time.time())).lastrowid
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS sync_seen (id TEXT PRIMARY KEY)")
+                conn.execute("DELETE FROM sync_seen")
+
+                batch = []
+                for entry in iter_feed_entries(stream):
+                    if not isinstance(entry, dict) or "id" not in entry:
+                        continue
+                    counts["seen"] += 1
+                    entry_date = _entry_date(entry)
+                    if mode == "delta" and watermark and entry_date and entry_date < watermark:
+                        continue
+                    new_watermark = max(new_watermark, entry_date)
+                    batch.append(entry)
+                    if len(batch) >= BATCH_SIZE:
+                        _apply_batch(conn, sync_id, name, batch, counts)
+                        batch = []
+                if batch:
+                    _apply_batch(conn, sync_id, name, batch, counts)
+
+                if mode == "snapshot":
+                    if counts["seen"]:
+                        gone = conn.execute(
+                            "SELECT id, version FROM regulations WHERE feed = ? AND status = 'active' "
+                            "AND id NOT IN (SELECT id FROM sync_seen)", (name,)
+                        ).fetchall()
+                        for reg_id, version in gone:
+                            conn.execute("UPDATE regulations SET status = 'withdrawn' WHERE id = ?", (reg_id,))
+                            conn.execute("INSERT INTO changes (sync_id, id, kind, version) VALUES (?, ?, 'withdrawn', ?)",
+                                         (sync_id, reg_id, version))
+                        counts["withdrawn"] += len(gone)
+                    else:
+                        print(f"⚠️ Feed '{name}' is empty; not withdrawing its regulations.")
+
+                conn.execute(
+                    "INSERT INTO feeds (name, location, mode, etag, last_modified, watermark) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET location = excluded.location, mode = excluded.mode, "
+                    "etag = excluded.etag, last_modified = excluded.last_modified, watermark = excluded.watermark",
+                    (name, location, mode, new_etag, new_last_modified, new_watermark or None),
+                )
+                conn.execute(
+                    "UPDATE syncs SET finished = ?, seen = ?, new = ?, modified = ?, withdrawn = ? WHERE sync_id = ?",
+                    (time.time(), counts["seen"], counts["new"], counts["modified"], counts["withdrawn"], sync_id),
+                )
+            return {"sync_id": sync_id, **counts, "skipped": False}
+        finally:
+            conn.close()
+
+
+# Reading
+
+def _last_seq(conn):
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+
+def list_regulations(jurisdiction=None, db_path=None):
+    """Active regulations in catalogue order (cached until the next change)."""
+    path = db_path or CATALOGUE_DB
+    conn = connect(path)
+    try:
+        if jurisdiction is not None:
+            rows = conn.execute(
+                "SELECT data FROM regulations WHERE status = 'active' AND jurisdiction = ? ORDER BY position",
+                (jurisdiction,),
+            )
+            return [json.loads(data) for (data,) in rows]
+
+        seq = (os.stat(path).st_ino, _last_seq(conn))
+        cached = _list_cache.get(path)
+        if cached and cached[0] == seq:
+            return list(cached[1])
+        regs = [json.loads(data) for (data,) in
+                conn.execute("SELECT data FROM regulations WHERE status = 'active' ORDER BY position")]
+        _list_cache[path] = (seq, regs)
+        return list(regs)
+    finally:
+        conn.close()
+
+
+def get_regulation(reg_id, version=None, db_path=None):
+    conn = connect(db_path)
+    try:
+        if version is None:
+            row = conn.execute("SELECT data FROM regulations WHERE id = ?", (reg_id,)).fetchone()
+        else:
+            row = conn.execute("SELECT data FROM regulation_versions WHERE id = ? AND version = ?",
+                               (reg_id, version)).fetchone()
+        return json.loads(row[0]) if row else None
+    finally:
+        conn.close()
+
+
+def pending_changes(consumer, db_path=None):
+    """
+    Change-set since `consumer` last acknowledged:
+    {"new": [reg], "modified": [reg], "withdrawn": [id], "last_seq": n}.
+    Regulations appear once, with their current content, in catalogue order;
+    one that changed and was then withdrawn is only reported as withdrawn.
+    """
+    conn = connect(db_path)
+    try:
+        row = conn.execute("SELECT last_seq FROM consumers WHERE name = ?", (consumer,)).fetchone()
+        since = row[0] if row else 0
+        last_seq = _last_seq(conn)
+        rows = conn.execute(
+            """
+            SELECT r.id, r.status, r.data, MAX(c.kind = 'new') AS is_new
+            FROM changes c JOIN regulations r ON r.id = c.id
+            WHERE c.seq > ? AND c.seq <= ?
+            GROUP BY r.id
+            ORDER BY r.position
+            """,
+            (since, last_seq),
+        )
+        changes = {"new": [], "modified": [], "withdrawn": [], "last_seq": last_seq}
+        for reg_id, status, data, is_new in rows:
+            if status != "active":
+                changes["withdrawn"].append(reg_id)
+            elif is_new:
+                changes["new"].append(json.loads(data))
+            else:
+                changes["modified"].append(json.loads(data))
+        return changes
+    finally:
+        conn.close()
+
+
+def ack(consumer, last_seq, db_path=None):
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO consumers (name, last_seq) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET last_seq = MAX(last_seq, excluded.last_seq)",
+                (consumer, last_seq),
+            )
+    finally:
+        conn.close()
+
+
+def stats(db_path=None):
+    conn = connect(db_path)
+    try:
+        by_status = dict(conn.execute("SELECT status, COUNT(*) FROM regulations GROUP BY status").fetchall())
+        feeds = [dict(zip(("name", "location", "mode", "etag", "watermark"), row))
+                 for row in conn.execute("SELECT name, location, mode, etag, watermark FROM feeds")]
+        consumers = dict(conn.execute("SELECT name, last_seq FROM consumers").fetchall())
+        return {"regulations": by_status, "last_seq": _last_seq(conn), "feeds": feeds, "consumers": consumers}
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="ingest a feed")
+    sync.add_argument("location")
+    sync.add_argument("--feed", default="local")
+    sync.add_argument("--mode", choices=("snapshot", "delta"), default="snapshot")
+    sync.add_argument("--force", action="store_true", help="read the feed even if it looks unchanged")
+    changes = sub.add_parser("changes", help="show the change-set pending for a consumer")
+    changes.add_argument("--consumer", default="auto_update")
+    changes.add_argument("--ack", action="store_true", help="mark the change-set as consumed")
+    sub.add_parser("stats")
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        start = time.perf_counter()
+        result = sync_feed(args.feed, args.location, args.mode, force=args.force)
+        if result["skipped"]:
+            print(f"Feed '{args.feed}' unchanged; nothing to do.")
+        else:
+            print(f"Synced '{args.feed}' in {time.perf_counter() - start:.2f}s: {result['seen']} seen, "
+                  f"{result['new']} new, {result['modified']} modified, {result['withdrawn']} withdrawn.")
+    elif args.command == "changes":
+        pending = pending_changes(args.consumer)
+        for kind in ("new", "modified"):
+            for reg in pending[kind]:
+                print(f"{kind:9s} {reg['id']} — {reg.get('title', '')}")
+        for reg_id in pending["withdrawn"]:
+            print(f"withdrawn {reg_id}")
+        if args.ack:
+            ack(args.consumer, pending["last_seq"])
+    else:
+        print(json.dumps(stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 # regulatory_tracker.py
 import os
 import json
-from pdf_utils import extract_pdf_text, insert_clause_into_pdf
+import amendment_rules
+import contract_store
+import portfolio_views
+import regulation_catalogue
+from pdf_utils import extract_pdf_text
 from email_utils import send_email_smtp   # make sure email_utils.py exists and is on PYTHONPATH
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -9,6 +13,8 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 CONTRACTS_DIR = os.path.join(BASE_DIR, "contracts")
 
 REGS_FILE = os.path.join(DATA_DIR, "regulations.json")
+# Change-log cursor used by auto_update_contracts(delta=True)
+UPDATE_CONSUMER = "auto_update"
 CONTRACT_INDEX = os.path.join(DATA_DIR, "contracts_index.json")
 
 
@@ -27,12 +33,21 @@ def list_all_contracts():
     return list(index.values())
 
 
+def sync_regulations():
+    """
+    Ingest data/regulations.json (the default local feed) into the regulation
+    catalogue. A no-op costing one stat() when the file has not changed.
+    """
+    return regulation_catalogue.sync_feed("local", REGS_FILE)
+
+
 def list_all_regulations():
-    return read_json(REGS_FILE)
+    sync_regulations()
+    return regulation_catalogue.list_regulations()
 
 
 def load_contract_text(contract_meta):
-    pdf_path = os.path.join(CONTRACTS_DIR, contract_meta["file"])
+    pdf_path = contract_store.resolve_contract_pdf(contract_meta)
     return extract_pdf_text(pdf_path)
 
 
@@ -53,30 +68,16 @@ def match_regulation_to_contract(reg, contract_meta, contract_text):
 
 
 def suggest_amendment(regulation, matches):
-    suggestions = []
-
-    if any(m.lower() == "consent" or "consent" in m.lower() for m in matches):
-        suggestions.append("Add or update clause to explicitly record consent metadata (timestamp and purpose).")
-
-    if any("data localisation" in m.lower() or "data localization" in m.lower() for m in matches):
-        suggestions.append("Insert a clause requiring storage of personal data within Indian borders.")
-
-    if any(k in ("ai", "automated decision", "transparency", "model") or
-           any(sub in k.lower() for sub in ("ai", "automated decision", "transparency", "model"))
-           for k in matches):
-        suggestions.append("Add a clause requiring transparency for automated decision systems and documentation of AI model usage.")
-
-    return "\n".join(suggestions) if suggestions else "No amendment needed."
+    # Rules live in data/amendment_rules.json and are compiled once into
+    # hashed lookups, so this is O(len(matches)) regardless of table size.
+    return amendment_rules.load_rules().suggest(regulation, matches)
 
 
 def version_new_contract_pdf(contract_meta, clause_text, after_clause_title=None):
-    new_version = contract_meta.get("version", 0) + 1
-    new_file = f"{contract_meta['id']}-v{new_version}.pdf"
-
-    original_pdf = os.path.join(CONTRACTS_DIR, contract_meta["file"])
-    new_pdf_path = os.path.join(CONTRACTS_DIR, new_file)
-
-    insert_clause_into_pdf(original_pdf, new_pdf_path, clause_text, after_clause_title)
+    # The new version is recorded as a manifest (base + amendments) in the
+    # contract store; the returned path is a cached rebuild for attachments.
+    new_version, _manifest = contract_store.add_amendment(contract_meta, clause_text)
+    new_pdf_path = contract_store.materialize(contract_meta["id"], new_version)
 
     return new_pdf_path, new_version
 
@@ -116,9 +117,122 @@ def build_update_email(contract_meta: dict, regulation: dict, suggestion_text: s
 
 
 
-def auto_update_contracts():
+def contract_matcher(contract, regs, incremental=False, semantic=None, text=None):
+    """
+    Return a `match(reg)` callable for one contract. In incremental mode the
+    contract's sections are diffed against the previous version's cached
+    analysis and only changed sections are re-extracted and re-scanned.
+    With semantic matching (SEMANTIC_MATCHING=1) all regulations are scored
+    up front by keyword hits plus embedding similarity to contract sections;
+    a semantic hit matches all of the regulation's keywords, so the amendment
+    rules see a paraphrased clause the same way as a literal one.
+    """
+    import semantic_matcher
+    semantic = semantic_matcher.SEMANTIC_MATCHING if semantic is None else semantic
+
+    if semantic:
+        import contract_analysis
+        if text is None:
+            sections = contract_analysis.load_contract_sections(contract)
+            text = "\n".join(sections)
+        else:
+            sections = contract_analysis.split_sections(text)
+        scores = semantic_matcher.match_contract(contract, text, sections, regs)
+
+        def match(reg):
+            score, matches, similarity = scores[reg["id"]]
+            if similarity >= semantic_matcher.SEMANTIC_THRESHOLD:
+                matches = matches + [kw for kw in reg.get("keywords", []) if kw not in matches]
+            return score, matches
+
+        return match
+
+    if incremental and text is None:
+        import contract_analysis
+        keyword_hits = contract_analysis.analyze_contract(contract, regs=regs, extract=False, assess=False)["keyword_hits"]
+        return lambda reg: contract_analysis.match_regulation_to_sections(reg, contract, keyword_hits)
+
+    if text is None:
+        text = load_contract_text(contract)
+    return lambda reg: match_regulation_to_contract(reg, contract, text)
+
+
+def plan_contract_updates(contract, regs, incremental=False):
+    """
+    The (regulation, suggestion) pairs an update run would apply to this
+    contract, in regulation order. Reads only; nothing is written.
+    """
+    match = contract_matcher(contract, regs, incremental)
+    applied = set(contract.get("applied_regulations", []))
+    plan = []
+
+    for reg in regs:
+        score, matches = match(reg)
+
+        # threshold used previously: score > 4
+        if score > 4 and reg["id"] not in applied:
+            suggestion = suggest_amendment(reg, matches)
+
+            if suggestion and suggestion != "No amendment needed.":
+                plan.append((reg, suggestion))
+                applied.add(reg["id"])
+    return plan
+
+
+def regulations_to_process(delta):
+    """
+    All active regulations, or with delta=True only those new or modified
+    since the last acknowledged auto-update. Returns (regs, change-set or None).
+    """
+    if not delta:
+        return list_all_regulations(), None
+    sync_regulations()
+    changes = regulation_catalogue.pending_changes(UPDATE_CONSUMER)
+    if changes["withdrawn"]:
+        print(f"ℹ️ {len(changes['withdrawn'])} regulation(s) withdrawn since the last run: "
+              f"{', '.join(changes['withdrawn'][:10])}")
+    return changes["new"] + changes["modified"], changes
+
+
+def auto_update_contracts(incremental=False, pipelined=None, dry_run=False, delta=False):
+    """
+    Apply matching regulations to every contract: new version PDF, updated
+    index entry and a notification email per amendment. With pipelined=True
+    (or UPDATE_PIPELINE=1) the run goes through update_pipeline, which
+    overlaps parsing/matching, PDF writing and email sending; dry_run=True
+    (pipelined only) does all of that work without writing or sending.
+    With delta=True only regulations added or changed in the catalogue since
+    the previous delta run are matched, and the change cursor only advances
+    when every contract was processed. Contracts added to the index after a
+    delta run are never matched against the regulations it acknowledged; run
+    once without delta to cover them. Portfolio views, once built, are
+    refreshed for the updated contracts.
+    """
+    if pipelined is None:
+        pipelined = os.getenv("UPDATE_PIPELINE", "0") == "1"
+    regs, changes = regulations_to_process(delta)
+    failures = []
+
+    if pipelined or dry_run:
+        import update_pipeline
+        updates = update_pipeline.run_update_pipeline(incremental=incremental, dry_run=dry_run, regs=regs,
+                                                      failures=failures)
+    else:
+        updates = _apply_updates(regs, incremental)
+
+    if changes is not None and not dry_run:
+        if failures:
+            # Otherwise the skipped contracts would never see these regulations again
+            print("⚠️ Regulation changes not acknowledged; the next delta run retries them.")
+        else:
+            regulation_catalogue.ack(UPDATE_CONSUMER, changes["last_seq"])
+    if updates and not dry_run:
+        portfolio_views.refresh_if_enabled()
+    return updates
+
+
+def _apply_updates(regs, incremental):
     contracts = list_all_contracts()
-    regs = list_all_regulations()
     index = read_json(CONTRACT_INDEX)
     updates = []
 
@@ -126,71 +240,50 @@ def auto_update_contracts():
         # ensure applied_regulations exists
         contract.setdefault("applied_regulations", [])
 
-        text = load_contract_text(contract)
-
-        for reg in regs:
-            score, matches = match_regulation_to_contract(reg, contract, text)
-
-            # threshold used previously: score > 4
-            if score > 4 and reg["id"] not in contract.get("applied_regulations", []):
-                suggestion = suggest_amendment(reg, matches)
-
-                if suggestion and suggestion != "No amendment needed.":
-                    # create new version PDF
-                    new_file_path, new_version = version_new_contract_pdf(contract, suggestion)
-
-                    # update contract metadata
-                    contract["version"] = new_version
-                    contract["file"] = os.path.basename(new_file_path)
-                    contract.setdefault("applied_regulations", []).append(reg["id"])
-
-                    # update index
-                    index[contract["id"]] = contract
-                    updates.append((contract["id"], suggestion))
-
-                    # Persist index immediately so future steps see updated state
-                    write_json(CONTRACT_INDEX, index)
-
-                    # SEND EMAIL via Gmail SMTP
-                    recipient = contract.get("owner_email") or os.getenv("DEFAULT_NOTIFICATION_EMAIL")
-                    if recipient:
-                        try:
-                            subject, plain, html = build_update_email(contract, reg, suggestion, new_file_path)
-                            sent = send_email_smtp(subject, recipient, plain, html, attachment_path=new_file_path)
-                            if sent:
-                                print(f"✅ Notification sent to {recipient} for {contract['id']}")
-                            else:
-                                print(f"⚠️ Failed to send notification to {recipient} for {contract['id']}")
-                        except Exception as e:
-                            print(f"⚠️ Exception while sending email for {contract['id']}: {e}")
+        for reg, suggestion in plan_contract_updates(contract, regs, incremental):
+            # create new version PDF
+            new_file_path, new_version = version_new_contract_pdf(contract, suggestion)
+
+            # update contract metadata
+            contract["version"] = new_version
+            contract["file"] = os.path.basename(new_file_path)
+            contract.setdefault("applied_regulations", []).append(reg["id"])
+
+            # update index
+            index[contract["id"]] = contract
+            updates.append((contract["id"], suggestion))
+
+            # Persist index immediately so future steps see updated state
+            write_json(CONTRACT_INDEX, index)
+
+            # SEND EMAIL via Gmail SMTP
+            recipient = contract.get("owner_email") or os.getenv("DEFAULT_NOTIFICATION_EMAIL")
+            if recipient:
+                try:
+                    subject, plain, html = build_update_email(contract, reg, suggestion, new_file_path)
+                    sent = send_email_smtp(subject, recipient, plain, html, attachment_path=new_file_path)
+                    if sent:
+                        print(f"✅ Notification sent to {recipient} for {contract['id']}")
                     else:
-                        print(f"⚠️ No recipient found for contract {contract['id']}; skipping email.")
+                        print(f"⚠️ Failed to send notification to {recipient} for {contract['id']}")
+                except Exception as e:
+                    print(f"⚠️ Exception while sending email for {contract['id']}: {e}")
+            else:
+                print(f"⚠️ No recipient found for contract {contract['id']}; skipping email.")
     # ensure final write if not already
     write_json(CONTRACT_INDEX, index)
     return updates
 
 
-def get_amendment_suggestions():
+def get_amendment_suggestions(incremental=False):
     contracts = list_all_contracts()
     regs = list_all_regulations()
     results = {}
 
     for contract in contracts:
-        text = load_contract_text(contract)
-        contract_suggestions = []
-
-        for reg in regs:
-            score, matches = match_regulation_to_contract(reg, contract, text)
-
-            if score > 4 and reg["id"] not in contract.get("applied_regulations", []):
-                suggestion = suggest_amendment(reg, matches)
-
-                if suggestion and suggestion != "No amendment needed.":
-                    contract_suggestions.append({
-                        "regulation": reg["title"],
-                        "suggestion": suggestion
-                    })
-
-        results[contract["id"]] = contract_suggestions
+        results[contract["id"]] = [
+            {"regulation": reg["title"], "suggestion": suggestion}
+            for reg, suggestion in plan_contract_updates(contract, regs, incremental)
+        ]
 
     return results
@@ -1,27 +1,9 @@
 # risk_assessor.py
-import os
-from dotenv import load_dotenv
-from groq import Groq
+import local_tier
+from llm_client import complete
+from prompt_builder import build_prompt, rank_by_overlap, split_passages
 
-load_dotenv()
-
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-def assess_risk(clauses_text: str, compliance_reference: str) -> str:
-    """
-    Low-token risk assessor.
-    - Shortened baseline + clause text to reduce prompt size.
-    - Low max_tokens to avoid quota exhaustion.
-    - Output stays simple: 
-        Risk: Low/Medium/High
-        Explanation: 2–3 lines only.
-    """
-
-    # Reduce large baseline to avoid high token usage
-    baseline_snippet = (compliance_reference or "")[:1500]   # KEEP SMALL
-    clause_snippet = (clauses_text or "")[:800]              # KEEP SMALL
-
-    prompt = f"""
+RISK_PROMPT = """
 You are a compliance officer.
 
 Task:
@@ -31,21 +13,45 @@ Task:
 
 Format the answer EXACTLY like this:
 
+Risk: <Low|Medium|High>
 Explanation: <2–3 short sentences>
 
 -------------------------
-Compliance Baseline (shortened):
+Compliance Baseline (most relevant parts):
 {baseline_snippet}
 
 Clause:
 {clause_snippet}
 """
 
-    res = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.1,
-        max_tokens=100    # VERY SAFE — keeps your quota from being exhausted
-    )
+# Most of the "risk" input budget goes to the baseline; the clause is capped
+CLAUSE_TOKEN_CAP = 300
+
+
+def assess_risk(clauses_text: str, compliance_reference: str, use_local=True) -> str:
+    """
+    Low-token risk assessor.
+    - Clause and baseline are fitted to the "risk" input-token budget; the
+      baseline passages most related to the clause are packed first.
+    - Low max_tokens to avoid quota exhaustion.
+    - Output stays simple: 
+        Risk: Low/Medium/High
+        Explanation: 2–3 lines only.
+    - With LOCAL_TIER=1 a confident local classifier verdict skips the LLM
+      (use_local=False for callers that ask the local tier themselves).
+    """
+    local = local_tier.classify("risk", [clauses_text or ""])[0] if use_local else None
+    if local is not None:
+        return local_tier.risk_verdict(*local)
+
+    baseline_passages = rank_by_overlap(clauses_text, split_passages(compliance_reference or ""))
+
+    prompt = build_prompt("risk", RISK_PROMPT, fill=[
+        ("clause_snippet", clauses_text or "", CLAUSE_TOKEN_CAP),
+        ("baseline_snippet", baseline_passages, None),
+    ])
 
-    return res.choices[0].message.content.strip()
+    # max_tokens VERY SAFE — keeps your quota from being exhausted
+    verdict = complete(prompt, temperature=0.1, max_tokens=100, label="risk").strip()
+    local_tier.record("risk", [(clauses_text, local_tier.risk_label(verdict, strict=True))])
+    return verdict
@@ -0,0 +1,151 @@
+# semantic_matcher.py
+"""
+Second regulation-matching stage based on embedding similarity.
+
+Regulation texts (title, summary, keywords) are embedded once into an
+(R, D) matrix and contract sections into an (S, D) matrix. One matrix multiply
+gives every section/regulation cosine similarity; the best section per
+regulation is its semantic score. Keyword scores from the first stage are
+computed for all regulations at once through an inverted keyword index, so
+scoring a contract against tens of thousands of regulations stays well under
+a second on CPU (see bench_matching.py).
+"""
+import os
+import hashlib
+import threading
+
+import numpy as np
+
+from embedding_service import embed_texts
+
+SEMANTIC_MATCHING = os.getenv("SEMANTIC_MATCHING", "0") == "1"
+# Minimum cosine similarity for a regulation to count as a semantic hit
+SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_MATCH_THRESHOLD", 0.45))
+# Points added to the keyword score for a semantic hit, scaled by similarity
+SEMANTIC_WEIGHT = float(os.getenv("SEMANTIC_MATCH_WEIGHT", 6.0))
+# Keep in line with the `score > 4` threshold used by regulatory_tracker
+KEYWORD_POINTS = 2
+JURISDICTION_POINTS = 5
+
+_matrix_cache = {}
+_matrix_lock = threading.Lock()
+
+
+def regulation_text(reg):
+    return f"{reg.get('title', '')}. {reg.get('summary', '')} Keywords: {', '.join(reg.get('keywords', []))}"
+
+
+class RegulationMatrix:
+    """Precomputed regulation vectors plus a keyword -> regulation index."""
+
+    def __init__(self, regs, embed=embed_texts, vectors=None):
+        self.regs = list(regs)
+        self.ids = [r["id"] for r in self.regs]
+        self.matrix = np.ascontiguousarray(
+            vectors if vectors is not None else embed([regulation_text(r) for r in self.regs]), dtype=np.float32
+        )
+        self.jurisdictions = np.array([r.get("jurisdiction", "").lower() for r in self.regs])
+
+        # keyword (lowercased) -> array of regulation indices (one entry per occurrence)
+        postings = {}
+        for i, reg in enumerate(self.regs):
+            for kw in reg.get("keywords", []):
+                postings.setdefault(kw.lower(), []).append(i)
+        self.keyword_index = {kw: np.array(idx, dtype=np.int64) for kw, idx in postings.items()}
+
+    def keyword_scores(self, contract_text, jurisdiction):
+        """
+        First-stage scores for every regulation, identical to
+        match_regulation_to_contract. Returns (scores, set of lowercased
+        keywords found in the text); see `matched_keywords`.
+        """
+        text_lower = contract_text.lower()
+        # Trigram prefilter: a keyword whose first or last trigram never occurs
+        # in the text cannot be a substring of it, so skip the scan.
+        grams = {text_lower[i:i + 3] for i in range(len(text_lower) - 2)}
+        found = set()
+        hit_postings = []
+        for kw, regs_idx in self.keyword_index.items():
+            if len(kw) >= 3 and (kw[:3] not in grams or kw[-3:] not in grams):
+                continue
+            if kw in text_lower:
+                found.add(kw)
+                hit_postings.append(regs_idx)
+
+        scores = np.zeros(len(self.regs), dtype=np.float32)
+        if hit_postings:
+            scores += np.bincount(np.concatenate(hit_postings), minlength=len(self.regs)) * KEYWORD_POINTS
+        scores += (self.jurisdictions == (jurisdiction or "").lower()) * JURISDICTION_POINTS
+        return scores, found
+
+    def matched_keywords(self, i, found):
+        """Keywords of regulation `i` present in the text, in the regulation's order."""
+        return [kw for kw in self.regs[i].get("keywords", []) if kw.lower() in found]
+
+    def semantic_scores(self, section_vectors, chunk_size=4096):
+        """Best cosine similarity (and its section) per regulation."""
+        best = np.full(len(self.regs), -1.0, dtype=np.float32)
+        best_section = np.zeros(len(self.regs), dtype=np.int64)
+        if len(section_vectors) == 0 or len(self.regs) == 0:
+            return best, best_section
+        sections = np.ascontiguousarray(section_vectors, dtype=np.float32)
+        # Chunk over regulations to keep the (S, R) block small for huge catalogues
+        for start in range(0, len(self.regs), chunk_size):
+            sims = sections @ self.matrix[start:start + chunk_size].T
+            best_section[start:start + chunk_size] = sims.argmax(axis=0)
+            best[start:start + chunk_size] = sims.max(axis=0)
+        return best, best_section
+
+    def score(self, contract_text, jurisdiction, section_vectors, threshold=SEMANTIC_THRESHOLD, weight=SEMANTIC_WEIGHT):
+        keyword, found = self.keyword_scores(contract_text, jurisdiction)
+        semantic, best_section = self.semantic_scores(section_vectors)
+        hit = semantic >= threshold
+        combined = keyword + np.where(hit, weight * semantic, 0.0).astype(np.float32)
+        return {
+            "combined": combined,
+            "keyword": keyword,
+            "semantic": semantic,
+            "semantic_hit": hit,
+            "best_section": best_section,
+            "found": found,
+        }
+
+    def top_k(self, combined, k):
+        """Indices of the k best regulations, highest score first."""
+        k = min(k, len(combined))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        idx = np.argpartition(-combined, k - 1)[:k]
+        return idx[np.argsort(-combined[idx], kind="stable")]
+
+
+def get_regulation_matrix(regs):
+    """RegulationMatrix for this exact regulation set, built once per process."""
+    key = hashlib.sha256("\x00".join(regulation_text(r) + r["id"] + r.get("jurisdiction", "") for r in regs).encode("utf-8")).hexdigest()
+    with _matrix_lock:
+        if key not in _matrix_cache:
+            _matrix_cache.clear()
+            _matrix_cache[key] = RegulationMatrix(regs)
+        return _matrix_cache[key]
+
+
+def match_contract(contract_meta, contract_text, sections, regs, threshold=SEMANTIC_THRESHOLD, weight=SEMANTIC_WEIGHT):
+    """
+    Combined keyword + semantic scores for every regulation:
+    {reg_id: (score, keyword_matches, semantic_similarity)}.
+    """
+    reg_matrix = get_regulation_matrix(regs)
+    result = reg_matrix.score(
+        contract_text, contract_meta.get("jurisdiction", ""), embed_texts(sections), threshold, weight
+    )
+    combined = result["combined"].tolist()
+    semantic = result["semantic"].tolist()
+    keyword_hit = result["keyword"] >= KEYWORD_POINTS
+    return {
+        reg_id: (
+            combined[i],
+            reg_matrix.matched_keywords(i, result["found"]) if keyword_hit[i] else [],
+            semantic[i],
+        )
+        for i, reg_id in enumerate(reg_matrix.ids)
+    }
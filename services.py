@@ -0,0 +1,96 @@
+# services.py
+"""
+Tiny process-wide service registry.
+
+Heavy subsystems (LLM clients, embedding models, FAISS indexes) register a
+factory here at import time, which is cheap. The factory only runs the first
+time `get(name)` is called, so importing app.py or streamlit_app.py does not
+pay for torch, LangChain or network clients until a feature actually needs
+them. `prewarm()` can build selected services in a background thread.
+"""
+import os
+import threading
+
+_factories = {}
+_instances = {}
+_locks = {}
+_registry_lock = threading.Lock()
+_prewarm_threads = {}
+
+
+def register(name, factory):
+    """Register (or replace) the factory for `name`. Does not build it."""
+    with _registry_lock:
+        _factories[name] = factory
+        _locks.setdefault(name, threading.Lock())
+
+
+def get(name):
+    """Return the shared instance for `name`, building it on first use."""
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+
+    if name not in _factories:
+        raise KeyError(f"Unknown service: {name}")
+
+    with _locks[name]:
+        if name not in _instances:
+            _instances[name] = _factories[name]()
+    return _instances[name]
+
+
+def is_ready(name):
+    return name in _instances
+
+
+def override(name, instance):
+    """Install a ready-made instance, e.g. a fake LLM client for benchmarks."""
+    with _registry_lock:
+        _locks.setdefault(name, threading.Lock())
+        _instances[name] = instance
+
+
+def reset(name=None):
+    """Drop built instances so the next `get` rebuilds them."""
+    with _registry_lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+
+def prewarm(names=None, background=True):
+    """
+    Build the given services (default: every registered one) ahead of first
+    use. With `background=True` this returns immediately; failures are
+    swallowed here and surface again on the real `get` call.
+    """
+    names = list(names if names is not None else _factories)
+
+    def _warm():
+        for name in names:
+            try:
+                get(name)
+            except Exception as e:
+                print(f"⚠️ Pre-warming {name} failed: {e}")
+
+    if not background:
+        _warm()
+        return None
+
+    key = tuple(names)
+    with _registry_lock:
+        thread = _prewarm_threads.get(key)
+        if thread is None:
+            thread = threading.Thread(target=_warm, name="services-prewarm", daemon=True)
+            _prewarm_threads[key] = thread
+            thread.start()
+    return thread
+
+
+def prewarm_from_env(var="PREWARM_SERVICES"):
+    """Pre-warm the comma-separated service names in `var`, if set."""
+    names = [n.strip() for n in os.getenv(var, "").split(",") if n.strip()]
+    return prewarm(names) if names else None
@@ -0,0 +1,149 @@
+# session_cache.py
+"""
+Bounded store for large per-session artifacts (uploaded PDFs, extracted
+text, clause output) so that Streamlit session state only holds keys.
+
+- Blobs live on disk under data/session_cache/, content-addressed by SHA-256
+  (derived artifacts use "<pdf key>.<kind>" keys), so 50 reviewers looking at
+  the same contract share one copy and one text extraction.
+- Least recently used files are evicted once the directory exceeds
+  SESSION_CACHE_MAX_MB; a small in-memory LRU (SESSION_MEMORY_CACHE_MB)
+  keeps the hottest blobs off the disk.
+- One cache per process (services registry); worker processes share the
+  directory.
+
+A caller that finds its blob evicted gets None and should rebuild it (text,
+clauses) or ask for the upload again.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import services
+from contract_store import write_bytes_atomic
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SESSION_CACHE_DIR = os.getenv("SESSION_CACHE_DIR", os.path.join(BASE_DIR, "data", "session_cache"))
+SESSION_CACHE_MAX_BYTES = int(float(os.getenv("SESSION_CACHE_MAX_MB", 512)) * 1024 * 1024)
+MEMORY_CACHE_MAX_BYTES = int(float(os.getenv("SESSION_MEMORY_CACHE_MB", 32)) * 1024 * 1024)
+
+
+def blob_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobCache:
+    def __init__(self, directory=SESSION_CACHE_DIR, max_bytes=SESSION_CACHE_MAX_BYTES,
+                 memory_bytes=MEMORY_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "memory_hits": 0, "misses": 0, "evicted": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._disk_used = sum(size for _mtime, size, _path in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _entries(self):
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                # In-flight writes (write_bytes_atomic) of this or another worker
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes // 4:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes:
+                _old_key, old = self._memory.popitem(last=False)
+                self._memory_used -= len(old)
+
+    def _evict(self):
+        # Re-scan: other worker processes write to the same directory
+        entries = sorted(self._entries())
+        used = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in entries:
+            if used <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                used -= size
+                self.stats["evicted"] += 1
+            except OSError:
+                pass
+        self._disk_used = used
+
+    def put(self, data, key=None):
+        """Store bytes or text; returns the key (content hash unless given)."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        key = key or blob_key(data)
+        path = self._path(key)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            write_bytes_atomic(path, data)
+            with self._lock:
+                self._disk_used += len(data)
+                if self._disk_used > self.max_bytes:
+                    self._evict()
+        self._remember(key, data)
+        return key
+
+    def get(self, key):
+        """Bytes for `key`, or None if it was never stored or has been evicted."""
+        if not key:
+            return None
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return data
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self._remember(key, data)
+        return data
+
+    def __contains__(self, key):
+        return bool(key) and (key in self._memory or os.path.exists(self._path(key)))
+
+    def get_text(self, key):
+        data = self.get(key)
+        return None if data is None else data.decode("utf-8")
+
+    def usage(self):
+        with self._lock:
+            return {"disk_bytes": self._disk_used, "memory_bytes": self._memory_used,
+                    "memory_items": len(self._memory), **self.stats}
+
+
+services.register("session_cache", BlobCache)
+
+
+def get_session_cache():
+    return services.get("session_cache")
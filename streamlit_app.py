@@ -1,7 +1,8 @@
 # streamlit_app.py
 import os
-import uuid
+import time
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from pathlib import Path
 from dotenv import load_dotenv
@@ -9,18 +10,29 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Backend imports - your existing modules
-from clause_extractor import extract_clauses
+import clause_fingerprints
+import contract_analysis
+import local_tier
+import portfolio_views
 from compliance_loader import load_compliance_data
-from risk_assessor import assess_risk
-from rag_module import rag_answer
+from rag_module import stream_rag_answer
+from clause_extractor import iter_clause_blocks
+from llm_client import STREAM_TIMINGS, usage_report
 from regulatory_tracker import (
     list_all_regulations,
-    match_regulation_to_contract,
+    contract_matcher,
     suggest_amendment,
     version_new_contract_pdf,
     build_update_email,  # ensure this is exported in regulatory_tracker.py
 )
 from email_utils import send_email_smtp, EMAIL_FROM, SMTP_USER
+import services
+import telemetry
+from session_cache import blob_key, get_session_cache
+
+# Heavy subsystems load lazily on first use. Optionally build some of them in
+# the background right away, e.g. PREWARM_SERVICES=embeddings,faiss_index
+services.prewarm_from_env()
 
 # We'll try to use extract_pdf_text_from_bytes if present in pdf_utils.
 # If not available, we'll fall back to saving the uploaded bytes to a temp file and using extract_pdf_text on it.
@@ -40,43 +52,40 @@ except Exception:
 DEFAULT_NOTIFICATION_EMAIL = os.getenv("DEFAULT_NOTIFICATION_EMAIL", "").strip()
 
 def ensure_session_state():
-    if "uploaded_bytes" not in st.session_state:
-        st.session_state.uploaded_bytes = None
+    # Only keys and small values live in session state; the uploaded PDF, its
+    # text and the clause output are in the shared, bounded session cache.
+    if "uploaded_key" not in st.session_state:
+        st.session_state.uploaded_key = None
     if "uploaded_filename" not in st.session_state:
         st.session_state.uploaded_filename = None
-    if "contract_text" not in st.session_state:
-        st.session_state.contract_text = ""
-    if "clauses_text" not in st.session_state:
-        st.session_state.clauses_text = ""
-    if "rag_history" not in st.session_state:
-        st.session_state.rag_history = []
+    if "risk_futures" not in st.session_state:
+        st.session_state.risk_futures = {}
 
 ensure_session_state()
 
-# Helpers to handle uploads in memory
-def cache_uploaded_file_in_memory(uploaded_file):
-    """Store uploaded file bytes and filename in session state (no disk write)."""
-    file_bytes = uploaded_file.getbuffer().tobytes()
-    st.session_state.uploaded_bytes = file_bytes
+# Helpers to handle uploads through the session cache
+def cache_uploaded_file(uploaded_file):
+    """Store uploaded file bytes in the session cache; session state keeps the key and filename."""
+    st.session_state.uploaded_key = get_session_cache().put(uploaded_file.getvalue())
     st.session_state.uploaded_filename = uploaded_file.name
-    # clear previously computed text/clauses
-    st.session_state.contract_text = ""
-    st.session_state.clauses_text = ""
+    st.session_state.risk_futures = {}
     return True
 
-def extract_text_from_uploaded_bytes():
-    """Extract plain text from session_state.uploaded_bytes."""
-    if not st.session_state.uploaded_bytes:
-        return ""
+def uploaded_pdf_bytes():
+    """Bytes of the current upload, or None if there is none or it was evicted."""
+    return get_session_cache().get(st.session_state.uploaded_key)
+
+def extract_text_from_bytes(pdf_bytes):
+    """Extract plain text from PDF bytes."""
     if HAVE_EXTRACT_BYTES:
-        return extract_pdf_text_from_bytes(st.session_state.uploaded_bytes)
+        return extract_pdf_text_from_bytes(pdf_bytes)
     else:
         # fallback: write to a temp file and call extract_pdf_text (if available)
         if not extract_pdf_text:
             raise RuntimeError("No PDF text extractor available in pdf_utils.py")
         tf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
         try:
-            tf.write(st.session_state.uploaded_bytes)
+            tf.write(pdf_bytes)
             tf.flush()
             tf.close()
             text = extract_pdf_text(tf.name)
@@ -87,102 +96,114 @@ def extract_text_from_uploaded_bytes():
                 pass
         return text
 
-def create_temp_original_from_bytes():
-    """Write uploaded bytes to a temp file and return path (caller must delete)."""
-    if not st.session_state.uploaded_bytes:
-        raise RuntimeError("No uploaded bytes present")
-    tf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    path = tf.name
-    tf.write(st.session_state.uploaded_bytes)
-    tf.flush()
-    tf.close()
-    return path
+def get_contract_text():
+    """Extracted text of the current upload (shared by every session with the same PDF)."""
+    key = st.session_state.uploaded_key
+    cache = get_session_cache()
+    text = cache.get_text(f"{key}.text") if key else None
+    if text is None:
+        pdf_bytes = uploaded_pdf_bytes()
+        if pdf_bytes is None:
+            return ""
+        # Evicted since the upload: extract again
+        text = extract_text_from_bytes(pdf_bytes)
+        cache.put(text, key=f"{key}.text")
+    return text
+
+def get_clauses_text():
+    key = st.session_state.uploaded_key
+    return (get_session_cache().get_text(f"{key}.clauses") if key else None) or ""
+
+# Start risk assessment of each clause as soon as it has streamed in (page 1),
+# so page 2 mostly just collects finished results.
+PREFETCH_RISK = os.getenv("PREFETCH_RISK", "1") == "1"
+
+@st.cache_resource
+def get_risk_pool():
+    return ThreadPoolExecutor(max_workers=4)
+
+# One copy per process for all sessions (st.cache_data would hand each caller its own copy)
+@st.cache_resource
+def load_baseline():
+    try:
+        return load_compliance_data()
+    except Exception:
+        return None
+
+def show_stream_timing(label):
+    timing = STREAM_TIMINGS.get(label)
+    if timing and timing["ttft_s"] is not None:
+        st.caption(f"First token after {timing['ttft_s']:.2f}s · complete after {timing['total_s']:.2f}s")
 
 # Replace your create_version_and_send_emails(...) with this implementation
 def create_version_and_send_emails(contract_meta, selections, owner_email, use_combined_if_none=True):
     """
     Use the backend's versioning function so created PDFs have the same names
-    as when the backend runs directly (e.g. contract-001-v2.pdf). This writes
-    the uploaded original into the contracts directory and then calls the
-    existing regulatory_tracker.version_new_contract_pdf(...) function.
+    as when the backend runs directly (e.g. contract-001-v2.pdf). The uploaded
+    original is registered once as a base blob in the contract store; each
+    version only adds its amendment on top, nothing is copied or deleted.
     """
     results = []
 
-    # Import regulatory_tracker module here to access CONTRACTS_DIR and its function
+    # Import regulatory_tracker module here to access its versioning function
     import regulatory_tracker as rt
+    import contract_store
 
     # Must have uploaded bytes
-    if not st.session_state.uploaded_bytes:
-        st.error("No uploaded file bytes in memory; cannot create versioned PDF without an original file.")
+    pdf_bytes = uploaded_pdf_bytes()
+    if pdf_bytes is None:
+        st.error("The uploaded file is no longer cached; please upload it again to create a versioned PDF.")
         return results
 
-    # Ensure contracts dir exists
-    os.makedirs(rt.CONTRACTS_DIR, exist_ok=True)
-
-    # Write uploaded bytes into contracts dir as a deterministic "original" filename
-    orig_filename = f"{contract_meta['id']}-v{contract_meta.get('version', 1)}-orig.pdf"
-    orig_path = os.path.join(rt.CONTRACTS_DIR, orig_filename)
+    # Register the uploaded bytes as the contract's current version (deduplicated by hash)
     try:
-        with open(orig_path, "wb") as f:
-            f.write(st.session_state.uploaded_bytes)
+        contract_store.register_base(contract_meta["id"], contract_meta.get("version", 1), pdf_bytes)
     except Exception as e:
-        st.error(f"Failed to write original PDF to contracts directory: {e}")
+        st.error(f"Failed to store original PDF in the contract store: {e}")
         return results
 
     # For each selected suggestion, call the shared versioning function and then email the new PDF.
-    try:
-        for sel in selections:
-            reg_obj = sel.get("reg") or {"id": sel.get("id", "combined"), "title": sel.get("id", "combined")}
-            suggestion_text = sel.get("suggestion", "")
+    for sel in selections:
+        reg_obj = sel.get("reg") or {"id": sel.get("id", "combined"), "title": sel.get("id", "combined")}
+        suggestion_text = sel.get("suggestion", "")
 
-            # Make a shallow copy of contract_meta and set 'file' to the original filename we wrote
-            cm = dict(contract_meta)
-            cm["file"] = orig_filename
-
-            try:
-                # This will create a new version PDF in rt.CONTRACTS_DIR and return its path and version number
-                new_pdf_path, new_version = rt.version_new_contract_pdf(cm, suggestion_text)
+        cm = dict(contract_meta)
 
-                # Build email using the same helper (ensure it accepts our cm/reg_obj)
-                subject, plain, html = rt.build_update_email(cm, reg_obj, suggestion_text, new_pdf_path)
+        try:
+            # This records a new version manifest and returns a cached rebuild of the PDF
+            new_pdf_path, new_version = rt.version_new_contract_pdf(cm, suggestion_text)
 
-                # Send email with the new version PDF attached
-                sent = False
-                try:
-                    sent = send_email_smtp(subject, owner_email, plain, html, attachment_path=new_pdf_path)
-                except Exception as e_send:
-                    # don't crash entire loop on email failure
-                    results.append({
-                        "reg_id": reg_obj.get("id", "unknown"),
-                        "path": new_pdf_path,
-                        "sent": False,
-                        "error": f"Email send failed: {e_send}"
-                    })
-                    continue
+            # Build email using the same helper (ensure it accepts our cm/reg_obj)
+            subject, plain, html = rt.build_update_email(cm, reg_obj, suggestion_text, new_pdf_path)
 
+            # Send email with the new version PDF attached
+            sent = False
+            try:
+                sent = send_email_smtp(subject, owner_email, plain, html, attachment_path=new_pdf_path)
+            except Exception as e_send:
+                # don't crash entire loop on email failure
                 results.append({
                     "reg_id": reg_obj.get("id", "unknown"),
                     "path": new_pdf_path,
-                    "sent": bool(sent)
-                })
-
-            except Exception as e_version:
-                # versioning failed for this selection; record and continue
-                results.append({
-                    "reg_id": sel.get("reg", {}).get("id", sel.get("id", "unknown")),
                     "sent": False,
-                    "error": f"Versioning/creation failed: {e_version}"
+                    "error": f"Email send failed: {e_send}"
                 })
                 continue
 
-    finally:
-        # Clean up the temporary original we wrote into contracts dir (leave newly-created versioned PDFs)
-        try:
-            if os.path.exists(orig_path):
-                os.remove(orig_path)
-        except Exception:
-            # non-fatal
-            pass
+            results.append({
+                "reg_id": reg_obj.get("id", "unknown"),
+                "path": new_pdf_path,
+                "sent": bool(sent)
+            })
+
+        except Exception as e_version:
+            # versioning failed for this selection; record and continue
+            results.append({
+                "reg_id": sel.get("reg", {}).get("id", sel.get("id", "unknown")),
+                "sent": False,
+                "error": f"Versioning/creation failed: {e_version}"
+            })
+            continue
 
     return results
 
@@ -198,63 +219,89 @@ page = st.sidebar.radio("Choose page", [
     "1. Key Clauses",
     "2. Risk Assessment",
     "3. RAG Chatbot",
-    "4. Regulatory Issues & Email"
+    "4. Regulatory Issues & Email",
+    "5. Admin: Metrics",
+    "6. Portfolio Report"
 ])
 
 st.sidebar.markdown("---")
 st.sidebar.write("Upload PDF")
 uploaded_file = st.sidebar.file_uploader("Upload PDF", type=["pdf"])
-if uploaded_file:
-    cache_uploaded_file_in_memory(uploaded_file)
-    # extract text now
+# Only re-process when a different file is uploaded (or its cached copy was evicted), not on every rerun
+if uploaded_file and (
+    blob_key(uploaded_file.getvalue()) != st.session_state.uploaded_key
+    or st.session_state.uploaded_key not in get_session_cache()
+):
+    cache_uploaded_file(uploaded_file)
+    # extract text now; clause extraction streams on page 1
     try:
-        st.session_state.contract_text = extract_text_from_uploaded_bytes()
+        get_contract_text()
         st.sidebar.success("Extracted text from uploaded PDF")
-        try:
-            st.session_state.clauses_text = extract_clauses(st.session_state.contract_text)
-        except Exception as e:
-            st.session_state.clauses_text = ""
-            st.sidebar.warning(f"Clause extraction failed: {e}")
     except Exception as e:
         st.sidebar.error(f"Failed to extract PDF text: {e}")
-        st.session_state.contract_text = ""
-        st.session_state.clauses_text = ""
+
+def upload_missing():
+    """Show a hint and return True if there is no usable upload for this session."""
+    if not st.session_state.uploaded_key:
+        return True
+    if st.session_state.uploaded_key not in get_session_cache():
+        st.warning("The uploaded file was evicted from the cache; please upload it again.")
+        return True
+    return False
 
 # Page 1: Key Clauses
 if page == "1. Key Clauses":
     st.header("1) Extracted Key Clauses")
-    if not st.session_state.uploaded_bytes:
+    if upload_missing():
         st.info("Upload a PDF on the left to extract clauses.")
     else:
+        contract_text = get_contract_text()
+        clauses_text = get_clauses_text()
         st.subheader("Uploaded file")
         st.write(st.session_state.uploaded_filename or "uploaded.pdf")
         st.subheader("Extracted contract text")
-        st.text_area("Contract text", value=(st.session_state.contract_text or "No text extracted"), height=240)
+        st.text_area("Contract text", value=(contract_text or "No text extracted"), height=240)
         st.subheader("LLM clause extraction output")
-        if st.session_state.clauses_text:
-            st.code(st.session_state.clauses_text, language="text")
+        if clauses_text:
+            st.code(clauses_text, language="text")
+        elif contract_text:
+            # Version-aware and streamed: sections unchanged since the last
+            # upload of this file come from the cache, the rest streams in.
+            lineage_key = f"upload:{st.session_state.uploaded_filename}"
+            baseline = load_baseline() or ""
+            futures = st.session_state.risk_futures
+
+            def prefetch_risk(block):
+                if PREFETCH_RISK and block not in futures:
+                    futures[block] = get_risk_pool().submit(contract_analysis.assess_clause, block, baseline)
+
+            try:
+                st.write_stream(iter_clause_blocks(
+                    contract_analysis.stream_analyze_text(lineage_key, contract_text),
+                    on_block=prefetch_risk,
+                ))
+                show_stream_timing("clauses")
+                # Everything is cached now; this just returns the section-ordered text
+                clauses_text = contract_analysis.analyze_text(lineage_key, contract_text)["clauses_text"]
+                get_session_cache().put(clauses_text, key=f"{st.session_state.uploaded_key}.clauses")
+            except Exception as e:
+                st.warning(f"Clause extraction failed: {e}")
         else:
             st.info("No clause extraction available. Try re-running extraction via the sidebar uploader.")
 
 # Page 2: Risk Assessment
 elif page == "2. Risk Assessment":
     st.header("2) Risk Assessment")
-    if not st.session_state.clauses_text:
+    clauses_text = get_clauses_text()
+    if not clauses_text:
         st.info("No extracted clauses available. Upload and extract on page 1 first.")
     else:
         # Split clause blocks more robustly: look for CLAUSE: markers, else split by double newline
-        raw_clauses = []
-        for block in st.session_state.clauses_text.split("\n\n"):
-            block = block.strip()
-            if not block:
-                continue
-            # accept blocks that start with CLAUSE: or treat as generic clause
-            raw_clauses.append(block)
+        raw_clauses = contract_analysis.split_clause_blocks(clauses_text)
 
         # Load baseline (optional)
-        try:
-            baseline = load_compliance_data()
-        except Exception:
+        baseline = load_baseline()
+        if baseline is None:
             baseline = ""
             st.warning("Compliance baseline not available; assessments will use only the clause text.")
 
@@ -267,21 +314,17 @@ elif page == "2. Risk Assessment":
             # Call the risk assessor for this clause
             with st.spinner(f"Assessing clause {i}/{len(raw_clauses)}..."):
                 try:
-                    result = assess_risk(clause_block, baseline)
+                    # Usually already started while page 1 was streaming
+                    future = st.session_state.risk_futures.get(clause_block)
+                    result = future.result() if future else contract_analysis.assess_clause(clause_block, baseline)
                     # result expected as dict {"label":"Low|Medium|High","explanation":"..."}
                     if isinstance(result, dict):
                         label = result.get("label", "Unknown")
                         explanation = result.get("explanation", "").strip()
                     else:
-                        # legacy fallback if string is returned
+                        # legacy fallback if string is returned (same parsing as the portfolio views)
                         txt = str(result)
-                        label = "Unknown"
-                        if "high" in txt.lower():
-                            label = "High"
-                        elif "medium" in txt.lower():
-                            label = "Medium"
-                        elif "low" in txt.lower():
-                            label = "Low"
+                        label = local_tier.risk_label(txt) or "Unknown"
                         explanation = txt
 
                     # Display label visually
@@ -311,37 +354,35 @@ elif page == "3. RAG Chatbot":
         if not q.strip():
             st.warning("Please type a question.")
         else:
-            with st.spinner("Querying RAG..."):
-                try:
-                    raw_ans = rag_answer(q)  # expected to already contain 'Answer:' and 'Citations:'
-                    raw_ans = (raw_ans or "").strip()
-
-                    # If the model didn't prefix with "Answer:", add it for consistency
-                    if not raw_ans.lower().startswith("answer:"):
-                        raw_ans = "Answer:\n" + raw_ans
-
-                    # Show only the current RAG response (no history)
-                    # Provide a non-empty label and hide it to avoid accessibility warnings
-                    st.subheader("RAG Response")
-                    st.text_area("RAG Response (hidden label)", value=raw_ans, height=360, label_visibility="hidden", key="rag_latest_response_only")
+            try:
+                # Show only the current RAG response (no history), streamed as it is generated.
+                # The model is prompted to answer with 'Answer:' and 'Citations:' sections.
+                st.subheader("RAG Response")
+                with st.spinner("Retrieving context..."):
+                    tokens = stream_rag_answer(q)
+                st.write_stream(tokens)
+                show_stream_timing("rag")
 
-                except Exception as e:
-                    st.error(f"RAG call failed: {e}")
+            except Exception as e:
+                st.error(f"RAG call failed: {e}")
 
     # No conversation history displayed — only the current answer is shown.
 
 # Page 4: Regulatory Issues & Email
 elif page == "4. Regulatory Issues & Email":
     st.header("4) Regulatory Issues — review & send updated contract")
-    if not st.session_state.uploaded_bytes:
+    if upload_missing():
         st.info("Upload a contract first (sidebar).")
     else:
         st.write("Uploaded file:", st.session_state.uploaded_filename)
-        # show matches
+        # Jurisdiction feeds the matcher's jurisdiction bonus, so ask for it first
+        jurisdiction = st.selectbox("Jurisdiction", options=["EU","IN","US","Other"], index=0)
+        # show matches (keyword stage, plus the semantic stage when SEMANTIC_MATCHING=1)
         regs = list_all_regulations()
+        match = contract_matcher({"jurisdiction": jurisdiction}, regs, text=get_contract_text())
         matches = []
         for reg in regs:
-            score, matched_keywords = match_regulation_to_contract(reg, {"jurisdiction": ""}, st.session_state.contract_text)
+            score, matched_keywords = match(reg)
             if score > 0:
                 suggestion = suggest_amendment(reg, matched_keywords)
                 if suggestion and suggestion != "No amendment needed.":
@@ -359,7 +400,6 @@ elif page == "4. Regulatory Issues & Email":
 
             st.subheader("Prepare updated contract and email")
             contract_title = st.text_input("Contract title", value=st.session_state.uploaded_filename or "Uploaded contract")
-            jurisdiction = st.selectbox("Jurisdiction", options=["EU","IN","US","Other"], index=0)
             owner_email = st.text_input("Owner email (recipient)", value=DEFAULT_NOTIFICATION_EMAIL)
 
             if st.button("Create updated PDF(s) & Send email"):
@@ -368,7 +408,8 @@ elif page == "4. Regulatory Issues & Email":
                 else:
                     # build contract meta (minimal)
                     contract_meta = {
-                        "id": f"uploaded-{uuid.uuid4().hex[:6]}",
+                        # Same upload, same id: repeated clicks reuse its manifests instead of adding new ones
+                        "id": f"uploaded-{st.session_state.uploaded_key[:12]}",
                         "title": contract_title,
                         "jurisdiction": jurisdiction,
                         "parties": [],
@@ -396,4 +437,104 @@ elif page == "4. Regulatory Issues & Email":
                         if failed_count:
                             st.error(f"{failed_count} email(s) failed. See logs above.")
 
+# Page 5: pipeline metrics (per-stage latency, token usage, cache hit rates)
+elif page == "5. Admin: Metrics":
+    st.header("5) Pipeline metrics")
+    metrics_on = st.toggle("Collect metrics", value=telemetry.enabled())
+    if metrics_on != telemetry.enabled():
+        telemetry.enable(metrics_on)
+    if not metrics_on:
+        st.info("Metrics are off. Turn them on here or start the app with COMPLIANCE_METRICS=1.")
+    else:
+        try:
+            server = telemetry.start_http_server()
+            st.caption(f"Prometheus endpoint: http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+        except OSError as e:
+            st.caption(f"Prometheus endpoint not started: {e}")
+
+        st.subheader("Stage latency")
+        st.dataframe(telemetry.stage_summary(), use_container_width=True)
+        st.subheader("Counters")
+        st.dataframe(telemetry.counter_values(), use_container_width=True)
+        st.subheader("LLM usage")
+        st.dataframe([{"stage": stage, **usage} for stage, usage in usage_report().items()], use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        if col1.button("Write trace"):
+            st.success(f"Trace written to {telemetry.write_trace()}")
+        if col2.button("Reset metrics"):
+            telemetry.reset()
+            st.rerun()
+        with st.expander("Prometheus export"):
+            st.code(telemetry.export_prometheus(), language="text")
+
+    st.subheader("Session cache")
+    st.json(get_session_cache().usage())
+
+    st.subheader("Template reuse")
+    stats = clause_fingerprints.portfolio_stats(contract_analysis.load_cache())
+    st.write(f"{stats['contracts']} contract(s), {stats['sections']} sections in {stats['templates']} template(s): "
+             f"reuse ratio {stats['reuse_ratio']:.1%}; {stats['reused_extractions']} extraction(s) and "
+             f"{stats['reused_risks']} risk verdict(s) reused")
+    st.dataframe(stats["top_templates"], use_container_width=True)
+
+# Page 6: portfolio compliance report from the precomputed views
+elif page == "6. Portfolio Report":
+    st.header("6) Portfolio compliance report")
+    if st.button("Refresh views"):
+        with st.spinner("Refreshing portfolio views..."):
+            counts = portfolio_views.refresh()
+        st.success(f"Refreshed in {counts['seconds']:.2f}s: {counts['contracts_rematched']} contract(s) re-matched, "
+                   f"{counts['regulations_changed']} changed regulation(s), {counts['rows_written']} match row(s) written")
+    if not portfolio_views.enabled():
+        st.info("No portfolio views yet. Refresh them here or run `python portfolio_views.py refresh`.")
+    else:
+        summary = portfolio_views.summary()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Contracts", summary["contracts"])
+        col2.metric("Pending amendments", summary["pending"])
+        col3.metric("Applied", summary["applied"])
+        col4.metric("Analysed clauses", summary["analysed_clauses"])
+        st.caption(f"Last refresh: {summary['last_refresh']}")
+
+        st.subheader("Contracts lacking a regulation")
+        col1, col2 = st.columns(2)
+        reg_id = col1.text_input("Regulation ID")
+        jurisdiction = col2.text_input("Jurisdiction (optional)")
+        if reg_id:
+            start = time.perf_counter()
+            rows = portfolio_views.lacking(reg_id.strip(), jurisdiction.strip() or None)
+            st.caption(f"{len(rows)} contract(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+            st.dataframe(rows, use_container_width=True)
+
+        st.subheader("Matches")
+        col1, col2 = st.columns(2)
+        status = col1.selectbox("Status", ["pending", "applied", "no_amendment", "any"])
+        owner = col2.text_input("Owner email (optional)")
+        start = time.perf_counter()
+        rows = portfolio_views.matches(status=None if status == "any" else status, owner_email=owner.strip() or None)
+        st.caption(f"{len(rows)} row(s) in {(time.perf_counter() - start) * 1000:.1f} ms (first 1000 shown)")
+        st.dataframe(rows, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        col1.subheader("Risk distribution")
+        col1.dataframe(portfolio_views.risk_distribution(), use_container_width=True)
+        col2.subheader("Pending by owner")
+        col2.dataframe(portfolio_views.pending_by_owner(), use_container_width=True)
+
+        st.subheader("Export")
+        col1, col2 = st.columns(2)
+        view = col1.selectbox("View", sorted(portfolio_views.EXPORTS))
+        fmt = col2.selectbox("Format", ["csv", "parquet"])
+        if st.button("Prepare export"):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, f"{view}.{fmt}")
+                try:
+                    count = portfolio_views.export(view, path, fmt)
+                except RuntimeError as e:
+                    st.error(str(e))
+                else:
+                    with open(path, "rb") as f:
+                        st.download_button(f"Download {count} row(s)", f.read(), file_name=f"{view}.{fmt}")
+
 # Footer small info (removed per request)
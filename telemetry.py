@@ -0,0 +1,284 @@
+# telemetry.py
+"""
+Lightweight pipeline instrumentation.
+
+    with telemetry.span("pdf_extract"):
+        ...
+
+    @telemetry.timed("smtp_send")
+    def send(...): ...
+
+    telemetry.inc("llm_tokens_total", 812, stage="risk", direction="input")
+
+Spans feed a latency histogram per stage (`compliance_stage_seconds`) and,
+for the JSON trace, a per-run list of timed events. Metrics are exported in
+Prometheus text format (`start_http_server()` serves /metrics) and traces are
+written to data/traces/ at exit.
+
+Off by default; set COMPLIANCE_METRICS=1 (or call `enable()`). When disabled,
+spans are a shared no-op and counters return immediately.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from functools import wraps
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACES_DIR = os.path.join(BASE_DIR, "data", "traces")
+
+# Seconds; covers sub-ms cache hits up to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MAX_TRACE_EVENTS = 100000
+
+_enabled = os.getenv("COMPLIANCE_METRICS", "0") == "1"
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> {"buckets": [...], "sum": float, "count": int}
+_trace = []
+_run_started = time.time()
+_http_server = None
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# Metrics
+
+def inc(name, value=1, **labels):
+    if not _enabled:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    if not _enabled:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+                break
+        hist["sum"] += seconds
+        hist["count"] += 1
+
+
+# Spans
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, stage, attrs):
+        self.stage = stage
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        observe("compliance_stage_seconds", elapsed, stage=self.stage)
+        if exc_type is not None:
+            inc("compliance_stage_errors_total", stage=self.stage)
+        with _lock:
+            if len(_trace) < MAX_TRACE_EVENTS:
+                _trace.append({
+                    "stage": self.stage,
+                    "start": round(self.wall_start - _run_started, 6),
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "thread": threading.current_thread().name,
+                    "error": exc_type.__name__ if exc_type else None,
+                    **({"attrs": self.attrs} if self.attrs else {}),
+                })
+        return False
+
+
+def span(stage, **attrs):
+    """Time a block as pipeline stage `stage`. No-op when telemetry is off."""
+    if not _enabled:
+        return _NOOP
+    return _Span(stage, attrs)
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(stage, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Export
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def export_prometheus():
+    """All metrics in Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]} for k, v in _histograms.items()}
+
+    for name in sorted({n for n, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for name in sorted({n for n, _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (n, labels), hist in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, hist["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _quantile(hist, q):
+    """Estimate a quantile from histogram buckets (linear within a bucket)."""
+    target = q * hist["count"]
+    seen = 0
+    lower = 0.0
+    for bound, count in zip(LATENCY_BUCKETS, hist["buckets"]):
+        if count and seen + count >= target:
+            return lower + (bound - lower) * (target - seen) / count
+        seen += count
+        lower = bound
+    return LATENCY_BUCKETS[-1]
+
+
+def stage_summary():
+    """Per-stage latency stats, hottest (most total time) first."""
+    with _lock:
+        stages = [
+            (dict(labels).get("stage", ""), dict(hist, buckets=list(hist["buckets"])))
+            for (name, labels), hist in _histograms.items()
+            if name == "compliance_stage_seconds"
+        ]
+    rows = [{
+        "stage": stage,
+        "calls": hist["count"],
+        "total_s": round(hist["sum"], 4),
+        "mean_ms": round(hist["sum"] / hist["count"] * 1000, 2) if hist["count"] else 0.0,
+        "p50_ms": round(_quantile(hist, 0.50) * 1000, 2),
+        "p95_ms": round(_quantile(hist, 0.95) * 1000, 2),
+    } for stage, hist in stages]
+    return sorted(rows, key=lambda row: -row["total_s"])
+
+
+def counter_values():
+    with _lock:
+        return [{"name": name, **dict(labels), "value": value} for (name, labels), value in sorted(_counters.items())]
+
+
+def start_http_server(port=int(os.getenv("METRICS_PORT", 9464)), host="127.0.0.1"):
+    """Serve /metrics in Prometheus text format from a daemon thread (once per process)."""
+    global _http_server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    with _lock:
+        if _http_server is not None:
+            return _http_server
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = export_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        _http_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=_http_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _http_server
+
+
+def write_trace(path=None):
+    """Write this run's spans, stage summary and counters as JSON; returns the path."""
+    if path is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(_run_started))
+        path = os.path.join(TRACES_DIR, f"run-{stamp}-{os.getpid()}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock:
+        events = list(_trace)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "started": _run_started,
+            "stages": stage_summary(),
+            "counters": counter_values(),
+            "events": events,
+        }, f, indent=2)
+    return path
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _trace.clear()
+
+
+@atexit.register
+def _write_trace_at_exit():
+    if _enabled and _trace:
+        try:
+            write_trace()
+        except Exception:
+            pass
@@ -0,0 +1,38 @@
+# test_clause_extractor.py
+"""Clause extraction over contracts longer than the "clauses" input budget."""
+import pytest
+
+import services
+from bench_fakes import FakeGroq
+from clause_extractor import _clause_prompts, extract_clauses, stream_extract_clauses
+from prompt_builder import count_tokens, stage_budget
+
+FILLER = "The parties shall cooperate in good faith on all matters under this Agreement. " * 8
+LONG_CONTRACT = "\n".join(
+    [f"{n}. GENERAL MATTERS\n{FILLER}" for n in range(1, 30)]
+    + ["30. GOVERNING LAW\nThis Agreement is governed by the laws of England and Wales."]
+)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setenv("PROMPT_BUDGET_CLAUSES", "1500")
+    fake = FakeGroq(latency_ms=0, tokens_per_s=0)
+    services.override("groq", fake)
+    yield fake
+    services.reset("groq")
+
+
+def test_long_contract_is_sent_in_budget_sized_chunks(fake_llm):
+    prompts = _clause_prompts(LONG_CONTRACT)
+    assert len(prompts) > 1
+    assert all(count_tokens(p) <= stage_budget("clauses") for p in prompts)
+    assert "30. GOVERNING LAW" in prompts[-1]
+
+
+def test_last_clause_of_long_contract_is_extracted(fake_llm):
+    assert count_tokens(LONG_CONTRACT) > stage_budget("clauses")
+    clauses = extract_clauses(LONG_CONTRACT)
+    assert "CLAUSE: Governing Law" in clauses
+    assert "laws of England and Wales" in clauses
+    assert "".join(stream_extract_clauses(LONG_CONTRACT)).count("CLAUSE: Governing Law") == 1
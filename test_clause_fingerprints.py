@@ -0,0 +1,114 @@
+# test_clause_fingerprints.py
+"""MinHash accuracy and exact-only template reuse."""
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import clause_fingerprints as cf
+import contract_analysis
+
+
+def _edited_pair(rng, vocab):
+    base = [rng.choice(vocab) for _ in range(rng.randint(40, 200))]
+    other = list(base)
+    for _ in range(rng.randint(0, 25)):
+        j = rng.randrange(len(other))
+        op = rng.random()
+        if op < 0.5:
+            other[j] = rng.choice(vocab)
+        elif op < 0.75:
+            other.insert(j, rng.choice(vocab))
+        else:
+            del other[j]
+    return " ".join(base), " ".join(other)
+
+
+def test_minhash_estimates_jaccard():
+    rng = random.Random(7)
+    vocab = [f"term{i}" for i in range(400)]
+    errors = []
+    for _ in range(200):
+        a, b = _edited_pair(rng, vocab)
+        sa, sb = cf.shingles(cf.normalize(a)), cf.shingles(cf.normalize(b))
+        true = len(sa & sb) / len(sa | sb)
+        estimate = cf.similarity(cf.fingerprint(a), cf.fingerprint(b))
+        errors.append(abs(estimate - true))
+        if true < 0.7:
+            assert estimate < cf.CLAUSE_SIMILARITY, (true, estimate)
+    # Standard error with 64 permutations is at most 0.0625
+    assert sum(errors) / len(errors) < 0.06
+
+
+def test_minhash_permutations_are_independent():
+    words = " ".join(f"w{i}" for i in range(200))
+    assert len(set(cf.minhash(cf.normalize(words)).tolist())) > 56
+
+
+def test_normalize_keeps_amount_symbols():
+    assert cf.normalize("4.2 Fees: $1,000") != cf.normalize("4.2 Fees: €1,000")
+    assert cf.normalize("4.2 Fees: $1,000") == cf.normalize("7.2  FEES - $1,000")
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Invoices are payable within\n30 days of receipt.", "Invoices are payable within\n90 days of receipt."),
+    ("Notice must be given within\n10 business days.", "Notice must be given within\n180 business days."),
+    ("The cap is USD\n1.5 million per year.", "The cap is USD\n2.5 million per year."),
+    ("Payment is due as stated in\nsection 4 of Schedule 2.", "Payment is due as stated in\nsection 9 of Schedule 2."),
+])
+def test_normalize_keeps_wrapped_numbers(a, b):
+    assert cf.normalize(a) != cf.normalize(b)
+    assert cf.fingerprint(a)["n"] != cf.fingerprint(b)["n"]
+
+
+def test_normalize_drops_clause_numbering():
+    assert cf.normalize("4. FEES\n4.1 The Customer pays.\n(a) monthly") == \
+        cf.normalize("12) FEES\n12.3 The Customer pays.\n(c) monthly")
+    assert cf.normalize("ARTICLE 4 FEES") == cf.normalize("ARTICLE IX FEES")
+
+
+def test_locate_recuts_snippet_from_renumbered_copy():
+    section = "7. LIABILITY\n7.1 Liability shall not exceed USD 1,000,000."
+    assert cf.locate("4.1 Liability shall not exceed USD 1,000,000.", section) == \
+        "Liability shall not exceed USD 1,000,000"
+    assert cf.locate("Liability shall exceed USD 50,000", section) is None
+
+
+def _cache_with(section_text, blocks):
+    cache = contract_analysis.load_cache()
+    h = contract_analysis.text_hash(section_text)
+    cache["sections"][h] = {"clauses": blocks}
+    contract_analysis._reuse_template_sections([section_text], [h], [], cache)
+    return cache
+
+
+LIABILITY = ("4. LIABILITY\n4.1 The Supplier's aggregate liability shall not exceed USD 1,000,000 "
+             "in any contract year, except for fraud or wilful misconduct.")
+LIABILITY_BLOCK = ("CLAUSE: Liability\nSummary: Caps the Supplier's liability.\n"
+                   "Snippet: 4.1 The Supplier's aggregate liability shall not exceed USD 1,000,000")
+
+
+@pytest.mark.parametrize("edited", [
+    LIABILITY.replace("1,000,000", "50,000"),
+    LIABILITY.replace("shall not exceed", "shall exceed"),
+])
+def test_material_edits_are_not_reused(monkeypatch, tmp_path, edited):
+    monkeypatch.setattr(cf, "CLAUSE_DEDUP", True)
+    monkeypatch.setattr(contract_analysis, "ANALYSIS_CACHE", str(tmp_path / "analysis_cache.db"))
+    cache = _cache_with(LIABILITY, [LIABILITY_BLOCK])
+    h = contract_analysis.text_hash(edited)
+    assert contract_analysis._reuse_template_sections([edited], [h], [0], cache) == [0]
+    assert "clauses" not in cache["sections"].get(h, {})
+
+
+def test_renumbered_copy_reuses_extraction_with_own_text(monkeypatch, tmp_path):
+    monkeypatch.setattr(cf, "CLAUSE_DEDUP", True)
+    monkeypatch.setattr(contract_analysis, "ANALYSIS_CACHE", str(tmp_path / "analysis_cache.db"))
+    cache = _cache_with(LIABILITY, [LIABILITY_BLOCK])
+    copy = LIABILITY.replace("4. LIABILITY", "9. LIABILITY").replace("4.1 The", "9.1 The").replace("Supplier", "SUPPLIER")
+    h = contract_analysis.text_hash(copy)
+    assert contract_analysis._reuse_template_sections([copy], [h], [0], cache) == []
+    (block,) = cache["sections"][h]["clauses"]
+    assert block.startswith("CLAUSE: Liability")
+    assert "Snippet: The SUPPLIER's aggregate liability shall not exceed USD 1,000,000" in block
@@ -0,0 +1,39 @@
+# test_contract_analysis.py
+"""Analysis cache: concurrent views merge instead of overwriting each other."""
+import contract_analysis
+
+
+def test_stale_view_does_not_overwrite_newer_entries(monkeypatch, tmp_path):
+    monkeypatch.setattr(contract_analysis, "ANALYSIS_CACHE", str(tmp_path / "analysis_cache.db"))
+    slow = contract_analysis.load_cache()
+    slow["sections"].setdefault("s1", {})
+    slow["template_reuse"].get("extraction", 0)
+
+    # Another worker finishes first while `slow` waits on the LLM
+    fast = contract_analysis.load_cache()
+    fast["sections"]["s1"] = {"clauses": ["CLAUSE: Payment"]}
+    fast["risks"]["r1"] = "Risk: Low"
+    fast["template_reuse"]["extraction"] = 2
+    contract_analysis.save_cache(fast)
+
+    slow["sections"]["s1"].update(checked=["gdpr"], hits=[])
+    slow["risks"]["r2"] = "Risk: High"
+    slow["template_reuse"]["extraction"] = 1
+    contract_analysis.save_cache(slow)
+
+    cache = contract_analysis.load_cache()
+    assert cache["sections"]["s1"] == {"clauses": ["CLAUSE: Payment"], "checked": ["gdpr"], "hits": []}
+    assert cache["risks"]["r1"] == "Risk: Low" and cache["risks"]["r2"] == "Risk: High"
+    assert cache["template_reuse"]["extraction"] == 3
+
+
+def test_save_writes_only_changed_entries(monkeypatch, tmp_path):
+    monkeypatch.setattr(contract_analysis, "ANALYSIS_CACHE", str(tmp_path / "analysis_cache.db"))
+    cache = contract_analysis.load_cache()
+    cache["texts"]["blob"] = "1. PAYMENT TERMS\nPayable within 30 days."
+    contract_analysis.save_cache(cache)
+
+    reader = contract_analysis.load_cache()
+    assert reader["texts"]["blob"].startswith("1. PAYMENT TERMS")
+    assert list(reader["texts"]._changes()) == []
+    assert "missing" not in reader["texts"]
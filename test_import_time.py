@@ -0,0 +1,126 @@
+# test_import_time.py
+"""
+Startup regression check: profiles `python -X importtime` for the app's entry
+modules, fails if heavy subsystems (torch, LangChain, FAISS, LLM clients) are
+imported eagerly or if the cumulative import time exceeds the budget.
+
+Run `python test_import_time.py` for the full report, or via pytest.
+"""
+import os
+import subprocess
+import sys
+import importlib.util
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules imported by app.py / streamlit_app.py before anything is rendered
+ENTRY_MODULES = [
+    "app",
+    "rag_module",
+    "clause_extractor",
+    "risk_assessor",
+    "contract_analysis",
+    "regulatory_tracker",
+    "streamlit_app",
+]
+
+# Entry modules that need an optional framework; skipped only without it
+FRAMEWORKS = {"streamlit_app": "streamlit"}
+
+# Must only be imported on first use of the feature that needs them
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "langchain",
+    "langchain_core",
+    "langchain_community",
+    "langchain_huggingface",
+    "faiss",
+    "groq",
+]
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 1500))
+
+
+class MissingDependency(Exception):
+    pass
+
+
+def profile_imports(module):
+    """
+    Return [(package, self_us, cumulative_us)] as reported by -X importtime.
+    Raises MissingDependency if the module's framework or a base dependency is
+    not installed.
+    """
+    framework = FRAMEWORKS.get(module)
+    if framework and importlib.util.find_spec(framework) is None:
+        raise MissingDependency(f"{framework} is not installed")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "GROQ_API_KEY": ""},
+    )
+    if proc.returncode != 0:
+        missing = [l for l in proc.stderr.splitlines() if l.startswith("ModuleNotFoundError")]
+        if missing:
+            raise MissingDependency(f"base dependency not installed: {missing[-1]}")
+        raise AssertionError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, package = line[len("import time:"):].split("|")
+        rows.append((package.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def own_import_ms(rows, module):
+    """
+    Cumulative import time of `module`, minus the framework it runs in: the
+    streamlit package costs the same with or without our lazy imports.
+    """
+    cumulative = {package: cum for package, _, cum in rows}
+    framework = FRAMEWORKS.get(module)
+    return (cumulative[module] - cumulative.get(framework, 0)) / 1000
+
+
+def _profile_or_skip(module):
+    try:
+        return profile_imports(module)
+    except MissingDependency as e:
+        pytest.skip(str(e))
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_no_heavy_imports_at_startup(module):
+    imported = {package.split(".")[0] for package, _, _ in _profile_or_skip(module)}
+    eager = sorted(imported & set(HEAVY_MODULES))
+    assert not eager, f"import {module} eagerly loads {eager}"
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_import_time_budget(module):
+    total_ms = own_import_ms(_profile_or_skip(module), module)
+    assert total_ms < IMPORT_BUDGET_MS, f"import {module} took {total_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+
+def main():
+    for module in ENTRY_MODULES:
+        try:
+            rows = profile_imports(module)
+        except MissingDependency as e:
+            print(f"\n{module}: skipped ({e})")
+            continue
+        print(f"\n{module}: {own_import_ms(rows, module):.1f} ms cumulative")
+        for package, _self_us, cumulative_us in sorted(rows, key=lambda r: -r[2])[:10]:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {package}")
+
+
+if __name__ == "__main__":
+    main()
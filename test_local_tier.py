@@ -0,0 +1,84 @@
+# test_local_tier.py
+"""Local tier: recorded training examples, and local answers that never reach the analysis cache."""
+import pytest
+
+pytest.importorskip("numpy")
+
+import contract_analysis
+import local_tier
+import portfolio_views
+import services
+from bench_fakes import FakeGroq
+
+PAYMENT = "1. PAYMENT TERMS\nThe Customer shall pay each invoice within {n} days of receipt by bank transfer."
+LIABILITY = "2. LIABILITY\nThe Supplier's aggregate liability shall not exceed {n} times the annual fees."
+MIXED = ("3. TERMINATION\nThe Customer shall pay each invoice within {n} days. The Supplier's liability "
+         "shall not exceed the fees. This Agreement is governed by the laws of England.")
+BASELINE = "Payment within 30 days. Liability caps must be at least the annual fees."
+
+
+@pytest.fixture
+def tier(monkeypatch, tmp_path):
+    monkeypatch.setattr(contract_analysis, "ANALYSIS_CACHE", str(tmp_path / "analysis_cache.db"))
+    monkeypatch.setattr(portfolio_views, "PORTFOLIO_DB", str(tmp_path / "portfolio.db"))
+    monkeypatch.setattr(local_tier, "LOCAL_TIER_DIR", str(tmp_path / "local_tier"))
+    monkeypatch.setattr(local_tier, "EXAMPLES_FILE", str(tmp_path / "local_tier" / "examples.jsonl"))
+    fake = FakeGroq(latency_ms=0, tokens_per_s=0)
+    services.override("groq", fake)
+    services.reset("local_tier")
+    yield fake
+    services.reset("groq")
+    services.reset("local_tier")
+
+
+def test_llm_answers_are_recorded_as_examples(monkeypatch, tier):
+    monkeypatch.setattr(local_tier, "LOCAL_TIER_RECORD", True)
+    text = "\n".join([PAYMENT.format(n=30), LIABILITY.format(n=2)])
+    contract_analysis.analyze_text("c-1", text, baseline=BASELINE, assess=True)
+
+    clauses = dict(local_tier.load_examples("clause"))
+    assert sorted(clauses.values()) == ["Liability", "Payment Terms"]
+    risks = local_tier.load_examples("risk")
+    assert len(risks) == 2 and all(label in local_tier.RISK_LEVELS for _text, label in risks)
+
+
+def test_clause_label_marks_multi_clause_sections():
+    blocks = ["CLAUSE: Payment Terms\nSnippet: pay", "CLAUSE: Liability\nSnippet: cap"]
+    assert local_tier.clause_label(blocks) == local_tier.MULTIPLE_CLAUSES
+    assert local_tier.clause_label(blocks[1:]) == "Liability"
+    assert local_tier.clause_label([]) == local_tier.NO_CLAUSE
+
+
+def test_local_answers_are_used_but_not_cached(monkeypatch, tier):
+    examples = [(t.format(n=n), label) for n in range(10, 80, 7)
+                for t, label in ((PAYMENT, "Payment Terms"), (LIABILITY, "Liability"),
+                                 (MIXED, local_tier.MULTIPLE_CLAUSES))]
+    local_tier.train("clause", features="hashing", holdout=0, examples=examples)
+    local_tier.train("risk", features="hashing", holdout=0, examples=[
+        (t.format(n=n), label) for n in range(10, 80, 7) for t, label in ((PAYMENT, "Low"), (LIABILITY, "High"))])
+    monkeypatch.setattr(local_tier, "LOCAL_TIER", True)
+    monkeypatch.setattr(local_tier, "LOCAL_TIER_CONFIDENCE", 0.5)
+
+    sections = [PAYMENT.format(n=30), LIABILITY.format(n=2), MIXED.format(n=45)]
+    result = contract_analysis.analyze_text("c-1", "\n".join(sections), baseline=BASELINE, assess=True)
+    local = [b for b in result["clause_blocks"] if "classified locally" in b]
+    assert [b.splitlines()[0] for b in local] == ["CLAUSE: Payment Terms", "CLAUSE: Liability"]
+    # The multi-clause section went to the LLM
+    assert result["clause_blocks"][2].startswith("CLAUSE: Termination\nSummary: Covers")
+    assert result["llm_calls"] >= 1
+
+    cache = contract_analysis.load_cache()
+    for section in sections[:2]:
+        assert "clauses" not in cache["sections"].get(contract_analysis.text_hash(section), {})
+    assert "clauses" in cache["sections"][contract_analysis.text_hash(sections[2])]
+    for block, risk in zip(result["clause_blocks"], result["risks"]):
+        assert ("classified locally" in risk.lower()) != (contract_analysis._risk_key(block, BASELINE) in cache["risks"])
+
+    # With the tier off the same contract is answered by the LLM, and only then cached
+    monkeypatch.setattr(local_tier, "LOCAL_TIER", False)
+    calls = tier.calls
+    again = contract_analysis.analyze_text("c-1", "\n".join(sections), baseline=BASELINE, assess=True)
+    assert tier.calls > calls
+    assert not any("classified locally" in (b + r).lower() for b, r in zip(again["clause_blocks"], again["risks"]))
+    cache = contract_analysis.load_cache()
+    assert all("clauses" in cache["sections"][contract_analysis.text_hash(s)] for s in sections)
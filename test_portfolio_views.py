@@ -0,0 +1,121 @@
+# test_portfolio_views.py
+"""Incremental portfolio view refreshes agree with a full rebuild and with plan_contract_updates."""
+import functools
+import json
+import re
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("reportlab")
+
+import amendment_rules
+import bench_fakes
+import bench_pipeline
+import contract_analysis
+import contract_store
+import local_tier
+import portfolio_views
+import regulation_catalogue
+import regulatory_tracker
+import semantic_matcher
+import services
+
+SANDBOXED = {
+    contract_store: ["DATA_DIR", "CONTRACTS_DIR", "BLOBS_DIR", "CACHE_DIR", "MANIFESTS_FILE"],
+    contract_analysis: ["ANALYSIS_CACHE"],
+    regulatory_tracker: ["DATA_DIR", "CONTRACTS_DIR", "REGS_FILE", "CONTRACT_INDEX"],
+    regulation_catalogue: ["CATALOGUE_DB"],
+    portfolio_views: ["PORTFOLIO_DB"],
+    local_tier: ["LOCAL_TIER_DIR", "EXAMPLES_FILE"],
+}
+
+
+@pytest.fixture
+def portfolio(monkeypatch, tmp_path):
+    for module, names in SANDBOXED.items():
+        for name in names:
+            monkeypatch.setattr(module, name, getattr(module, name))
+    bench_pipeline.sandbox(str(tmp_path))
+    index = {}
+    for meta, pdf, _text in bench_fakes.synthetic_contracts(4, sections=12, seed=3):
+        contract_store.register_base(meta["id"], 1, pdf)
+        index[meta["id"]] = meta
+    regulatory_tracker.write_json(regulatory_tracker.CONTRACT_INDEX, index)
+    regs = bench_fakes.synthetic_regulations(80, amend_rate=0.3, seed=5)
+    _publish(regs)
+    portfolio_views.refresh(full=True)
+    yield regs
+    services.reset("local_tier")
+
+
+def _publish(regs):
+    # Snapshot feed: regulations missing from the file are withdrawn
+    regulatory_tracker.write_json(regulatory_tracker.REGS_FILE, regs)
+    regulatory_tracker.sync_regulations()
+
+
+def _rows():
+    conn = portfolio_views.connect()
+    try:
+        return sorted(conn.execute("SELECT * FROM match_status"))
+    finally:
+        conn.close()
+
+
+def _assert_incremental_equals_full():
+    stats = portfolio_views.refresh()
+    incremental = _rows()
+    portfolio_views.refresh(full=True)
+    assert incremental == _rows()
+    return stats
+
+
+def test_incremental_refresh_equals_full_after_regulation_changes(portfolio):
+    regs = [dict(r) for r in portfolio]
+    added = bench_fakes.synthetic_regulations(100, amend_rate=0.5, seed=9)[80:]
+    for reg in added:
+        reg["id"] += "-new"
+    for reg in regs[:10]:
+        reg["keywords"] = ["consent", "termination"]
+    _publish(regs[:10] + regs[20:] + added)
+
+    stats = _assert_incremental_equals_full()
+    assert stats["contracts_rematched"] == 0
+    assert stats["regulations_withdrawn"] == 10
+    assert any(row[6] == "pending" for row in _rows())
+
+
+def test_rule_table_change_rematches_every_contract(portfolio, monkeypatch, tmp_path):
+    rules_path = tmp_path / "amendment_rules.json"
+    rules_path.write_text(json.dumps([{"id": "liability-cap", "keyword_contains": ["liability"],
+                                       "template": "Review the liability cap for {title}."}]))
+    monkeypatch.setattr(amendment_rules, "load_rules", functools.partial(amendment_rules.load_rules, str(rules_path)))
+
+    stats = _assert_incremental_equals_full()
+    assert stats["contracts_rematched"] == 4
+    assert any(row[6] == "pending" and "liability cap" in row[7] for row in _rows())
+
+
+def _embed(texts):
+    # Toy embedding: one dimension per keyword family
+    families = [kws.split() for kws in ("consent agree permission", "liability damages", "terminate termination")]
+    vectors = np.array([[sum(w in family for w in re.findall(r"\w+", t.lower())) for family in families]
+                        for t in texts], dtype=np.float32) + 1e-3
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_semantic_rows_match_plan_contract_updates(portfolio, monkeypatch):
+    monkeypatch.setattr(semantic_matcher, "SEMANTIC_MATCHING", True)
+    monkeypatch.setattr(semantic_matcher, "embed_texts", _embed)
+    monkeypatch.setattr(semantic_matcher, "get_regulation_matrix",
+                        lambda regs: semantic_matcher.RegulationMatrix(regs, embed=_embed))
+
+    stats = _assert_incremental_equals_full()
+    assert stats["contracts_rematched"] == 4
+    regs = regulation_catalogue.list_regulations()
+    for contract in regulatory_tracker.list_all_contracts():
+        planned = sorted(reg["id"] for reg, _suggestion in regulatory_tracker.plan_contract_updates(contract, regs))
+        pending = sorted(row["regulation_id"] for row in
+                         portfolio_views.matches(contract_id=contract["id"], status="pending"))
+        assert pending == planned
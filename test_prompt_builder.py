@@ -0,0 +1,62 @@
+# test_prompt_builder.py
+"""Token budgets in prompt_builder.pack_context; page furniture in strip_boilerplate."""
+import pytest
+
+from prompt_builder import count_tokens, pack_context, split_to_budget, strip_boilerplate
+
+
+CHUNKS = [
+    "The Supplier shall indemnify the Customer against all claims arising from a breach of this Agreement. " * 6,
+    "Either party may terminate on thirty days written notice.",
+    "Payment is due within thirty days of the invoice date.",
+    "This Agreement is governed by the laws of England and Wales.",
+]
+
+
+@pytest.mark.parametrize("max_tokens", [20, 50, 100, 150, 400])
+def test_pack_context_stays_within_budget(max_tokens):
+    packed = pack_context(CHUNKS, max_tokens)
+    assert packed
+    assert count_tokens(packed) <= max_tokens
+
+
+def test_pack_context_keeps_whole_chunks_that_fit():
+    packed = pack_context(CHUNKS[1:], 1000)
+    assert packed == "\n\n".join(CHUNKS[1:])
+
+
+@pytest.mark.parametrize("max_tokens", [15, 40, 120])
+def test_split_to_budget_keeps_all_text_within_budget(max_tokens):
+    chunks = split_to_budget(CHUNKS, max_tokens)
+    assert all(count_tokens(c) <= max_tokens for c in chunks)
+    assert "".join("".join(chunks).split()) == "".join("".join(CHUNKS).split())
+
+
+def _page(n, body):
+    return f"ACME SERVICES AGREEMENT\nConfidential\n{body}\nPage {n} of 3"
+
+
+def test_strip_boilerplate_drops_running_headers_and_page_numbers():
+    pages = [_page(1, "1. PAYMENT TERMS\nFees are due monthly."),
+             _page(2, "2. TERMINATION\nEither party may terminate."),
+             _page(3, "3. GOVERNING LAW\nLaws of England.")]
+    cleaned = strip_boilerplate("\f".join(pages))
+    assert cleaned.splitlines() == ["1. PAYMENT TERMS", "Fees are due monthly.", "2. TERMINATION",
+                                    "Either party may terminate.", "3. GOVERNING LAW", "Laws of England."]
+
+
+def test_strip_boilerplate_keeps_repeated_and_numeric_body_lines():
+    # Wrapped amounts and short lines that recur inside the text are content
+    body = "\n".join(["Invoices are payable within", "30", "days.", "Not applicable.",
+                      "Credits are issued within", "30", "days.", "Not applicable.",
+                      "Refunds are paid within", "30", "days.", "Not applicable.", "End of schedule."])
+    pages = [f"Header\nSchedule {n}\n{body}\nFooter" for n in range(3)]
+    cleaned = strip_boilerplate("\f".join(pages))
+    assert cleaned.count("\n30\n") == 9
+    assert cleaned.count("Not applicable.") == 9
+    assert "Header" not in cleaned and "Footer" not in cleaned
+
+
+def test_strip_boilerplate_without_page_breaks_only_squeezes_whitespace():
+    text = "Term\n\n\n12\nmonths   from signature.\n12"
+    assert strip_boilerplate(text) == "Term\n\n12\nmonths from signature.\n12"
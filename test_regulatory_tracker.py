@@ -0,0 +1,47 @@
+# test_regulatory_tracker.py
+"""Semantic matches feed the amendment rules like keyword matches."""
+import re
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import amendment_rules
+import regulatory_tracker
+import semantic_matcher
+
+# Toy embedding: one dimension per topic, counted over the topic's words
+TOPICS = [("consent", "permission", "agrees", "approval"), ("payment", "invoice", "fees")]
+
+REG = {
+    "id": "reg-consent-records",
+    "title": "Consent records",
+    "summary": "Controllers must keep evidence of each data subject's consent.",
+    "keywords": ["consent"],
+    "jurisdiction": "EU",
+}
+# Says "permission" and "agrees", never "consent"
+PARAPHRASED = ("1. DATA PROCESSING\nThe Processor shall keep evidence that each data subject agrees, "
+               "recording when permission was given and for which purpose.\n"
+               "2. FEES\nInvoices are payable within 30 days.")
+
+
+def _embed(texts):
+    vectors = np.array([[sum(w in words for w in re.findall(r"\w+", t.lower())) for words in TOPICS]
+                        for t in texts], dtype=np.float32) + 1e-3
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_paraphrase_only_contract_gets_a_suggestion(monkeypatch):
+    monkeypatch.setattr(semantic_matcher, "embed_texts", _embed)
+    monkeypatch.setattr(semantic_matcher, "get_regulation_matrix",
+                        lambda regs: semantic_matcher.RegulationMatrix(regs, embed=_embed))
+    contract = {"id": "c-1", "jurisdiction": "EU"}
+    assert "consent" not in PARAPHRASED.lower()
+
+    match = regulatory_tracker.contract_matcher(contract, [REG], semantic=True, text=PARAPHRASED)
+    score, matches = match(REG)
+    assert score > 4
+    suggestion = regulatory_tracker.suggest_amendment(REG, matches)
+    assert suggestion != amendment_rules.NO_AMENDMENT
+    assert "consent metadata" in suggestion
@@ -0,0 +1,300 @@
+# update_pipeline.py
+"""
+Pipelined regulatory update run (see regulatory_tracker.auto_update_contracts).
+
+    contracts --> [plan pool] --queue--> [PDF writers] --queue--> [async notifier]
+
+- Plan: read the contract, match every regulation and pick amendments
+  (CPU-bound; a process pool unless incremental/semantic matching needs the
+  in-process caches, then threads).
+- Write: one worker owns a contract at a time and writes its new versions in
+  regulation order, then updates its index entry in a single atomic write,
+  so a contract is either fully updated or untouched.
+- Notify: an asyncio loop sends each contract's emails in order, several
+  contracts concurrently.
+
+Queues are bounded, so a slow stage holds back the stage before it instead of
+piling up work, while slow SMTP or disk never blocks planning of the contracts
+already in flight. `dry_run=True` runs every stage (matching, PDF rebuilds in
+a scratch folder, email rendering) without writing to the store/index or
+sending anything (reading a contract may still fill the rebuilt-PDF cache,
+and incremental matching its analysis cache).
+"""
+import os
+import json
+import queue
+import shutil
+import asyncio
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import contract_store
+import regulatory_tracker
+import telemetry
+from email_utils import build_message, send_email_smtp
+from pdf_utils import build_amended_pdf
+
+PLAN_WORKERS = int(os.getenv("UPDATE_PLAN_WORKERS", 0)) or min(8, os.cpu_count() or 1)
+PDF_WORKERS = int(os.getenv("UPDATE_PDF_WORKERS", 4))
+NOTIFY_CONCURRENCY = int(os.getenv("UPDATE_NOTIFY_CONCURRENCY", 4))
+QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 16))
+# "process" or "thread"; empty picks process unless the matcher needs in-process caches
+PLAN_EXECUTOR = os.getenv("UPDATE_PLAN_EXECUTOR", "")
+
+_STOP = object()
+
+
+# Plan stage (runs in worker processes)
+
+_worker_regs = None
+_worker_incremental = False
+
+
+def _init_plan_worker(regs, incremental):
+    global _worker_regs, _worker_incremental
+    _worker_regs = regs
+    _worker_incremental = incremental
+
+
+def _plan_in_worker(contract):
+    return regulatory_tracker.plan_contract_updates(contract, _worker_regs, _worker_incremental)
+
+
+def _noop(_):
+    return None
+
+
+def _make_plan_executor(regs, incremental, workers, kind):
+    if not kind:
+        import semantic_matcher
+        kind = "thread" if incremental or semantic_matcher.SEMANTIC_MATCHING or workers == 1 else "process"
+    if kind == "process":
+        return ProcessPoolExecutor(workers, initializer=_init_plan_worker, initargs=(regs, incremental))
+    _init_plan_worker(regs, incremental)
+    return ThreadPoolExecutor(workers, thread_name_prefix="update-plan")
+
+
+# Notify stage
+
+class _Notifier:
+    """Asyncio loop on its own thread; contracts are notified concurrently, each in order."""
+
+    def __init__(self, concurrency, dry_run, maxsize):
+        self.concurrency = concurrency
+        self.dry_run = dry_run
+        self.queue = queue.Queue(maxsize)
+        self.sent = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._main()), name="update-notify", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.queue.put(_STOP)
+        self._thread.join()
+
+    async def _main(self):
+        loop = asyncio.get_running_loop()
+        # One thread waits on the queue, the rest run blocking SMTP sends
+        loop.set_default_executor(ThreadPoolExecutor(self.concurrency + 1, thread_name_prefix="update-smtp"))
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        while True:
+            job = await loop.run_in_executor(None, self.queue.get)
+            if job is _STOP:
+                break
+            await slots.acquire()
+            task = asyncio.create_task(self._notify_contract(job, slots))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _notify_contract(self, job, slots):
+        try:
+            for contract, reg, suggestion, pdf_path in job:
+                ok = await asyncio.to_thread(self._send, contract, reg, suggestion, pdf_path)
+                if ok:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+        finally:
+            slots.release()
+
+    def _send(self, contract, reg, suggestion, pdf_path):
+        recipient = contract.get("owner_email") or os.getenv("DEFAULT_NOTIFICATION_EMAIL")
+        if not recipient:
+            print(f"⚠️ No recipient found for contract {contract['id']}; skipping email.")
+            return False
+        try:
+            subject, plain, html = regulatory_tracker.build_update_email(contract, reg, suggestion, pdf_path)
+            if self.dry_run:
+                build_message(subject, recipient, plain, html, attachment_path=pdf_path)
+                return True
+            # The PDF may have left the materialization cache while queued
+            if not os.path.exists(pdf_path):
+                pdf_path = contract_store.materialize(contract["id"], contract["version"])
+            sent = send_email_smtp(subject, recipient, plain, html, attachment_path=pdf_path)
+            if sent:
+                print(f"✅ Notification sent to {recipient} for {contract['id']}")
+            else:
+                print(f"⚠️ Failed to send notification to {recipient} for {contract['id']}")
+            return sent
+        except Exception as e:
+            print(f"⚠️ Exception while sending email for {contract['id']}: {e}")
+            return False
+
+
+# Pipeline
+
+class UpdatePipeline:
+    def __init__(self, incremental=False, dry_run=False, plan_workers=PLAN_WORKERS, pdf_workers=PDF_WORKERS,
+                 notify_concurrency=NOTIFY_CONCURRENCY, queue_size=QUEUE_SIZE, plan_executor=PLAN_EXECUTOR):
+        self.incremental = incremental
+        self.dry_run = dry_run
+        self.plan_workers = plan_workers
+        self.pdf_workers = pdf_workers
+        self.notify_concurrency = notify_concurrency
+        self.queue_size = queue_size
+        self.plan_executor = plan_executor
+        self._index_lock = threading.Lock()
+        self._scratch = None
+        # Contracts skipped because matching or writing failed
+        self.failed_contracts = []
+
+    def _commit_contract(self, index, contract):
+        """Replace one contract's index entry and persist the index atomically."""
+        with self._index_lock:
+            index[contract["id"]] = contract
+            if not self.dry_run:
+                data = json.dumps(index, indent=2, ensure_ascii=False).encode("utf-8")
+                contract_store.write_bytes_atomic(regulatory_tracker.CONTRACT_INDEX, data)
+
+    def _write_versions(self, contract, plan):
+        """New versions in regulation order -> (updated contract, [(version meta, reg, suggestion, pdf)])."""
+        contract = dict(contract, applied_regulations=list(contract.get("applied_regulations", [])))
+        written = []
+        if self.dry_run:
+            manifest = contract_store.get_manifest(contract["id"], contract.get("version", 1))
+            if manifest is not None:
+                base = contract_store.get_blob(manifest["base"])
+                amendments = contract_store.amendment_texts(manifest)
+            else:
+                with open(os.path.join(contract_store.CONTRACTS_DIR, contract["file"]), "rb") as f:
+                    base = f.read()
+                amendments = []
+
+        for reg, suggestion in plan:
+            if self.dry_run:
+                amendments.append(suggestion)
+                new_version = contract.get("version", 1) + 1
+                pdf_path = os.path.join(self._scratch, f"{contract['id']}-v{new_version}.pdf")
+                build_amended_pdf(base, amendments, pdf_path)
+            else:
+                pdf_path, new_version = regulatory_tracker.version_new_contract_pdf(contract, suggestion)
+            contract["version"] = new_version
+            contract["file"] = os.path.basename(pdf_path)
+            contract["applied_regulations"].append(reg["id"])
+            written.append((dict(contract), reg, suggestion, pdf_path))
+        return contract, written
+
+    def _pdf_worker(self, plans, notifier, index, results):
+        while True:
+            item = plans.get()
+            if item is _STOP:
+                return
+            position, contract, plan = item
+            try:
+                with telemetry.span("update_write", amendments=len(plan)):
+                    updated, written = self._write_versions(contract, plan)
+                    self._commit_contract(index, updated)
+            except Exception as e:
+                # Nothing was recorded in the index, so the contract stays at its old version
+                print(f"⚠️ Update of {contract['id']} failed, contract left unchanged: {e}")
+                self.failed_contracts.append(contract["id"])
+                continue
+            results[position] = [(contract["id"], suggestion) for _c, _r, suggestion, _p in written]
+            notifier.queue.put(written)
+
+    def run(self, contracts, regs, index):
+        results = {}
+        plans = queue.Queue(self.queue_size)
+        executor = _make_plan_executor(regs, self.incremental, self.plan_workers, self.plan_executor)
+        # Start plan processes before any other thread exists, so no child is
+        # forked while a writer holds a lock
+        list(executor.map(_noop, range(self.plan_workers)))
+
+        notifier = _Notifier(self.notify_concurrency, self.dry_run, self.queue_size).start()
+        writers = [
+            threading.Thread(target=self._pdf_worker, args=(plans, notifier, index, results), name=f"update-pdf-{i}")
+            for i in range(self.pdf_workers)
+        ]
+        for writer in writers:
+            writer.start()
+        if self.dry_run:
+            self._scratch = tempfile.mkdtemp(prefix="update-dry-run-")
+
+        try:
+            with executor:
+                # At most 2 x workers contracts are planned ahead; results are
+                # handed on in contract order
+                in_flight = deque()
+
+                def hand_on():
+                    position, contract, future = in_flight.popleft()
+                    try:
+                        plan = future.result()
+                    except Exception as e:
+                        print(f"⚠️ Could not match {contract['id']}: {e}")
+                        self.failed_contracts.append(contract["id"])
+                        return
+                    if plan:
+                        plans.put((position, contract, plan))
+
+                for position, contract in enumerate(contracts):
+                    contract.setdefault("applied_regulations", [])
+                    in_flight.append((position, contract, executor.submit(_plan_in_worker, contract)))
+                    if len(in_flight) >= 2 * self.plan_workers:
+                        hand_on()
+                while in_flight:
+                    hand_on()
+        finally:
+            for _ in writers:
+                plans.put(_STOP)
+            for writer in writers:
+                writer.join()
+            notifier.close()
+            if self._scratch:
+                shutil.rmtree(self._scratch, ignore_errors=True)
+                self._scratch = None
+
+        self.sent, self.failed = notifier.sent, notifier.failed
+        return [update for position in sorted(results) for update in results[position]]
+
+
+def run_update_pipeline(incremental=False, dry_run=False, regs=None, failures=None, **options):
+    """
+    Pipelined auto_update_contracts; returns [(contract_id, suggestion)] in
+    contract order. Ids of contracts skipped after an error are appended to
+    `failures` if given.
+    """
+    contracts = regulatory_tracker.list_all_contracts()
+    if regs is None:
+        regs = regulatory_tracker.list_all_regulations()
+    index = regulatory_tracker.read_json(regulatory_tracker.CONTRACT_INDEX)
+
+    pipeline = UpdatePipeline(incremental=incremental, dry_run=dry_run, **options)
+    updates = pipeline.run(contracts, regs, index)
+    label = "Dry run: would apply" if dry_run else "Applied"
+    print(f"{label} {len(updates)} amendment(s) to {len({cid for cid, _ in updates})} contract(s); "
+          f"{pipeline.sent} notification(s) {'rendered' if dry_run else 'sent'}, {pipeline.failed} failed.")
+    if pipeline.failed_contracts:
+        print(f"⚠️ {len(pipeline.failed_contracts)} contract(s) skipped after errors: "
+              f"{', '.join(sorted(pipeline.failed_contracts))}")
+    if failures is not None:
+        failures.extend(pipeline.failed_contracts)
+    return updates